@@ -0,0 +1,309 @@
+"""
+Rollups behind the admin dashboards.
+
+Counting users, classes, students and writings on every dashboard load
+means full-table scans and a four-way outer join across the biggest
+tables. Instead the counters live in two small tables:
+
+- TeacherActivity: classes, students and writings per teacher, plus the
+  time of their latest submission;
+- DailyActivity: submissions and AI feedback ratings per day.
+
+refresh_all() rebuilds both on a schedule (ROLLUP_INTERVAL) to pick up
+anything the event path misses, such as deletions. record_activity()
+refreshes one teacher and today's row shortly after they change
+something. Dashboards read through dashboard_metrics(), which keeps the
+assembled numbers for METRICS_TTL seconds.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from background import Debouncer, run_periodically
+from models import AnalysisFeedback, Class, DailyActivity, Student, TeacherActivity, User, Writing
+
+logger = logging.getLogger(__name__)
+
+
+ROLLUP_INTERVAL = float(os.getenv("ADMIN_ROLLUP_INTERVAL", 900))
+EVENT_DELAY = float(os.getenv("ADMIN_ROLLUP_EVENT_DELAY", 30))
+METRICS_TTL = float(os.getenv("ADMIN_METRICS_TTL", 60))
+
+TOP_TEACHERS = 10
+HISTORY_DAYS = 30
+
+FEEDBACK_FLAGS = (
+    "writing_age_accurate",
+    "strengths_accurate",
+    "development_accurate",
+    "criteria_accurate",
+)
+
+_cache = {"expires": 0.0, "value": None}
+_cache_lock = threading.Lock()
+
+
+def _as_date(value) -> date:
+    # func.date() gives a string on SQLite and a date on PostgreSQL
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _count(column):
+    return func.sum(case((column.is_(True), 1), else_=0))
+
+
+def _upsert(db: Session, model, rows: list[dict]):
+    """
+    INSERT ... ON CONFLICT DO UPDATE on the primary key, so refreshes
+    running at the same time in different processes overwrite each
+    other's rows instead of colliding on them.
+    """
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(model)
+    key = [column.name for column in model.__table__.primary_key]
+    statement = statement.on_conflict_do_update(
+        index_elements=key,
+        set_={name: statement.excluded[name] for name in rows[0] if name not in key},
+    )
+    db.execute(statement, rows)
+
+
+def refresh_teachers(db: Session, teacher_ids=None):
+    """Recompute TeacherActivity for `teacher_ids`, or for every user."""
+    def scoped(query):
+        if teacher_ids is None:
+            return query
+        return query.filter(Class.teacher_id.in_(teacher_ids))
+
+    # One grouped query per table rather than one join that multiplies rows
+    classes = dict(
+        scoped(db.query(Class.teacher_id, func.count(Class.id))).group_by(Class.teacher_id)
+    )
+    students = dict(
+        scoped(
+            db.query(Class.teacher_id, func.count(Student.id)).join(
+                Student, Student.class_id == Class.id
+            )
+        ).group_by(Class.teacher_id)
+    )
+    writings = {
+        teacher_id: (count, last)
+        for teacher_id, count, last in scoped(
+            db.query(Class.teacher_id, func.count(Writing.id), func.max(Writing.created_at))
+            .join(Student, Student.class_id == Class.id)
+            .join(Writing, Writing.student_id == Student.id)
+        ).group_by(Class.teacher_id)
+    }
+
+    users = db.query(User.id)
+    if teacher_ids is not None:
+        users = users.filter(User.id.in_(teacher_ids))
+    user_ids = [user_id for (user_id,) in users]
+
+    now = datetime.now()
+    rows = [
+        {
+            "teacher_id": user_id,
+            "class_count": classes.get(user_id, 0),
+            "student_count": students.get(user_id, 0),
+            "writing_count": writings.get(user_id, (0, None))[0],
+            "last_activity": writings.get(user_id, (0, None))[1],
+            "refreshed_at": now,
+        }
+        for user_id in user_ids
+    ]
+    if rows:
+        _upsert(db, TeacherActivity, rows)
+    db.commit()
+
+
+def refresh_days(db: Session, since: date = None):
+    """Recompute DailyActivity for every day from `since`, or for all days."""
+    submissions = db.query(func.date(Writing.created_at), func.count(Writing.id))
+    feedback = db.query(
+        func.date(AnalysisFeedback.created_at),
+        func.count(AnalysisFeedback.id),
+        _count(AnalysisFeedback.is_helpful),
+        *(_count(getattr(AnalysisFeedback, flag)) for flag in FEEDBACK_FLAGS),
+    )
+    existing = db.query(DailyActivity)
+    if since is not None:
+        start = datetime.combine(since, datetime.min.time())
+        submissions = submissions.filter(Writing.created_at >= start)
+        feedback = feedback.filter(AnalysisFeedback.created_at >= start)
+        existing = existing.filter(DailyActivity.day >= since)
+
+    days = {}
+    for day, count in submissions.group_by(func.date(Writing.created_at)):
+        if day is not None:
+            days.setdefault(_as_date(day), {})["submissions"] = count
+    for day, count, helpful, *flags in feedback.group_by(func.date(AnalysisFeedback.created_at)):
+        if day is None:
+            continue
+        row = days.setdefault(_as_date(day), {})
+        row["feedback_count"] = count
+        row["helpful_count"] = int(helpful or 0)
+        for flag, value in zip(FEEDBACK_FLAGS, flags):
+            row[flag] = int(value or 0)
+
+    # Days left with nothing on them, after deletions
+    existing.filter(DailyActivity.day.not_in(list(days))).delete(synchronize_session=False)
+    now = datetime.now()
+    empty = dict.fromkeys(("submissions", "feedback_count", "helpful_count", *FEEDBACK_FLAGS), 0)
+    if days:
+        _upsert(
+            db,
+            DailyActivity,
+            [{"day": day, **empty, **counts, "refreshed_at": now} for day, counts in days.items()],
+        )
+    db.commit()
+
+
+def refresh_all(db: Session):
+    refresh_teachers(db)
+    refresh_days(db)
+    invalidate()
+    logger.info("Refreshed admin rollups")
+
+
+def invalidate():
+    """Drop the cached dashboard numbers so the next read rebuilds them."""
+    with _cache_lock:
+        _cache["expires"] = 0.0
+
+
+def _refresh_teacher(db: Session, teacher_id: int):
+    refresh_teachers(db, [teacher_id])
+    refresh_days(db, since=date.today())
+    invalidate()
+
+
+_event_refresher = Debouncer("admin rollup refresh", _refresh_teacher, EVENT_DELAY)
+
+
+def record_activity(teacher_id: int):
+    """Refresh a teacher's counters (and today's) once their writes settle."""
+    _event_refresher.schedule(teacher_id)
+
+
+def start_scheduler():
+    """Rebuild the rollups now and every ROLLUP_INTERVAL seconds after."""
+    return run_periodically("admin rollups", refresh_all, ROLLUP_INTERVAL)
+
+
+def _build_metrics(db: Session) -> dict:
+    if db.query(TeacherActivity.teacher_id).first() is None:
+        refresh_all(db)
+
+    total_classes, total_students, total_writings = db.query(
+        func.coalesce(func.sum(TeacherActivity.class_count), 0),
+        func.coalesce(func.sum(TeacherActivity.student_count), 0),
+        func.coalesce(func.sum(TeacherActivity.writing_count), 0),
+    ).one()
+    totals = {
+        "total_users": db.query(func.count(TeacherActivity.teacher_id)).scalar(),
+        "total_classes": int(total_classes),
+        "total_students": int(total_students),
+        "total_writings": int(total_writings),
+    }
+
+    teachers = {
+        row.teacher_id: {
+            "class_count": row.class_count,
+            "student_count": row.student_count,
+            "upload_count": row.writing_count,
+            "last_activity": row.last_activity,
+        }
+        for row in db.query(TeacherActivity)
+    }
+    top_teachers = [
+        {
+            "id": row.id,
+            "name": f"{row.first_name} {row.last_name}",
+            "email": row.email,
+            "school_name": row.school_name or "Not specified",
+            "writings_count": row.writing_count,
+            "classes_count": row.class_count,
+            "students_count": row.student_count,
+            "last_activity": (
+                row.last_activity.strftime("%Y-%m-%d %H:%M")
+                if row.last_activity
+                else "N/A"
+            ),
+        }
+        for row in db.query(
+            User.id,
+            User.first_name,
+            User.last_name,
+            User.email,
+            User.school_name,
+            TeacherActivity.writing_count,
+            TeacherActivity.class_count,
+            TeacherActivity.student_count,
+            TeacherActivity.last_activity,
+        )
+        .join(TeacherActivity, TeacherActivity.teacher_id == User.id)
+        .order_by(TeacherActivity.writing_count.desc(), User.id)
+        .limit(TOP_TEACHERS)
+    ]
+
+    sums = db.query(
+        func.coalesce(func.sum(DailyActivity.feedback_count), 0),
+        func.coalesce(func.sum(DailyActivity.helpful_count), 0),
+        *(
+            func.coalesce(func.sum(getattr(DailyActivity, flag)), 0)
+            for flag in FEEDBACK_FLAGS
+        ),
+    ).one()
+    total_feedback, helpful_count, *flag_counts = (int(value) for value in sums)
+    feedback = {
+        "total_feedback": total_feedback,
+        "helpful_count": helpful_count,
+        "not_helpful_count": total_feedback - helpful_count,
+        "no_feedback_count": totals["total_writings"] - total_feedback,
+        **{f"{flag}_count": count for flag, count in zip(FEEDBACK_FLAGS, flag_counts)},
+    }
+
+    end_date = date.today()
+    start_date = end_date - timedelta(days=HISTORY_DAYS)
+    per_day = dict(
+        db.query(DailyActivity.day, DailyActivity.submissions).filter(
+            DailyActivity.day >= start_date
+        )
+    )
+    date_labels = [
+        (start_date + timedelta(days=offset)).isoformat()
+        for offset in range(HISTORY_DAYS + 1)
+    ]
+    submission_counts = [
+        per_day.get(start_date + timedelta(days=offset), 0)
+        for offset in range(HISTORY_DAYS + 1)
+    ]
+
+    return {
+        "totals": totals,
+        "teachers": teachers,
+        "top_teachers": top_teachers,
+        "feedback": feedback,
+        "date_labels": date_labels,
+        "submission_counts": submission_counts,
+    }
+
+
+def dashboard_metrics(db: Session) -> dict:
+    """The admin dashboard numbers, rebuilt from the rollups at most every METRICS_TTL seconds."""
+    with _cache_lock:
+        if _cache["value"] is not None and _cache["expires"] > time.monotonic():
+            return _cache["value"]
+
+    value = _build_metrics(db)
+    with _cache_lock:
+        _cache["value"] = value
+        _cache["expires"] = time.monotonic() + METRICS_TTL
+    return value
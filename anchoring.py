@@ -0,0 +1,182 @@
+"""
+Locate quoted examples from AI feedback in the transcribed text.
+
+Feedback and criteria justifications quote the pupil's writing
+(`Example: "the dog ran fast"`), but the quotes are rarely exact: the model
+fixes spelling, drops punctuation or re-flows page breaks. Offsets are
+computed once when the writing is marked so clients can render highlights
+directly instead of fuzzy-searching long transcriptions in the browser.
+
+Matching works on a normalised copy of the text (lowercase, letters and
+digits only, single spaces) that keeps a map back to original offsets:
+
+1. exact search of the normalised quote;
+2. otherwise, each occurrence of a quote word in the text votes for the
+   alignment it implies, and only the few best-supported windows are
+   scored with difflib, so the cost grows with word hits rather than
+   with len(text) * len(quote).
+"""
+import re
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import NamedTuple, Optional
+
+# Straight and curly double quotes; single quotes are too common as
+# apostrophes to be used as delimiters.
+QUOTE_PATTERN = re.compile(r'"([^"\n]{3,300})"|“([^”\n]{3,300})”')
+
+# Inserted between transcribed pages by /process; quotes can span it
+PAGE_BREAK = "\n\nPage Break\n\n"
+
+MIN_QUOTE_WORDS = 2
+MIN_SCORE = 0.8
+# Alignment granularity (characters) and number of windows scored per quote
+ALIGNMENT_BUCKET = 8
+MAX_CANDIDATES = 8
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+    score: float
+
+
+def extract_quotes(text: str) -> list[str]:
+    """Quoted passages in a feedback or justification string, in order."""
+    if not text:
+        return []
+    quotes = []
+    for match in QUOTE_PATTERN.finditer(text):
+        quote = (match.group(1) or match.group(2)).strip(" .,;:!?")
+        if len(quote.split()) >= MIN_QUOTE_WORDS and quote not in quotes:
+            quotes.append(quote)
+    return quotes
+
+
+def _normalise(text: str) -> tuple[str, list[int]]:
+    """Lowercased alphanumerics with single spaces, plus original offsets."""
+    chars = []
+    offsets = []
+    pending_space = False
+    for index, char in enumerate(text):
+        if char.isalnum():
+            if pending_space and chars:
+                chars.append(" ")
+                offsets.append(index)
+            chars.append(char.lower())
+            offsets.append(index)
+            pending_space = False
+        elif char != "'" and char != "’":
+            pending_space = True
+    return "".join(chars), offsets
+
+
+class QuoteIndex:
+    """Normalised text and word positions for one transcription."""
+
+    def __init__(self, text: str):
+        self.text = text
+        # Blank out page-break markers without shifting offsets
+        self.normalised, self.offsets = _normalise(
+            text.replace(PAGE_BREAK, " " * len(PAGE_BREAK))
+        )
+        self.word_positions = {}
+        for match in re.finditer(r"\S+", self.normalised):
+            self.word_positions.setdefault(match.group(), []).append(match.start())
+
+    def _to_original(self, start: int, end: int, score: float) -> Span:
+        return Span(self.offsets[start], self.offsets[end - 1] + 1, round(score, 3))
+
+    def locate(self, quote: str, min_score: float = MIN_SCORE) -> Optional[Span]:
+        needle, _ = _normalise(quote)
+        if not needle or not self.normalised:
+            return None
+
+        position = self.normalised.find(needle)
+        if position >= 0:
+            return self._to_original(position, position + len(needle), 1.0)
+
+        # Every shared word votes for the alignment it implies; the best
+        # supported alignments become the candidate windows.
+        votes = Counter()
+        for word in re.finditer(r"\S+", needle):
+            for hit in self.word_positions.get(word.group(), ()):
+                votes[(hit - word.start()) // ALIGNMENT_BUCKET] += 1
+        if not votes:
+            return None
+
+        best = None
+        slack = ALIGNMENT_BUCKET + max(3, len(needle) // 5)
+        for bucket, _ in votes.most_common(MAX_CANDIDATES):
+            window_start = max(0, bucket * ALIGNMENT_BUCKET - slack)
+            window_end = min(len(self.normalised), bucket * ALIGNMENT_BUCKET + len(needle) + slack)
+            window = self.normalised[window_start:window_end]
+
+            matcher = SequenceMatcher(None, needle, window, autojunk=False)
+            blocks = [b for b in matcher.get_matching_blocks() if b.size]
+            if not blocks:
+                continue
+            score = sum(b.size for b in blocks) / len(needle)
+            if score < min_score or (best and score <= best[2]):
+                continue
+            start = window_start + blocks[0].b
+            end = window_start + blocks[-1].b + blocks[-1].size
+            # Penalise matches spread far wider than the quote itself
+            score *= min(1.0, len(needle) / max(1, end - start))
+            if score >= min_score and (not best or score > best[2]):
+                best = (start, end, score)
+
+        if not best:
+            return None
+        return self._to_original(*best)
+
+
+def anchor_feedback(text: str, sources: list[dict]) -> list[dict]:
+    """
+    Anchor every quote in `sources` (dicts with "source", "label", "text" and
+    optionally "criteria_id") to `text`. Returns one dict per located quote.
+    """
+    index = QuoteIndex(text)
+    anchors = []
+    for source in sources:
+        for quote in extract_quotes(source.get("text", "")):
+            span = index.locate(quote)
+            if span is None:
+                continue
+            anchors.append(
+                {
+                    "source": source["source"],
+                    "label": source.get("label"),
+                    "criteria_id": source.get("criteria_id"),
+                    "quote": quote,
+                    "start": span.start,
+                    "end": span.end,
+                    "score": span.score,
+                }
+            )
+    anchors.sort(key=lambda a: (a["start"], a["end"]))
+    return anchors
+
+
+def feedback_sources(feedback: str, criteria_marks: list[dict]) -> list[dict]:
+    """
+    Sources for anchor_feedback from the /process results: one per feedback
+    line (labelled by the text before its colon) and one per criterion
+    justification.
+    """
+    sources = []
+    for line in (feedback or "").splitlines():
+        if '"' not in line and "“" not in line:
+            continue
+        label = line.split(":", 1)[0].strip(" -*•") if ":" in line else None
+        sources.append({"source": "feedback", "label": label, "text": line})
+    for mark in criteria_marks:
+        sources.append(
+            {
+                "source": "criteria",
+                "label": mark.get("criteria"),
+                "criteria_id": mark.get("criteria_id"),
+                "text": mark.get("justification", ""),
+            }
+        )
+    return sources
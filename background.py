@@ -0,0 +1,151 @@
+"""
+Background jobs that run outside the request, each with its own session.
+
+Marking a class produces a burst of events for the same assignment; a
+Debouncer runs its task once, `delay` seconds after the first event, on a
+daemon thread. Events that arrive while the task is running schedule a
+fresh run. One-off jobs (bulk deletes) go through run_in_background(),
+long ones (bulk re-marks) through run_in_thread() so they do not hold a
+pool worker, and scheduled ones (admin rollups) through
+run_periodically().
+
+Every web worker runs the app's startup hooks, but a scheduled job only
+needs one process. run_in_one_process() starts them where it holds the
+scheduled-jobs lock: a Postgres advisory lock, shared by every instance
+using the database, or a file lock beside a SQLite database. The other
+processes retry every LEADER_RETRY seconds and take over when the holder
+exits.
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BACKGROUND_WORKERS", 2)),
+    thread_name_prefix="background",
+)
+
+JOBS_LOCK_KEY = 0x6A6F6273
+LEADER_RETRY = 60
+# Held for the life of the process once taken
+_jobs_lock = []
+
+
+def _run_with_session(name: str, task, args):
+    db = SessionLocal()
+    try:
+        task(db, *args)
+    except Exception as e:
+        logger.error(f"Error in background {name}: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def run_in_background(name: str, task, *args):
+    """Run `task(db, *args)` on the background pool."""
+    return _executor.submit(_run_with_session, name, task, args)
+
+
+def run_in_thread(name: str, task, *args):
+    """Run `task(db, *args)` on its own daemon thread."""
+    thread = threading.Thread(
+        target=_run_with_session, args=(name, task, args), name=name, daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def run_periodically(name: str, task, interval: float, initial_delay: float = 0):
+    """Run `task(db)` every `interval` seconds on a daemon thread."""
+
+    def loop():
+        time.sleep(initial_delay)
+        while True:
+            _run_with_session(name, task, ())
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def _take_jobs_lock():
+    """The scheduled-jobs lock, or None if another process holds it."""
+    if engine.dialect.name == "postgresql":
+        connection = engine.connect()
+        taken = connection.scalar(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": JOBS_LOCK_KEY}
+        )
+        # The lock belongs to the session; don't sit idle in a transaction
+        connection.commit()
+        if taken:
+            return connection
+        connection.close()
+        return None
+
+    lock_file = open(f"{engine.url.database or 'app'}.jobs.lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def run_in_one_process(name: str, start):
+    """Call `start()` in only one process sharing the database."""
+
+    def loop():
+        while True:
+            try:
+                lock = _take_jobs_lock()
+            except Exception as e:
+                logger.error(f"Error taking the lock for {name}: {str(e)}")
+                lock = None
+            if lock is not None:
+                _jobs_lock.append(lock)
+                logger.info(f"Starting {name} in process {os.getpid()}")
+                start()
+                return
+            time.sleep(LEADER_RETRY)
+
+    thread = threading.Thread(target=loop, name=f"{name} lock", daemon=True)
+    thread.start()
+    return thread
+
+
+class Debouncer:
+    def __init__(self, name: str, task, delay: float):
+        """`task(db, key)` is called with a fresh session."""
+        self.name = name
+        self.task = task
+        self.delay = delay
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, key, delay: float = None):
+        with self._lock:
+            if key in self._pending:
+                return
+            timer = threading.Timer(
+                self.delay if delay is None else delay, self._run, args=(key,)
+            )
+            timer.daemon = True
+            self._pending[key] = timer
+        timer.start()
+
+    def _run(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+        _run_with_session(f"{self.name} for {key}", self.task, (key,))
@@ -0,0 +1,89 @@
+"""
+Time quote anchoring on long multi-page transcriptions.
+
+Compares QuoteIndex (exact search, then rare-word seeded windows) with a
+full sliding-window difflib scan, which is what fuzzy-locating a quote
+without an index costs.
+
+Usage:
+    python benchmarks/bench_anchoring.py [--pages 6] [--quotes 12]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anchoring import PAGE_BREAK, QuoteIndex, _normalise
+
+WORDS = (
+    "the a dog cat ran jumped over fence happy sad big small house tree "
+    "because when then suddenly quietly mum dad friend school park ball"
+).split()
+
+
+def make_text(pages: int, rng: random.Random) -> str:
+    page_text = []
+    for _ in range(pages):
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+            for _ in range(40)
+        ]
+        page_text.append(" ".join(sentences))
+    return PAGE_BREAK.join(page_text)
+
+
+def misquote(text: str, rng: random.Random) -> str:
+    words = text.split()
+    start = rng.randrange(0, len(words) - 8)
+    quote = words[start:start + rng.randint(4, 8)]
+    # Misspell one word, like a model "correcting" the pupil's spelling
+    target = rng.randrange(len(quote))
+    word = quote[target]
+    position = rng.randrange(len(word))
+    quote[target] = word[:position] + "e" + word[position + 1:]
+    return " ".join(quote)
+
+
+def naive_locate(text: str, quote: str):
+    haystack, _ = _normalise(text)
+    needle, _ = _normalise(quote)
+    best = (0.0, None)
+    for start in range(0, max(1, len(haystack) - len(needle) + 1)):
+        ratio = SequenceMatcher(None, needle, haystack[start:start + len(needle)]).ratio()
+        if ratio > best[0]:
+            best = (ratio, start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--quotes", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    text = make_text(args.pages, rng)
+    quotes = [misquote(text, rng) for _ in range(args.quotes)]
+    print(f"{len(text)} characters, {args.pages} pages, {len(quotes)} quotes")
+
+    start = time.perf_counter()
+    index = QuoteIndex(text)
+    located = sum(1 for quote in quotes if index.locate(quote))
+    indexed_ms = (time.perf_counter() - start) * 1000
+    print(f"QuoteIndex:   {indexed_ms:9.1f} ms  ({located}/{len(quotes)} located)")
+
+    sample = quotes[:2]
+    start = time.perf_counter()
+    for quote in sample:
+        naive_locate(text, quote)
+    naive_ms = (time.perf_counter() - start) * 1000 / len(sample) * len(quotes)
+    print(f"sliding scan: {naive_ms:9.1f} ms  (extrapolated from {len(sample)} quotes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark bytes-on-wire and latency for the main pages with and without
+response compression.
+
+Usage:
+    python benchmarks/bench_compression.py [--runs 20] [--email E --password P]
+
+Public pages are always measured. Pass a teacher's credentials to also
+measure the authenticated pages (add-writing, classes, data analysis JSON).
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app import app
+
+PUBLIC_PAGES = ["/landing", "/terms", "/privacy", "/login", "/signup"]
+AUTHENTICATED_PAGES = ["/add-writing", "/classes", "/data_analysis", "/api/students"]
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+def login(client: TestClient, email: str, password: str) -> bool:
+    page = client.get("/login")
+    match = re.search(r'name="csrf_token" value="([^"]+)"', page.text)
+    if not match:
+        print("Could not find a CSRF token on /login", file=sys.stderr)
+        return False
+    response = client.post(
+        "/login",
+        data={"email": email, "password": password, "csrf_token": match.group(1)},
+        follow_redirects=False,
+    )
+    return response.headers.get("location", "").endswith("/home")
+
+
+def measure(client: TestClient, path: str, encoding: str, runs: int) -> dict:
+    timings = []
+    wire_bytes = 0
+    served_encoding = "identity"
+    for _ in range(runs):
+        start = time.perf_counter()
+        with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as r:
+            raw = b"".join(r.iter_raw())
+            served_encoding = r.headers.get("content-encoding", "identity")
+        timings.append((time.perf_counter() - start) * 1000)
+        wire_bytes = len(raw)
+    return {
+        "bytes": wire_bytes,
+        "encoding": served_encoding,
+        "p50_ms": statistics.median(timings),
+        "max_ms": max(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+
+    client = TestClient(app, base_url="https://localhost")
+    pages = list(PUBLIC_PAGES)
+    if args.email and args.password:
+        if login(client, args.email, args.password):
+            pages += AUTHENTICATED_PAGES
+        else:
+            print("Login failed, measuring public pages only", file=sys.stderr)
+
+    print(f"{'path':<20} {'requested':<10} {'served':<10} {'bytes':>9} {'p50 ms':>8} {'max ms':>8}")
+    for path in pages:
+        baseline = None
+        for encoding in ENCODINGS:
+            result = measure(client, path, encoding, args.runs)
+            baseline = baseline or result["bytes"]
+            ratio = f"({result['bytes'] / baseline:.0%})" if baseline else ""
+            print(
+                f"{path:<20} {encoding:<10} {result['encoding']:<10} "
+                f"{result['bytes']:>9} {result['p50_ms']:>8.2f} {result['max_ms']:>8.2f} {ratio}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Time a roster CSV import.
+
+Compares roster_import.import_students (batched validation, multi-row
+INSERT or COPY, executemany UPDATE for existing Student IDs) with the
+previous approach of decoding the whole file and adding one ORM Student
+per row. The second streaming run re-imports the same file, so every row
+takes the upsert path.
+
+Runs against a fresh in-memory SQLite database unless --database-url is
+given. The app's settings are still read from the environment, as for
+the other benchmarks.
+
+Usage:
+    python benchmarks/bench_roster_import.py [--rows 10000] [--database-url URL]
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Class, Student, User
+from roster_import import import_students
+
+NAMES = "Amara Ben Chloe Dev Ella Finn Grace Harry Isla Jack Kai Lily Max Noah Olivia".split()
+
+
+def make_csv(rows: int, rng: random.Random) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Student ID", "First Name", "Last Name", "Date of Birth"])
+    for i in range(rows):
+        dob = date(2015, 9, 1).toordinal() + rng.randint(0, 364)
+        writer.writerow(
+            [f"S{i:06d}", rng.choice(NAMES), rng.choice(NAMES), date.fromordinal(dob).isoformat()]
+        )
+    return buffer.getvalue().encode()
+
+
+def row_by_row(db, class_id: int, data: bytes) -> int:
+    """The import as it was: whole file decoded, one ORM add per row."""
+    added = 0
+    for row in csv.DictReader(io.StringIO(data.decode("UTF8"))):
+        db.add(
+            Student(
+                student_id=row.get("Student ID", "").strip() or None,
+                first_name=row.get("First Name", "").strip(),
+                last_name=row.get("Last Name", "").strip(),
+                date_of_birth=datetime.strptime(
+                    row.get("Date of Birth", "").strip(), "%Y-%m-%d"
+                ).date(),
+                class_id=class_id,
+            )
+        )
+        added += 1
+    db.commit()
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+
+    teacher = User(
+        first_name="Bench", last_name="Mark",
+        email=f"bench-{time.time_ns()}@example.com", password_hash=str(time.time_ns()),
+    )
+    db.add(teacher)
+    db.flush()
+    class_obj = Class(name="Roster benchmark", year_group="Year 5", teacher_id=teacher.id)
+    db.add(class_obj)
+    db.commit()
+
+    data = make_csv(args.rows, random.Random(7))
+    print(f"{args.rows} rows, {len(data) / 1024:.0f} KiB, {engine.dialect.name}")
+
+    try:
+        start = time.perf_counter()
+        added = row_by_row(db, class_obj.id, data)
+        legacy = time.perf_counter() - start
+        print(f"  row-by-row ORM   {legacy * 1000:9.1f} ms  ({added} added)")
+
+        db.execute(delete(Student).where(Student.class_id == class_obj.id))
+        db.commit()
+
+        for label in ("streaming insert", "streaming upsert"):
+            start = time.perf_counter()
+            report = import_students(db, class_obj.id, io.BytesIO(data))
+            elapsed = time.perf_counter() - start
+            print(
+                f"  {label:16} {elapsed * 1000:9.1f} ms  "
+                f"({report['inserted']} added, {report['updated']} updated, "
+                f"{report['error_count']} rejected)  {legacy / elapsed:5.1f}x"
+            )
+    finally:
+        db.execute(delete(Student).where(Student.class_id == class_obj.id))
+        db.delete(class_obj)
+        db.delete(teacher)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Route-level benchmark for the hot read paths.
+
+Seeds a synthetic school (school_data.generate_school), then requests
+each route in ROUTES as a teacher (or the admin) through the ASGI app,
+recording the median and p95 time and the number of SQL statements per
+request. Results are compared with routes_baseline.json, which holds
+one entry per database dialect:
+
+- the statement count must not grow: it is machine-independent, so any
+  increase is a new query (often an N+1) that slipped in. A dialect or
+  route with no baseline fails too, so it cannot go unchecked;
+- the median time is reported against the baseline. It only fails the
+  run with --check-time, when it exceeds the baseline by more than the
+  file's time_tolerance: the baselines come from a developer machine,
+  and CI runners are too varied to gate on.
+
+The admin dashboard cache is cleared before every request, so /admin is
+measured on its rollup reads rather than on cache hits.
+
+By default a throwaway SQLite file is used. Pass --database-url to run
+against an empty PostgreSQL database; the seeded school is deleted again
+afterwards. --update-baseline records the current numbers for the
+dialect instead of checking them.
+
+Usage:
+    python benchmarks/bench_routes.py [--iterations 15] [--database-url URL]
+        [--teachers 3] [--check-time] [--update-baseline]
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routes_baseline.json")
+
+# (name, as admin, path template); {student}, {students} and {class_id}
+# are filled from the first teacher's seeded data
+ROUTES = [
+    ("classes", False, "/classes"),
+    ("student_portfolio", False, "/student/{student}/portfolio"),
+    ("portfolio_charts", False, "/student/{student}/portfolio/charts"),
+    ("portfolio_samples", False, "/student/{student}/portfolio/samples"),
+    ("api_student_data", False, "/api/student_data?ids={students}&chart_type=writing_scores&include_average=true"),
+    ("class_overview_export", False, "/view_classes/export/{class_id}"),
+    ("class_data_export", False, "/class/{class_id}/export_data"),
+    ("portfolio_export", False, "/student/{student}/export_portfolio"),
+    ("admin_dashboard", True, "/admin"),
+    ("admin_export", True, "/admin/export"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=15)
+    parser.add_argument("--database-url")
+    parser.add_argument("--teachers", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--check-time", action="store_true", help="fail on median times over the baseline"
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    scratch = None
+    if not args.database_url:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        scratch.close()
+        args.database_url = f"sqlite:///{scratch.name}"
+    # The app builds its engine from the environment on import
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    import admin_metrics
+    from app import app
+    from database import SessionLocal, check_updates, engine
+    from deletion import delete_users
+    from dependencies.auth import get_current_user
+    from school_data import generate_school
+
+    logging.disable(logging.WARNING)
+    check_updates()
+    db = SessionLocal()
+    begin = time.perf_counter()
+    school = generate_school(db, teachers=args.teachers, seed=args.seed)
+    admin_metrics.refresh_all(db)
+    print(
+        f"Seeded {school['writings']} writings, {school['marks']} marks on "
+        f"{engine.dialect.name} in {time.perf_counter() - begin:.1f} s"
+    )
+
+    from models import User
+
+    teacher_id = school["teacher_ids"][0]
+    users = {}
+    for is_admin, user_id in ((False, teacher_id), (True, school["admin_id"])):
+        user = db.get(User, user_id)
+        db.expunge(user)
+        users[is_admin] = user
+    current = {"user": users[False]}
+    app.dependency_overrides[get_current_user] = lambda: current["user"]
+
+    students = school["student_ids"][teacher_id]
+    values = {
+        "student": students[0],
+        "students": ",".join(str(s) for s in students[:5]),
+        "class_id": school["class_ids"][teacher_id][0],
+    }
+
+    statements = [0]
+
+    def count_statement(*_):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    client = TestClient(app, base_url="https://localhost")
+    results = {}
+    try:
+        for name, as_admin, template in ROUTES:
+            path = template.format(**values)
+            current["user"] = users[as_admin]
+            timings, counts = [], []
+            for i in range(args.iterations + 1):
+                admin_metrics.invalidate()
+                statements[0] = 0
+                start = time.perf_counter()
+                response = client.get(path, follow_redirects=False)
+                elapsed = time.perf_counter() - start
+                if response.status_code != 200:
+                    sys.exit(f"{name}: GET {path} returned {response.status_code}")
+                if i:  # the first request warms templates and caches
+                    timings.append(elapsed * 1000)
+                    counts.append(statements[0])
+            results[name] = {
+                "median_ms": round(statistics.median(timings), 2),
+                # Nearest rank: never below the median, the maximum for < 20 runs
+                "p95_ms": round(sorted(timings)[math.ceil(0.95 * len(timings)) - 1], 2),
+                "queries": max(counts),
+            }
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+        app.dependency_overrides.pop(get_current_user, None)
+        delete_users(db, [school["admin_id"], *school["teacher_ids"]])
+        db.close()
+        if scratch:
+            engine.dispose()
+            os.unlink(scratch.name)
+
+    dialect = engine.dialect.name
+    with open(BASELINE_FILE) as f:
+        baseline = json.load(f)
+    tolerance = baseline["time_tolerance"]
+    expected = baseline["dialects"].get(dialect, {})
+
+    failures = []
+    slow = []
+    print(f"\n{'route':<24}{'median':>10}{'p95':>10}{'queries':>9}   baseline")
+    for name, result in results.items():
+        base = expected.get(name)
+        note = "-"
+        if not base:
+            failures.append(f"{name}: no {dialect} baseline")
+        else:
+            note = f"{base['median_ms']:.1f} ms, {base['queries']} queries"
+            if result["queries"] > base["queries"]:
+                failures.append(f"{name}: {result['queries']} queries, baseline {base['queries']}")
+            if result["median_ms"] > base["median_ms"] * (1 + tolerance):
+                slow.append(f"{name}: median {result['median_ms']:.1f} ms, baseline {base['median_ms']:.1f} ms")
+        print(
+            f"{name:<24}{result['median_ms']:>8.1f}ms{result['p95_ms']:>8.1f}ms"
+            f"{result['queries']:>9}   {note}"
+        )
+
+    if args.update_baseline:
+        baseline["dialects"][dialect] = {
+            name: {"median_ms": r["median_ms"], "queries": r["queries"]}
+            for name, r in results.items()
+        }
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baseline, f, indent=4)
+            f.write("\n")
+        print(f"\nBaseline for {dialect} updated")
+        return
+
+    if slow:
+        print(f"\nSlower than the baseline by more than {tolerance:.0%}:")
+        for note in slow:
+            print(f"  - {note}")
+        if args.check_time:
+            failures.extend(slow)
+    if failures:
+        print("\nRoute benchmark regressed:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
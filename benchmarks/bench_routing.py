@@ -0,0 +1,94 @@
+"""
+Router-dispatch microbenchmark.
+
+Starlette tries routes in registration order until one fully matches, so
+every extra (or duplicated) route adds a regex test to each request that
+reaches it. This times that scan for a set of representative paths and
+fails when it exceeds the budget in routing_budget.json.
+
+Usage:
+    python benchmarks/bench_routing.py [--iterations 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.routing import Match
+
+from app import app
+
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_budget.json")
+
+SAMPLE_REQUESTS = [
+    ("GET", "/landing"),
+    ("GET", "/classes"),
+    ("POST", "/process"),
+    ("GET", "/api/student_data"),
+    ("GET", "/student/42/portfolio"),
+    ("GET", "/assignment/7/class-feedback"),
+    ("POST", "/assignment/7/delete"),
+    ("GET", "/does-not-exist"),
+]
+
+
+def make_scope(method: str, path: str) -> dict:
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+    }
+
+
+def dispatch(routes, scope) -> int:
+    """Return how many routes were tried before a full match (or all of them)."""
+    for tried, route in enumerate(routes, start=1):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return tried
+    return len(routes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+
+    routes = app.router.routes
+    print(f"{len(routes)} routes registered (budget {budget['max_routes']})")
+
+    worst_us = 0.0
+    for method, path in SAMPLE_REQUESTS:
+        scope = make_scope(method, path)
+        tried = dispatch(routes, scope)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            dispatch(routes, scope)
+        per_dispatch_us = (time.perf_counter() - start) / args.iterations * 1e6
+        worst_us = max(worst_us, per_dispatch_us)
+        print(f"  {method:<5} {path:<32} {tried:>3} routes tried  {per_dispatch_us:>7.2f} us")
+
+    failures = []
+    if len(routes) > budget["max_routes"]:
+        failures.append(f"{len(routes)} routes registered, budget is {budget['max_routes']}")
+    if worst_us > budget["max_dispatch_us"]:
+        failures.append(f"slowest dispatch took {worst_us:.2f} us, budget is {budget['max_dispatch_us']} us")
+
+    if failures:
+        print("\nRouting budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Offline load test for the marking pipeline.
+
+Drives POST /process (transcription, analysis, criteria marking, quote
+anchoring, database writes) with concurrent uploads and reports
+throughput and latency percentiles. The model is the deterministic fake
+in fake_llm.py, so runs cost nothing and are repeatable:
+
+- by default the app uses the in-process fake (LLM_PROVIDER=fake);
+- with --llm-url the real OpenAI client is pointed at a fake server
+  started separately (python fake_llm.py), which also exercises the
+  client's HTTP and connection-pool handling.
+
+Requests go to the ASGI app in-process through httpx, signed in as a
+seeded teacher whose class, assignment, criteria and students are
+deleted again at the end. The database is the one the app is configured
+with (DATABASE_URL).
+
+Usage:
+    python benchmarks/load_test.py [--requests 200] [--concurrency 20]
+        [--latency 0.5] [--jitter 0.2] [--llm-url http://127.0.0.1:8900/v1]
+        [--max-concurrency 8] [--tokens-per-minute 30000]
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import statistics
+import sys
+import logging
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_page(rng: random.Random) -> bytes:
+    """
+    A small JPEG with a few lines of 'handwriting'. The fake model picks its
+    sample text from the page size, so sizes vary too.
+    """
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", (600 + rng.randint(0, 40), 400 + rng.randint(0, 40)), 255)
+    draw = ImageDraw.Draw(image)
+    for line in range(8):
+        y = 30 + line * 45
+        x = 20
+        while x < 560:
+            width = rng.randint(15, 60)
+            draw.line([(x, y + rng.randint(-3, 3)), (x + width, y + rng.randint(-3, 3))], fill=0, width=2)
+            x += width + rng.randint(8, 20)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def seed(db, students: int):
+    from models import Assignment, Class, Criteria, Student, User
+
+    teacher = User(
+        first_name="Load", last_name="Test",
+        email=f"load-{time.time_ns()}@example.com", password_hash=str(time.time_ns()),
+    )
+    db.add(teacher)
+    db.flush()
+    class_obj = Class(name="Load test", year_group="Year 5", teacher_id=teacher.id)
+    db.add(class_obj)
+    db.flush()
+    assignment = Assignment(
+        title="A day to remember", genre="Narrative", curriculum="UK",
+        class_id=class_obj.id,
+    )
+    db.add(assignment)
+    db.flush()
+    for description in ("Uses expanded noun phrases", "Uses fronted adverbials", "Punctuates speech"):
+        db.add(Criteria(assignment_id=assignment.id, description=description))
+    pupils = [
+        Student(
+            first_name=f"Pupil{i}", last_name="Test",
+            date_of_birth=date(2015, 1 + i % 12, 1), class_id=class_obj.id,
+        )
+        for i in range(students)
+    ]
+    db.add_all(pupils)
+    db.commit()
+    return teacher, assignment, [p.id for p in pupils]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run(app, args, teacher_assignment_students):
+    import httpx
+
+    _, assignment, student_ids = teacher_assignment_students
+    rng = random.Random(args.seed)
+    pages = [make_page(rng) for _ in range(args.distinct_pages)]
+    latencies, failures = [], []
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="https://localhost", timeout=None) as client:
+
+        async def worker():
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                response = await client.post(
+                    "/process",
+                    data={"student_id": str(student_ids[i % len(student_ids)]), "assignment_id": str(assignment.id)},
+                    files={"images": (f"page{i}.jpg", pages[i % len(pages)], "image/jpeg")},
+                )
+                elapsed = time.perf_counter() - start
+                if response.status_code == 200:
+                    latencies.append(elapsed)
+                else:
+                    failures.append((response.status_code, response.text[:200]))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - start
+
+    return latencies, failures, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--distinct-pages", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake model delay per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- around --latency (s)")
+    parser.add_argument("--llm-url", help="base URL of a running fake_llm.py server")
+    parser.add_argument("--max-concurrency", type=int, help="LLM_MAX_CONCURRENCY for the run")
+    parser.add_argument("--tokens-per-minute", type=int, help="LLM_TOKENS_PER_MINUTE for the run")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # The model-call scheduler reads its limits on import
+    if args.max_concurrency:
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    if args.tokens_per_minute:
+        os.environ["LLM_TOKENS_PER_MINUTE"] = str(args.tokens_per_minute)
+
+    if args.llm_url:
+        os.environ["LLM_PROVIDER"] = "openai"
+        os.environ["LLM_BASE_URL"] = args.llm_url
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+    else:
+        os.environ["LLM_PROVIDER"] = "fake"
+        os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+        os.environ["FAKE_LLM_JITTER"] = str(args.jitter)
+
+    from app import app
+    from database import SessionLocal, check_updates
+    from deletion import delete_users
+    from dependencies.auth import get_current_user
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    check_updates()
+    db = SessionLocal()
+    seeded = seed(db, args.students)
+    teacher = seeded[0]
+    # Load the teacher's columns and detach it, so request threads never
+    # lazy-load through this session
+    db.refresh(teacher)
+    db.expunge(teacher)
+    app.dependency_overrides[get_current_user] = lambda: teacher
+
+    try:
+        latencies, failures, wall = asyncio.run(run(app, args, seeded))
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        delete_users(db, [teacher.id])
+        db.close()
+
+    model = f"fake server at {args.llm_url}" if args.llm_url else (
+        f"in-process fake, {args.latency:.2f}s +/- {args.jitter:.2f}s per call"
+    )
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {model}")
+    print(f"  completed      {len(latencies)}  ({len(failures)} failed)")
+    print(f"  wall time      {wall:8.2f} s")
+    print(f"  throughput     {len(latencies) / wall:8.2f} req/s")
+    if latencies:
+        print(f"  latency mean   {statistics.mean(latencies) * 1000:8.0f} ms")
+        for pct in (50, 95, 99):
+            print(f"  latency p{pct:<2}    {percentile(latencies, pct) * 1000:8.0f} ms")
+    for status, body in failures[:5]:
+        print(f"  failure {status}: {body}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Seeded synthetic school data for benchmarks.
+
+generate_school() builds an admin plus N teachers, each with classes of
+students who have a year's worth of marked writing: Writing rows with
+writing ages and feedback, a CriteriaMark per assignment criterion, and
+AnalysisFeedback ratings on a share of them. The same seed always gives
+the same school, so timings and query counts compare across runs.
+
+Rows go in with multi-row INSERT ... RETURNING, so a school of a few
+thousand writings takes seconds rather than minutes to build.
+
+Run it directly to fill a database for manual testing:
+    python benchmarks/school_data.py --database-url URL [--teachers 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models import (
+    AnalysisFeedback,
+    Assignment,
+    Class,
+    Criteria,
+    CriteriaMark,
+    Student,
+    User,
+    Writing,
+)
+
+FIRST_NAMES = "Amara Ben Chloe Dev Ella Finn Grace Harry Isla Jack Kai Lily Max Noah Olivia Priya Ravi Sofia Theo Zara".split()
+LAST_NAMES = "Ahmed Brown Clarke Davies Evans Green Hughes Jones Khan Lewis Patel Smith Taylor Walker Wilson".split()
+GENRES = ["Narrative", "Persuasive", "Non-chronological report", "Recount", "Poetry", "Letter"]
+CRITERIA = [
+    "Uses expanded noun phrases",
+    "Uses fronted adverbials with commas",
+    "Organises ideas into paragraphs",
+    "Punctuates direct speech accurately",
+    "Uses a range of conjunctions",
+    "Spells year-group words correctly",
+    "Chooses vocabulary for effect",
+    "Varies sentence length and openers",
+]
+SENTENCES = [
+    "The wind howled through the crooked trees.",
+    "Suddenly, a small fox darted across the path.",
+    "We should ban single-use plastic because it harms sea creatures.",
+    "Firstly, the castle was built on a steep hill.",
+    "\"Where are you going?\" asked Mum.",
+    "Although it was raining, we played outside all afternoon.",
+    "Volcanoes form where tectonic plates meet.",
+    "My favourite part of the trip was the boat ride.",
+    "The glittering lake shimmered in the morning sun.",
+    "In conclusion, school uniforms help everyone feel equal.",
+]
+STRENGTHS = [
+    "Uses vivid adjectives",
+    "Varies sentence openers",
+    "Organises ideas clearly",
+    "Uses punctuation accurately",
+]
+DEVELOPMENT = [
+    "Extend sentences with conjunctions",
+    "Use paragraphs for new ideas",
+    "Check spelling of common words",
+    "Add more detail about feelings",
+]
+
+
+def _insert(db: Session, model, rows: list[dict]) -> list[int]:
+    if not rows:
+        return []
+    return list(
+        db.scalars(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+    )
+
+
+def _feedback_text(rng: random.Random, text: str) -> str:
+    words = text.split()
+
+    def quote():
+        start = rng.randint(0, max(0, len(words) - 4))
+        return " ".join(words[start:start + 4])
+
+    strengths = "\n".join(f'- {s} (Example: "{quote()}")' for s in rng.sample(STRENGTHS, 3))
+    development = "\n".join(f'- {d} (Example: "{quote()}")' for d in rng.sample(DEVELOPMENT, 3))
+    return f"Strengths:\n{strengths}\n\nAreas for Development:\n{development}"
+
+
+def generate_school(
+    db: Session,
+    teachers: int = 3,
+    classes_per_teacher: int = 3,
+    students_per_class: int = 30,
+    writings_per_student: int = 24,
+    assignments_per_class: int = 6,
+    criteria_per_assignment: int = 4,
+    feedback_rate: float = 0.3,
+    seed: int = 7,
+) -> dict:
+    """
+    Build a school and commit it. Returns the ids benchmarks need:
+    admin_id, teacher_ids, class_ids and student_ids (both keyed by
+    teacher), plus row counts.
+    """
+    rng = random.Random(seed)
+    tag = time.time_ns()
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=365)
+
+    admin_id, *teacher_ids = _insert(db, User, [
+        {
+            "first_name": "Teacher" if i else "Admin",
+            "last_name": str(i),
+            "email": f"bench-{tag}-{i}@example.com",
+            "school_name": "Benchmark Primary",
+            "password_hash": f"bench-{tag}-{i}",
+            "is_admin": i == 0,
+            "created_at": start,
+        }
+        for i in range(teachers + 1)
+    ])
+
+    class_ids, student_ids = {}, {}
+    writing_count = mark_count = feedback_count = 0
+    for teacher_id in teacher_ids:
+        class_ids[teacher_id] = _insert(db, Class, [
+            {
+                "name": f"Class {teacher_id}-{c + 1}",
+                "year_group": f"Year {3 + c % 4}",
+                "teacher_id": teacher_id,
+                "created_at": start,
+            }
+            for c in range(classes_per_teacher)
+        ])
+        student_ids[teacher_id] = []
+
+        for class_id in class_ids[teacher_id]:
+            assignment_ids = _insert(db, Assignment, [
+                {
+                    "title": f"Assignment {a + 1}",
+                    "genre": GENRES[a % len(GENRES)],
+                    "curriculum": "UK",
+                    "class_id": class_id,
+                    "created_at": start + timedelta(days=a * 365 // assignments_per_class),
+                }
+                for a in range(assignments_per_class)
+            ])
+            criteria = {
+                assignment_id: _insert(db, Criteria, [
+                    {"assignment_id": assignment_id, "description": description}
+                    for description in rng.sample(CRITERIA, criteria_per_assignment)
+                ])
+                for assignment_id in assignment_ids
+            }
+
+            students = _insert(db, Student, [
+                {
+                    "student_id": f"S{class_id:04d}{s:03d}",
+                    "first_name": rng.choice(FIRST_NAMES),
+                    "last_name": rng.choice(LAST_NAMES),
+                    "date_of_birth": date(2014 + s % 3, 1 + s % 12, 1 + s % 28),
+                    "class_id": class_id,
+                    "created_at": start,
+                }
+                for s in range(students_per_class)
+            ])
+            student_ids[teacher_id].extend(students)
+
+            writings, scores = [], []
+            for student_id in students:
+                ability = rng.uniform(0.3, 0.9)
+                for w in range(writings_per_student):
+                    assignment_id = assignment_ids[w % assignments_per_class]
+                    text = " ".join(rng.choices(SENTENCES, k=rng.randint(6, 14)))
+                    marks = [
+                        min(2, max(0, round(rng.gauss(ability * 2, 0.6))))
+                        for _ in criteria[assignment_id]
+                    ]
+                    scores.append((assignment_id, marks))
+                    writings.append({
+                        "filename": f"page-{student_id}-{w}.jpg",
+                        "text_content": text,
+                        "writing_age": f"{rng.randint(7, 11)} years {rng.randint(0, 11)} months",
+                        "feedback": _feedback_text(rng, text),
+                        "created_at": start + timedelta(days=w * 365 // writings_per_student, hours=rng.randint(8, 15)),
+                        "student_id": student_id,
+                        "assignment_id": assignment_id,
+                        "total_marks_percentage": round(100 * sum(marks) / (2 * len(marks)), 1),
+                    })
+            writing_ids = _insert(db, Writing, writings)
+
+            mark_rows, feedback_rows = [], []
+            for writing_id, row, (assignment_id, marks) in zip(writing_ids, writings, scores):
+                mark_rows.extend(
+                    {"writing_id": writing_id, "criteria_id": criteria_id, "score": score, "created_at": row["created_at"]}
+                    for criteria_id, score in zip(criteria[assignment_id], marks)
+                )
+                if rng.random() < feedback_rate:
+                    feedback_rows.append({
+                        "writing_id": writing_id,
+                        "is_helpful": rng.random() < 0.8,
+                        "writing_age_accurate": rng.random() < 0.7,
+                        "strengths_accurate": rng.random() < 0.8,
+                        "development_accurate": rng.random() < 0.75,
+                        "criteria_accurate": rng.random() < 0.7,
+                        "created_at": row["created_at"] + timedelta(hours=1),
+                    })
+            if mark_rows:
+                db.execute(insert(CriteriaMark), mark_rows)
+            if feedback_rows:
+                db.execute(insert(AnalysisFeedback), feedback_rows)
+            writing_count += len(writing_ids)
+            mark_count += len(mark_rows)
+            feedback_count += len(feedback_rows)
+
+    db.commit()
+    return {
+        "admin_id": admin_id,
+        "teacher_ids": teacher_ids,
+        "class_ids": class_ids,
+        "student_ids": student_ids,
+        "writings": writing_count,
+        "marks": mark_count,
+        "feedback": feedback_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--teachers", type=int, default=3)
+    parser.add_argument("--classes", type=int, default=3, help="classes per teacher")
+    parser.add_argument("--students", type=int, default=30, help="students per class")
+    parser.add_argument("--writings", type=int, default=24, help="writings per student")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from database import Base
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    begin = time.perf_counter()
+    school = generate_school(
+        db, args.teachers, args.classes, args.students, args.writings, seed=args.seed
+    )
+    print(
+        f"{len(school['teacher_ids'])} teachers, "
+        f"{sum(len(ids) for ids in school['student_ids'].values())} students, "
+        f"{school['writings']} writings, {school['marks']} marks, "
+        f"{school['feedback']} feedback in {time.perf_counter() - begin:.1f} s"
+    )
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Measure how long `import app` takes using `python -X importtime` and fail
+when it exceeds the budget in startup_budget.json.
+
+Usage:
+    python benchmarks/startup_importtime.py [--runs 5] [--top 15]
+
+Two checks run against the budget:
+- the median cumulative import time of `app` must stay under max_import_ms
+- none of the deferred_modules may be imported at startup; they belong to
+  individual routes and are imported on first use
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_importtime() -> list[tuple[int, int, int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise SystemExit("import app failed")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((int(self_us), int(cumulative_us), len(indent), module))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+
+    totals = []
+    entries = []
+    for _ in range(args.runs):
+        entries = run_importtime()
+        app_entry = next(e for e in entries if e[3] == "app" and e[2] == 1)
+        totals.append(app_entry[1] / 1000)
+
+    median_ms = statistics.median(totals)
+    print(f"import app: median {median_ms:.0f} ms over {args.runs} runs (budget {budget['max_import_ms']} ms)")
+
+    print("\nHeaviest top-level imports:")
+    top_level = sorted((e for e in entries if e[2] <= 3), key=lambda e: e[1], reverse=True)
+    for _, cumulative_us, _, module in top_level[: args.top]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {module}")
+
+    failures = []
+    if median_ms > budget["max_import_ms"]:
+        failures.append(f"startup import took {median_ms:.0f} ms, budget is {budget['max_import_ms']} ms")
+
+    imported = {e[3].split(".")[0] for e in entries}
+    for module in budget.get("deferred_modules", []):
+        if module in imported:
+            failures.append(f"{module} is imported at startup but should be deferred")
+
+    if failures:
+        print("\nStartup budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
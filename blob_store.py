@@ -0,0 +1,121 @@
+"""
+Content-addressed storage for uploaded files.
+
+Blobs are stored under the SHA-256 of their bytes, so the same page
+uploaded twice is kept once, and a stored blob never changes: its key
+doubles as an ETag.
+
+BLOB_STORE selects the backend:
+
+- "local" (default) writes files under BLOB_STORE_PATH, fanned out by
+  the first two hex digits of the key;
+- "s3" keeps them in BLOB_S3_BUCKET. BLOB_S3_ENDPOINT points it at an
+  S3-compatible server such as MinIO instead of AWS. Needs boto3, which
+  is only imported when this backend is selected.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+
+def blob_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalBlobStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, data: bytes) -> str:
+        key = blob_key(data)
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return key
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore:
+    def __init__(self, bucket: str, endpoint_url: str = None, prefix: str = ""):
+        import boto3
+
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except ClientError:
+            return False
+
+    def put(self, data: bytes) -> str:
+        key = blob_key(data)
+        if not self.exists(key):
+            self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+        return key
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"].read()
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+
+def _local_store():
+    return LocalBlobStore(os.getenv("BLOB_STORE_PATH", os.path.join("instance", "blobs")))
+
+
+def _s3_store():
+    return S3BlobStore(
+        os.environ["BLOB_S3_BUCKET"],
+        endpoint_url=os.getenv("BLOB_S3_ENDPOINT") or None,
+        prefix=os.getenv("BLOB_S3_PREFIX", "blobs/"),
+    )
+
+
+# BLOB_STORE name -> factory returning a store with put/get/exists/delete
+BACKENDS = {
+    "local": _local_store,
+    "s3": _s3_store,
+}
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    backend = os.getenv("BLOB_STORE", "local")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown BLOB_STORE {backend!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend]()
@@ -0,0 +1,395 @@
+"""
+Class feedback reports for an assignment.
+
+Generating a report costs a gpt-4o call, so the result is stored in
+ClassFeedbackReport together with a fingerprint of the submissions and
+marks it was built from. Requests serve the stored report until the
+fingerprint changes, and new marking schedules a debounced background
+refresh so the next teacher to open the report gets it straight away.
+With LLM_BATCH set, the refresh is queued for the next llm_batch batch
+instead, and the report is stored when the batch comes back.
+
+The prompt is built from summarise_class(), a fixed-size summary of the
+whole class (criteria score distributions, writing ages, clustered
+feedback themes) rather than from a sample of individual submissions.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import llm_batch
+from background import Debouncer
+from llm import complete
+from models import Assignment, ClassFeedbackReport, Criteria, CriteriaMark, Writing
+
+logger = logging.getLogger(__name__)
+
+
+# Bump when the prompt or summary format changes to invalidate stored reports
+REPORT_VERSION = 2
+
+MODEL_NAME = "gpt-4o"
+
+# Seconds to wait after marking lands before regenerating, so a teacher
+# marking a whole class triggers one refresh rather than one per script
+REFRESH_DELAY = float(os.getenv("CLASS_FEEDBACK_REFRESH_DELAY", 60))
+
+# Keep the prompt summary a fixed size whatever the class size
+THEMES_PER_SECTION = 5
+THEME_SIMILARITY = 0.5
+THEME_EXAMPLE_CHARS = 160
+CRITERIA_EACH_END = 6  # weakest and strongest criteria sent to the model
+
+WRITING_AGE_PATTERN = re.compile(r"\s*(\d+)\s*years?(?:\s*(\d+)\s*months?)?", re.I)
+
+STOPWORDS = frozenset(
+    "the and for with their use uses using used good some more most very "
+    "well can could should would able this that when into from are was".split()
+)
+
+EMPTY_REPORT = {
+    "strengths": ["No submissions to analyze"],
+    "areas_for_development": ["No submissions to analyze"],
+    "practice_activities": ["No submissions to analyze"],
+}
+
+
+def submission_fingerprint(db: Session, assignment: Assignment) -> tuple[str, int]:
+    """
+    sha256 over everything the report depends on: the assignment details,
+    each submission's writing age, feedback and total, and every criteria
+    mark. Returns (fingerprint, submission_count).
+    """
+    writings = (
+        db.query(
+            Writing.id,
+            Writing.writing_age,
+            Writing.feedback,
+            Writing.total_marks_percentage,
+        )
+        .filter(Writing.assignment_id == assignment.id)
+        .order_by(Writing.id)
+        .all()
+    )
+    marks = (
+        db.query(CriteriaMark.writing_id, CriteriaMark.criteria_id, CriteriaMark.score)
+        .join(Writing, CriteriaMark.writing_id == Writing.id)
+        .filter(Writing.assignment_id == assignment.id)
+        .order_by(CriteriaMark.writing_id, CriteriaMark.criteria_id, CriteriaMark.id)
+        .all()
+    )
+
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [REPORT_VERSION, assignment.title, assignment.genre, assignment.curriculum],
+            default=str,
+        ).encode()
+    )
+    for row in writings:
+        digest.update(json.dumps(list(row), default=str).encode())
+    digest.update(b"|")
+    for row in marks:
+        digest.update(json.dumps(list(row)).encode())
+    return digest.hexdigest(), len(writings)
+
+
+def _years(writing_age: str):
+    """Decimal years from a writing age such as "9 years 3 months"."""
+    match = WRITING_AGE_PATTERN.match(writing_age or "")
+    if not match:
+        return None
+    return int(match.group(1)) + int(match.group(2) or 0) / 12
+
+
+def feedback_bullets(feedback: str) -> tuple[list[str], list[str]]:
+    """Split a stored feedback string into (strengths, development) bullets."""
+    strengths, development = [], []
+    section = strengths
+    for line in (feedback or "").splitlines():
+        stripped = line.strip()
+        lowered = stripped.lower()
+        if "development" in lowered and not stripped.startswith(("-", "•")):
+            section = development
+        elif "strength" in lowered and not stripped.startswith(("-", "•")):
+            section = strengths
+        elif stripped.startswith(("- ", "• ")):
+            section.append(stripped[2:].strip())
+    return strengths, development
+
+
+def _theme_words(bullet: str) -> frozenset:
+    # The label before a colon ("Spelling: ...") carries the theme; fall
+    # back to the whole bullet when there is none
+    head = bullet.split(":", 1)[0] if ":" in bullet[:60] else bullet
+    words = re.findall(r"[a-z]+", head.lower())
+    return frozenset(w for w in words if w not in STOPWORDS and len(w) > 2)
+
+
+def cluster_bullets(bullets: list[str], limit: int = THEMES_PER_SECTION) -> list[dict]:
+    """
+    Group similar feedback bullets into themes. Leader clustering: each
+    bullet joins the first theme whose words overlap it by Jaccard >=
+    THEME_SIMILARITY, otherwise it starts a new theme. Returns the `limit`
+    largest themes with a count and a representative bullet.
+    """
+    themes = []
+    for bullet in bullets:
+        words = _theme_words(bullet)
+        if not words:
+            continue
+        for theme in themes:
+            overlap = len(words & theme["words"]) / len(words | theme["words"])
+            if overlap >= THEME_SIMILARITY:
+                theme["count"] += 1
+                break
+        else:
+            themes.append({"words": words, "count": 1, "example": bullet})
+
+    themes.sort(key=lambda t: t["count"], reverse=True)
+    return [
+        {"theme": t["example"][:THEME_EXAMPLE_CHARS], "count": t["count"]}
+        for t in themes[:limit]
+    ]
+
+
+def summarise_class(db: Session, assignment: Assignment) -> dict:
+    """
+    Summary of every submission for the prompt. Criteria scores and
+    writing ages are aggregated in SQL; only the feedback column is read
+    row by row, for theme clustering. The output size depends on the
+    number of criteria and themes, not on the size of the class.
+    """
+    criteria_rows = (
+        db.query(
+            Criteria.description,
+            func.avg(CriteriaMark.score),
+            func.count(CriteriaMark.id),
+            func.sum(case((CriteriaMark.score == 0, 1), else_=0)),
+            func.sum(case((CriteriaMark.score == 1, 1), else_=0)),
+            func.sum(case((CriteriaMark.score == 2, 1), else_=0)),
+        )
+        .join(CriteriaMark, CriteriaMark.criteria_id == Criteria.id)
+        .join(Writing, CriteriaMark.writing_id == Writing.id)
+        .filter(Writing.assignment_id == assignment.id)
+        .group_by(Criteria.id, Criteria.description)
+        .all()
+    )
+    criteria = sorted(
+        (
+            {
+                "criterion": description,
+                "avg_score": round(float(avg or 0), 2),
+                "marked": count,
+                "not_met": int(not_met or 0),
+                "partially_met": int(partial or 0),
+                "met": int(met or 0),
+            }
+            for description, avg, count, not_met, partial, met in criteria_rows
+        ),
+        key=lambda c: c["avg_score"],
+    )
+
+    # Distinct writing ages are few, so group them in SQL and parse here
+    ages = {}
+    age_total, age_count = 0.0, 0
+    for writing_age, count in (
+        db.query(Writing.writing_age, func.count(Writing.id))
+        .filter(Writing.assignment_id == assignment.id)
+        .group_by(Writing.writing_age)
+    ):
+        years = _years(writing_age)
+        if years is None:
+            continue
+        bucket = f"{int(years)} years"
+        ages[bucket] = ages.get(bucket, 0) + count
+        age_total += years * count
+        age_count += count
+
+    strengths, development = [], []
+    submission_count = 0
+    for (feedback,) in (
+        db.query(Writing.feedback)
+        .filter(Writing.assignment_id == assignment.id)
+        .yield_per(200)
+    ):
+        submission_count += 1
+        row_strengths, row_development = feedback_bullets(feedback)
+        strengths.extend(row_strengths)
+        development.extend(row_development)
+
+    if len(criteria) > 2 * CRITERIA_EACH_END:
+        criteria = criteria[:CRITERIA_EACH_END] + criteria[-CRITERIA_EACH_END:]
+
+    return {
+        "submissions": submission_count,
+        "avg_writing_age": round(age_total / age_count, 1) if age_count else None,
+        "writing_age_distribution": dict(
+            sorted(ages.items(), key=lambda item: int(item[0].split()[0]))
+        ),
+        "criteria": criteria,
+        "strength_themes": cluster_bullets(strengths),
+        "development_themes": cluster_bullets(development),
+    }
+
+
+def report_request(db: Session, assignment: Assignment) -> dict:
+    """chat.completions kwargs asking for the report, from a class summary."""
+    summary = summarise_class(db, assignment)
+
+    analysis_prompt = f"""Analyze this class's writing submissions for a specific assignment and provide exactly:
+
+    1. Three clear class strengths
+    2. Three specific areas for development
+    3. Four practical practice activities
+
+    Format your response as a JSON object with exactly these keys:
+    {{
+        "strengths": [3 strength items],
+        "areas_for_development": [3 development items],
+        "practice_activities": [4 activity items]
+    }}
+
+    The user message summarises every submission: average score per
+    success criterion (0 = not met, 1 = partially met, 2 = met) with the
+    number of pupils at each score, the spread of writing ages, and the
+    most common strength and development themes from individual feedback
+    with how many pupils each applies to.
+
+    Assignment Details:
+    Title: {assignment.title}
+    Genre: {assignment.genre}
+    Curriculum: {assignment.curriculum}
+    Number of Submissions Analyzed: {summary["submissions"]}"""
+
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": analysis_prompt},
+            {"role": "user", "content": json.dumps(summary)},
+        ],
+        "response_format": {"type": "json_object"},
+    }
+
+
+def parse_report(content: str) -> dict:
+    analysis = json.loads(content)
+    return {
+        "strengths": analysis.get("strengths", ["No strengths identified"]),
+        "areas_for_development": analysis.get(
+            "areas_for_development", ["No areas identified"]
+        ),
+        "practice_activities": analysis.get(
+            "practice_activities", ["No activities suggested"]
+        ),
+    }
+
+
+def generate_report(db: Session, assignment: Assignment) -> dict:
+    """Summarise the whole class and ask the model for a report."""
+    response = complete(
+        "class_feedback",
+        # Also runs as a background refresh, outside any request
+        teacher_id=assignment.class_group.teacher_id,
+        **report_request(db, assignment),
+    )
+    return parse_report(response.choices[0].message.content)
+
+
+def _store_report(db: Session, assignment_id: int, fingerprint: str, count: int, report: dict):
+    stored = db.query(ClassFeedbackReport).filter_by(assignment_id=assignment_id).first()
+    if stored is None:
+        stored = ClassFeedbackReport(assignment_id=assignment_id)
+        db.add(stored)
+    stored.fingerprint = fingerprint
+    stored.submission_count = count
+    stored.report = json.dumps(report)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker stored a report for this assignment first
+        db.rollback()
+
+
+def get_report(db: Session, assignment: Assignment, fingerprint: str = None) -> dict:
+    """The stored report if still current, otherwise a freshly generated one."""
+    count = None
+    if fingerprint is None:
+        fingerprint, count = submission_fingerprint(db, assignment)
+
+    stored = (
+        db.query(ClassFeedbackReport.fingerprint, ClassFeedbackReport.report)
+        .filter(ClassFeedbackReport.assignment_id == assignment.id)
+        .first()
+    )
+    if stored and stored.fingerprint == fingerprint:
+        return json.loads(stored.report)
+
+    if count is None:
+        count = db.query(Writing.id).filter(Writing.assignment_id == assignment.id).count()
+    if not count:
+        return EMPTY_REPORT
+
+    report = generate_report(db, assignment)
+    _store_report(db, assignment.id, fingerprint, count, report)
+    return report
+
+
+def queue_report(db: Session, assignment: Assignment):
+    """Queue the report for the next llm_batch batch unless the stored one is current."""
+    fingerprint, count = submission_fingerprint(db, assignment)
+    stored = (
+        db.query(ClassFeedbackReport.fingerprint)
+        .filter(ClassFeedbackReport.assignment_id == assignment.id)
+        .scalar()
+    )
+    if stored == fingerprint or not count:
+        return
+    llm_batch.enqueue(
+        db,
+        "class_feedback",
+        assignment.id,
+        report_request(db, assignment),
+        teacher_id=assignment.class_group.teacher_id,
+        context={"fingerprint": fingerprint, "count": count},
+    )
+    db.commit()
+
+
+def _apply_batch_result(db: Session, request, content: str):
+    context = json.loads(request.context)
+    assignment = db.get(Assignment, request.target_id)
+    if assignment is None:
+        raise RuntimeError("assignment was deleted")
+    # Marking that landed while the batch ran has queued a newer report
+    if submission_fingerprint(db, assignment)[0] != context["fingerprint"]:
+        logger.info(f"Dropping out-of-date batch report for assignment {assignment.id}")
+        return
+    _store_report(db, assignment.id, context["fingerprint"], context["count"], parse_report(content))
+
+
+llm_batch.register_handler("class_feedback", _apply_batch_result)
+
+
+def _refresh(db: Session, assignment_id: int):
+    assignment = db.query(Assignment).get(assignment_id)
+    if not assignment:
+        return
+    if llm_batch.enabled():
+        queue_report(db, assignment)
+    else:
+        get_report(db, assignment)
+
+
+_refresher = Debouncer("class feedback refresh", _refresh, REFRESH_DELAY)
+
+
+def schedule_refresh(assignment_id: int):
+    """Regenerate the report in the background once marking settles."""
+    _refresher.schedule(assignment_id)
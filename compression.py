@@ -0,0 +1,207 @@
+import gzip
+import io
+import logging
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+# Responses smaller than this are cheaper to send as-is than to compress
+DEFAULT_MINIMUM_SIZE = 1024
+
+# Media that is already compressed (or streamed to the client as a download)
+# gains nothing from another pass and only costs CPU.
+EXCLUDED_CONTENT_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/pdf",
+    "application/octet-stream",
+    "application/vnd.openxmlformats-officedocument",
+    "text/csv",
+    "text/event-stream",
+)
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Pick the best encoding the client accepts, preferring brotli over gzip."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if token:
+            accepted[token] = quality
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return not content_type.startswith(EXCLUDED_CONTENT_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Negotiated brotli/gzip compression for HTML and JSON responses.
+
+    Bodies under `minimum_size`, already-encoded responses and the content
+    types in EXCLUDED_CONTENT_TYPES (images, spreadsheets, CSV exports) are
+    passed through untouched.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = DEFAULT_MINIMUM_SIZE,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(
+            self.app, encoding, self.minimum_size, self.gzip_level, self.brotli_quality
+        )
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app, encoding, minimum_size, gzip_level, brotli_quality):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.send = None
+        self.initial_message = None
+        self.started = False
+        self.passthrough = False
+        self.buffer = None
+        self.compressor = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _start_compressor(self):
+        if self.encoding == "br":
+            self.compressor = brotli.Compressor(quality=self.brotli_quality)
+        else:
+            self.buffer = io.BytesIO()
+            self.compressor = gzip.GzipFile(
+                mode="wb", fileobj=self.buffer, compresslevel=self.gzip_level
+            )
+
+    def _compress(self, data: bytes, finish: bool) -> bytes:
+        if self.encoding == "br":
+            chunk = self.compressor.process(data) if data else b""
+            if finish:
+                chunk += self.compressor.finish()
+            else:
+                chunk += self.compressor.flush()
+            return chunk
+
+        if data:
+            self.compressor.write(data)
+        if finish:
+            self.compressor.close()
+        else:
+            self.compressor.flush()
+        chunk = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return chunk
+
+    async def send_compressed(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the headers back until we have seen the first body chunk
+            self.initial_message = message
+            self.passthrough = not is_compressible(
+                Headers(raw=message["headers"])
+            )
+            return
+
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            self._start_compressor()
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                compressed = self._compress(body, finish=False)
+            else:
+                compressed = self._compress(body, finish=True)
+                headers["Content-Length"] = str(len(compressed))
+
+            await self.send(self.initial_message)
+            await self.send(
+                {
+                    "type": "http.response.body",
+                    "body": compressed,
+                    "more_body": more_body,
+                }
+            )
+            return
+
+        await self.send(
+            {
+                "type": "http.response.body",
+                "body": self._compress(body, finish=not more_body),
+                "more_body": more_body,
+            }
+        )
@@ -1,7 +1,10 @@
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy import text, create_engine
+from sqlalchemy import text, create_engine, event, inspect, Boolean, DateTime, Integer, LargeBinary, String
 from sqlalchemy.exc import OperationalError
 from config import settings as env_settings
+import base64
+import hashlib
+import os
 import time
 import logging
 
@@ -12,14 +15,40 @@ logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+
+def pool_settings() -> dict:
+    """
+    Size the connection pool so that all web workers together stay inside
+    DB_MAX_CONNECTIONS (leave headroom below Postgres' max_connections).
+    DB_POOL_SIZE / DB_MAX_OVERFLOW override the computed values.
+    """
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+    budget = int(os.getenv("DB_MAX_CONNECTIONS", 80))
+    per_worker = max(2, min(25, budget // workers))
+
+    pool_size = max(1, per_worker * 2 // 5)
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", pool_size)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", per_worker - pool_size)),
+    }
+
+
 engine = create_engine(env_settings.DATABASE_URL,
     pool_pre_ping=True,
     pool_recycle=1800,
-    pool_size=10,
-    max_overflow=15,
-    pool_timeout=30
+    pool_timeout=30,
+    **pool_settings()
 )
 
+if engine.dialect.name == "sqlite":
+    # SQLite ignores ON DELETE CASCADE unless foreign keys are switched on
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
 SessionLocal = sessionmaker(bind=engine,autoflush=False) 
 
 
@@ -31,6 +60,58 @@ def get_db():
         db.close()
 
 
+# (table, column, type) pairs added to existing databases on startup
+SCHEMA_PATCHES = [
+    ("analysis_feedback", "criteria_accurate", Boolean()),
+    ("user", "school_logo_data", LargeBinary()),
+    ("user", "school_logo_hash", String(64)),
+    ("user", "daily_token_budget", Integer()),
+    ("writing", "highlights_revision", Integer()),
+    ("remark_job", "batch", Boolean()),
+    ("remark_job", "worker", String(32)),
+    ("image_blob", "last_used_at", DateTime()),
+]
+
+
+def _apply_schema_patches(connection):
+    inspector = inspect(connection)
+    for table, column, column_type in SCHEMA_PATCHES:
+        if not inspector.has_table(table):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        if column in existing:
+            continue
+        ddl_type = column_type.compile(dialect=connection.dialect)
+        connection.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl_type}'))
+        logger.info(f"Added missing '{column}' column to {table} table")
+
+
+def _migrate_school_logos(connection):
+    """Move legacy base64 logos into the binary column, keyed by content hash."""
+    rows = connection.execute(text(
+        'SELECT id, school_logo FROM "user" '
+        "WHERE school_logo IS NOT NULL AND school_logo_data IS NULL"
+    )).fetchall()
+    for user_id, encoded in rows:
+        try:
+            data = base64.b64decode(encoded)
+        except (ValueError, TypeError):
+            logger.warning(f"Skipping undecodable school logo for user {user_id}")
+            continue
+        connection.execute(
+            text(
+                'UPDATE "user" SET school_logo_data = :data, school_logo_hash = :hash, '
+                "school_logo = NULL WHERE id = :id"
+            ),
+            {"data": data, "hash": hashlib.sha256(data).hexdigest(), "id": user_id},
+        )
+    if rows:
+        logger.info(f"Migrated {len(rows)} school logos to binary storage")
+
+
+SCHEMA_LOCK_KEY = 0x736368656D61
+
+
 def check_updates():
     """Run on Startup to patch missing schema fields."""
     max_retries = 3
@@ -39,15 +120,20 @@ def check_updates():
     for attempt in range(max_retries):
         try:
             with engine.begin() as connection:
-                result = connection.execute(text(
-                    "SELECT column_name FROM information_schema.columns "
-                    "WHERE table_name='analysis_feedback' AND column_name='criteria_accurate'"
-                ))
-                if not result.fetchone():
-                    connection.execute(text(
-                        "ALTER TABLE analysis_feedback ADD COLUMN criteria_accurate BOOLEAN"
-                    ))
-                    logger.info("Added missing 'criteria_accurate' column to analysis_feedback table")
+                if connection.dialect.name == "postgresql":
+                    # Instances starting together take turns; the later
+                    # ones find nothing left to do
+                    connection.execute(
+                        text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY}
+                    )
+                # Create tables added since the database was provisioned
+                Base.metadata.create_all(bind=connection, checkfirst=True)
+                _apply_schema_patches(connection)
+                _migrate_school_logos(connection)
+
+                from wagoll_library import ensure_search_index
+
+                ensure_search_index(connection)
             break
 
         except OperationalError as e:
@@ -60,4 +146,4 @@ def check_updates():
         except Exception as e:
             logger.error(f"Error updating database schema: {str(e)}")
         
-        break
\ No newline at end of file
+        break
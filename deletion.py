@@ -0,0 +1,181 @@
+"""
+Set-based deletion of users, classes, students, assignments and writing.
+
+Each entry point issues one DELETE per dependent table, children first,
+with the victims selected by subquery, so the statement count is fixed
+however many rows go. The foreign keys also carry ON DELETE CASCADE as a
+backstop, but the explicit order means the service does not depend on the
+database enforcing it (SQLite only does with PRAGMA foreign_keys).
+
+Root ids are processed in chunks of DELETE_CHUNK_SIZE, one transaction per
+chunk, so deleting a large account does not hold locks on every table for
+the whole operation. delete_in_background() runs the same work on a
+worker thread for requests that should not wait for it.
+"""
+import logging
+import os
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from background import run_in_background
+from models import (
+    AnalysisFeedback,
+    Assignment,
+    Class,
+    ClassFeedbackReport,
+    Criteria,
+    CriteriaMark,
+    GeneratedWagoll,
+    Highlight,
+    LLMBatchRequest,
+    LLMUsage,
+    PageImage,
+    QuoteAnchor,
+    RemarkJob,
+    Student,
+    TeacherActivity,
+    User,
+    WagollExample,
+    Writing,
+)
+
+logger = logging.getLogger(__name__)
+
+
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", 500))
+
+# Tables whose rows belong to a single writing sample. Page images stay in
+# the blob store until page_images.prune_blobs() finds them unused.
+WRITING_CHILDREN = (CriteriaMark, AnalysisFeedback, Highlight, QuoteAnchor, PageImage)
+
+
+def _delete(model, condition):
+    return delete(model).where(condition).execution_options(synchronize_session=False)
+
+
+def _update(model, condition, values):
+    return (
+        update(model)
+        .where(condition)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def writing_statements(writing_ids):
+    """`writing_ids` is a list or a select of writing ids."""
+    return [
+        *(_delete(model, model.writing_id.in_(writing_ids)) for model in WRITING_CHILDREN),
+        _delete(Writing, Writing.id.in_(writing_ids)),
+    ]
+
+
+def student_statements(student_ids):
+    writings = select(Writing.id).where(Writing.student_id.in_(student_ids))
+    return [
+        *writing_statements(writings),
+        _delete(Student, Student.id.in_(student_ids)),
+    ]
+
+
+def assignment_statements(assignment_ids):
+    criteria = select(Criteria.id).where(Criteria.assignment_id.in_(assignment_ids))
+    return [
+        _delete(CriteriaMark, CriteriaMark.criteria_id.in_(criteria)),
+        _delete(QuoteAnchor, QuoteAnchor.criteria_id.in_(criteria)),
+        _delete(Criteria, Criteria.assignment_id.in_(assignment_ids)),
+        _delete(ClassFeedbackReport, ClassFeedbackReport.assignment_id.in_(assignment_ids)),
+        _delete(GeneratedWagoll, GeneratedWagoll.assignment_id.in_(assignment_ids)),
+        # Submissions and saved examples outlive their assignment
+        _update(Writing, Writing.assignment_id.in_(assignment_ids), {"assignment_id": None}),
+        _update(
+            WagollExample,
+            WagollExample.assignment_id.in_(assignment_ids),
+            {"assignment_id": None},
+        ),
+        _delete(Assignment, Assignment.id.in_(assignment_ids)),
+    ]
+
+
+def class_statements(class_ids):
+    students = select(Student.id).where(Student.class_id.in_(class_ids))
+    assignments = select(Assignment.id).where(Assignment.class_id.in_(class_ids))
+    return [
+        *student_statements(students),
+        *assignment_statements(assignments),
+        _delete(Class, Class.id.in_(class_ids)),
+    ]
+
+
+def user_statements(user_ids):
+    classes = select(Class.id).where(Class.teacher_id.in_(user_ids))
+    return [
+        *class_statements(classes),
+        _delete(WagollExample, WagollExample.teacher_id.in_(user_ids)),
+        _delete(TeacherActivity, TeacherActivity.teacher_id.in_(user_ids)),
+        _update(LLMUsage, LLMUsage.teacher_id.in_(user_ids), {"teacher_id": None}),
+        _update(RemarkJob, RemarkJob.created_by.in_(user_ids), {"created_by": None}),
+        _update(LLMBatchRequest, LLMBatchRequest.teacher_id.in_(user_ids), {"teacher_id": None}),
+        _delete(User, User.id.in_(user_ids)),
+    ]
+
+
+PLANS = {
+    "writing": writing_statements,
+    "student": student_statements,
+    "assignment": assignment_statements,
+    "class": class_statements,
+    "user": user_statements,
+}
+
+
+def delete_records(db: Session, kind: str, ids, chunk_size: int = DELETE_CHUNK_SIZE) -> int:
+    """
+    Delete `ids` of `kind` ("writing", "student", "assignment", "class" or
+    "user") and everything that depends on them. Commits once per chunk and
+    returns the number of root rows deleted.
+    """
+    plan = PLANS[kind]
+    ids = sorted({int(i) for i in ids})
+    deleted = 0
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        try:
+            result = None
+            for statement in plan(chunk):
+                result = db.execute(statement)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        # The last statement of every plan deletes the root rows
+        deleted += result.rowcount or 0
+    logger.info(f"Deleted {deleted} {kind} records")
+    return deleted
+
+
+def delete_writings(db: Session, writing_ids) -> int:
+    return delete_records(db, "writing", writing_ids)
+
+
+def delete_students(db: Session, student_ids) -> int:
+    return delete_records(db, "student", student_ids)
+
+
+def delete_assignments(db: Session, assignment_ids) -> int:
+    return delete_records(db, "assignment", assignment_ids)
+
+
+def delete_classes(db: Session, class_ids) -> int:
+    return delete_records(db, "class", class_ids)
+
+
+def delete_users(db: Session, user_ids) -> int:
+    return delete_records(db, "user", user_ids)
+
+
+def delete_in_background(kind: str, ids):
+    """Queue a deletion to run after the response has been sent."""
+    ids = list(ids)
+    run_in_background(f"{kind} deletion", delete_records, kind, ids)
@@ -5,6 +5,7 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 from sqlalchemy.orm import Session
 from database import get_db
 from models import User
+import llm_usage
 from fastapi_login import LoginManager
 from config import settings as env_settings
 
@@ -30,6 +31,7 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
+    llm_usage.tag_request(request, user.id)
     return user
 
 
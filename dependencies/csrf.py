@@ -0,0 +1,23 @@
+# dependencies/csrf.py
+from fastapi import Request, HTTPException
+import secrets
+
+
+async def get_csrf_token(request: Request) -> str:
+    if "csrf_token" not in request.session:
+        request.session["csrf_token"] = secrets.token_urlsafe(32)
+    return request.session["csrf_token"]
+
+
+async def validate_csrf_token(request: Request, token: str):
+    session_token = request.session.get("csrf_token")
+    if not session_token:
+        raise HTTPException(status_code=403, detail="Missing CSRF token in session")
+
+    if len(token) != len(session_token):
+        raise HTTPException(status_code=403, detail="Invalid CSRF token length")
+
+    if not secrets.compare_digest(token, session_token):
+        raise HTTPException(status_code=403, detail="CSRF tokens do not match")
+
+    request.session["csrf_token"] = secrets.token_urlsafe(32)
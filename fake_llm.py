@@ -0,0 +1,340 @@
+"""
+Deterministic stand-in for the chat-completions API, for benchmarks and
+load tests that must not reach api.openai.com.
+
+respond() recognises each prompt the app sends (transcription, writing
+analysis, criteria marking, WAGOLL, class feedback) by its system message
+and returns canned content in the format that call site parses. Choices
+are seeded from a hash of the request, so the same request always gets
+the same answer, and the transcription and analysis of one page quote
+the same sample text.
+
+Two ways to use it:
+
+- in-process: LLM_PROVIDER=fake makes llm.get_client() return FakeClient;
+- over HTTP: run this module as a server and point the real OpenAI client
+  at it with LLM_BASE_URL=http://127.0.0.1:8900/v1.
+
+FAKE_LLM_LATENCY and FAKE_LLM_JITTER (seconds) add a delay to every
+completion to model the real API's response times.
+
+Usage:
+    python fake_llm.py [--port 8900] [--latency 0.8] [--jitter 0.3]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+
+MODEL = "fake-gpt"
+IMAGE_TOKENS = 1105
+
+SAMPLES = [
+    "On Saturday we went to the beach. The sand was warm and golden under my feet. "
+    "My brother built a huge castle with four towers and a moat. Suddenly a wave "
+    "crashed over it and washed the towers away! We laughed so much that my tummy hurt. "
+    "Afterwards we ate ice cream and watched the boats sail past the lighthouse.",
+    "The old house at the end of the lane had been empty for years. Its windows were "
+    "cracked and ivy crawled up the walls like green fingers. One foggy evening, Mia "
+    "noticed a light flickering in the attic. She crept closer, her heart thumping. "
+    "The door creaked open slowly, and a small grey cat blinked up at her.",
+    "Dear Mr Patel, I am writing to tell you why our school needs a vegetable garden. "
+    "Firstly, growing food teaches us where our meals come from. Secondly, gardening is "
+    "good exercise and helps us feel calm. Finally, we could share the vegetables with "
+    "families in our community. I hope you will agree with my ideas.",
+    "Dragons are enormous reptiles that live in mountain caves. They have scaly skin, "
+    "sharp claws and wings as wide as a bus. Most dragons eat goats, but some prefer "
+    "fish from icy rivers. Baby dragons hatch from eggs that must be kept warm by fire. "
+    "Did you know that a dragon can fly for three days without resting?",
+]
+
+STRENGTHS = [
+    "Uses vivid adjectives to describe the setting",
+    "Varies sentence openers to keep the reader interested",
+    "Organises ideas into a clear sequence",
+    "Uses punctuation accurately for exclamations and questions",
+    "Chooses precise verbs to show action",
+]
+
+DEVELOPMENT = [
+    "Extend sentences with conjunctions such as because and although",
+    "Use paragraphs to separate new ideas",
+    "Check spelling of common exception words",
+    "Add more detail about characters' feelings",
+    "Use commas to separate items in a list",
+]
+
+TASK_PATTERNS = [
+    ("transcribe", re.compile(r"transcrib", re.I)),
+    ("analysis", re.compile(r"WRITING AGE:")),
+    ("criteria", re.compile(r'"evaluations"')),
+    ("wagoll", re.compile(r"WAGOLL")),
+    ("class_feedback", re.compile(r'"practice_activities"')),
+]
+
+
+def _text(content) -> str:
+    """Flatten message content, keeping image URLs so they feed the seed."""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content or []:
+        if part.get("type") == "text":
+            parts.append(part.get("text", ""))
+        elif part.get("type") == "image_url":
+            parts.append(part.get("image_url", {}).get("url", ""))
+    return "\n".join(parts)
+
+
+def _image_key(messages: list[dict]) -> str:
+    """
+    Identify the uploaded page by its pixel size. /process transcribes a
+    contrast-enhanced copy but analyses the original, so hashing the bytes
+    would give the two calls different samples.
+    """
+    import base64
+    from PIL import Image
+
+    sizes = []
+    for m in messages:
+        if isinstance(m.get("content"), str):
+            continue
+        for part in m.get("content") or []:
+            url = part.get("image_url", {}).get("url", "") if part.get("type") == "image_url" else ""
+            if not url:
+                continue
+            try:
+                image = Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[-1])))
+                sizes.append("%dx%d" % image.size)
+            except Exception:
+                sizes.append(url)
+    return ",".join(sizes)
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def _task(system: str) -> str:
+    for task, pattern in TASK_PATTERNS:
+        if pattern.search(system):
+            return task
+    return "chat"
+
+
+def _sentences(text: str) -> list[str]:
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if len(s.split()) >= 3]
+
+
+def _quote(sentence: str, rng: random.Random) -> str:
+    words = sentence.rstrip(".!?").split()
+    length = min(len(words), rng.randint(3, 6))
+    start = rng.randint(0, len(words) - length)
+    return " ".join(words[start:start + length])
+
+
+def _criteria(system: str) -> list[str]:
+    block = system.split("Criteria to evaluate:")[-1]
+    block = block.split("Analyze the text")[0]
+    return [line.strip()[2:].strip() for line in block.splitlines() if line.strip().startswith("- ")]
+
+
+def respond(messages: list[dict]) -> str:
+    """Canned completion content for a chat-completions request."""
+    system = next((_text(m["content"]) for m in messages if m["role"] == "system"), "")
+    user = "\n".join(_text(m["content"]) for m in messages if m["role"] == "user")
+    task = _task(system)
+    rng = random.Random(_seed(user))
+    # Transcription and analysis of the same image share a sample
+    sample = SAMPLES[_seed(_image_key(messages) or user) % len(SAMPLES)]
+
+    if task == "transcribe":
+        return sample
+
+    if task == "analysis":
+        sentences = _sentences(sample)
+        strengths = rng.sample(STRENGTHS, 3)
+        development = rng.sample(DEVELOPMENT, 3)
+        lines = [f"WRITING AGE: {rng.randint(6, 12)} years {rng.randint(0, 11)} months", "", "Strengths:"]
+        lines += [f'- {s} (Example: "{_quote(rng.choice(sentences), rng)}")' for s in strengths]
+        lines += ["", "Areas for Development:"]
+        lines += [f'- {d} (Example: "{_quote(rng.choice(sentences), rng)}")' for d in development]
+        return "\n".join(lines)
+
+    if task == "criteria":
+        sentences = _sentences(user) or [user]
+        return json.dumps({
+            "evaluations": [
+                {
+                    "criterion": criterion,
+                    "score": rng.choice([0, 1, 1, 2, 2]),
+                    "justification": f'The writer shows this in "{_quote(rng.choice(sentences), rng)}".',
+                }
+                for criterion in _criteria(system)
+            ]
+        })
+
+    if task == "wagoll":
+        return json.dumps({
+            "exemplar": " ".join(SAMPLES[:2]),
+            "explanations": [
+                "Opens with a clear setting that hooks the reader.",
+                "Uses varied sentence lengths to build tension.",
+                "Every success criterion is demonstrated at least once.",
+            ],
+        })
+
+    if task == "class_feedback":
+        return json.dumps({
+            "strengths": rng.sample(STRENGTHS, 3),
+            "areas_for_development": rng.sample(DEVELOPMENT, 3),
+            "practice_activities": [
+                "Sentence-opener relay in pairs",
+                "Edit a paragraph for commas in lists",
+                "Describe a picture using five senses",
+                "Plan a story in four boxes before writing",
+            ],
+        })
+
+    return "OK"
+
+
+def _latency() -> float:
+    latency = float(os.getenv("FAKE_LLM_LATENCY", 0))
+    jitter = float(os.getenv("FAKE_LLM_JITTER", 0))
+    return max(0.0, latency + random.uniform(-jitter, jitter))
+
+
+def _prompt_tokens(content) -> int:
+    # Images are billed by size, not by the length of their base64
+    if isinstance(content, str):
+        return len(content) // 4
+    return sum(
+        IMAGE_TOKENS if part.get("type") == "image_url" else len(part.get("text", "")) // 4
+        for part in content or []
+    )
+
+
+def completion(request: dict) -> dict:
+    """A chat.completion response body for `request`, after the configured delay."""
+    time.sleep(_latency())
+    content = respond(request.get("messages", []))
+    return {
+        "id": f"chatcmpl-fake-{_seed(content) % 10**12}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model") or MODEL,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": _usage(request, content),
+    }
+
+
+def _usage(request: dict, content: str) -> dict:
+    prompt_tokens = sum(_prompt_tokens(m.get("content")) for m in request.get("messages", []))
+    completion_tokens = len(content) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def completion_chunks(request: dict):
+    """
+    chat.completion.chunk bodies for a stream=True request. A fifth of the
+    configured delay passes before the first chunk, the rest is spread
+    over the others, as with a real streamed reply.
+    """
+    latency = _latency()
+    content = respond(request.get("messages", []))
+    words = re.findall(r"\S+\s*", content) or [content]
+    pieces = ["".join(words[i:i + 3]) for i in range(0, len(words), 3)]
+    base = {
+        "id": f"chatcmpl-fake-{_seed(content) % 10**12}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": request.get("model") or MODEL,
+    }
+
+    time.sleep(latency * 0.2)
+    for piece in pieces:
+        yield {**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+        time.sleep(latency * 0.8 / len(pieces))
+    yield {**base, "choices": [{"index": 0, "delta": {"content": None}, "finish_reason": "stop"}]}
+    if (request.get("stream_options") or {}).get("include_usage"):
+        yield {**base, "choices": [], "usage": _usage(request, content)}
+
+
+def _namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_namespace(v) for v in value]
+    return value
+
+
+class _Completions:
+    def create(self, **kwargs):
+        if kwargs.get("stream"):
+            return (_namespace(chunk) for chunk in completion_chunks(kwargs))
+        return _namespace(completion(kwargs))
+
+
+class FakeClient:
+    """In-process client with the slice of the OpenAI client the app uses."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=_Completions())
+
+
+def create_app():
+    from starlette.applications import Starlette
+    from starlette.concurrency import run_in_threadpool
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    def events(body):
+        for chunk in completion_chunks(body):
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    async def chat_completions(request):
+        body = await request.json()
+        if body.get("stream"):
+            return StreamingResponse(events(body), media_type="text/event-stream")
+        return JSONResponse(await run_in_threadpool(completion, body))
+
+    return Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, help="seconds added to every completion")
+    parser.add_argument("--jitter", type=float, help="random +/- seconds around --latency")
+    args = parser.parse_args()
+    if args.latency is not None:
+        os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    if args.jitter is not None:
+        os.environ["FAKE_LLM_JITTER"] = str(args.jitter)
+
+    import uvicorn
+
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
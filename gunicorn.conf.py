@@ -0,0 +1,59 @@
+"""
+Production server settings: `gunicorn -c gunicorn.conf.py app:app`
+
+Every knob can be overridden from the environment. WEB_CONCURRENCY is
+exported before the app is preloaded so database.py can divide the
+Postgres connection budget between workers. Schema updates run once, in
+the master, before the workers start.
+"""
+import multiprocessing
+import os
+
+
+def default_workers() -> int:
+    # Requests spend most of their time waiting on OpenAI and Postgres,
+    # so one worker per core plus one is enough to keep the CPUs busy.
+    return min(multiprocessing.cpu_count() + 1, 8)
+
+
+workers = int(os.getenv("WEB_CONCURRENCY", default_workers()))
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+preload_app = True
+
+# Connection handling
+backlog = int(os.getenv("GUNICORN_BACKLOG", 2048))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+forwarded_allow_ips = "*"
+
+# Marking a multi-page upload waits on several model calls
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 60))
+
+# Recycle workers periodically; the jitter keeps them from restarting together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Migrate once here, with the app preloaded, rather than in every
+    # worker's startup hook
+    from database import check_updates, engine
+
+    check_updates()
+    engine.dispose()
+    os.environ["SCHEMA_UPDATES_APPLIED"] = "1"
+
+
+def post_fork(server, worker):
+    # The engine was created in the master by preload_app; each worker must
+    # open its own connections rather than share the inherited sockets.
+    from database import engine
+
+    engine.dispose(close=False)
@@ -2,10 +2,11 @@ import io
 import logging
 
 import concurrent.futures
+import contextvars
 import threading
 import time
-from openai import OpenAI
-import os
+from llm import complete
+from llm_usage import TokenBudgetExceeded
 import base64
 import json
 from dotenv import load_dotenv
@@ -25,15 +26,9 @@ def encode_image_to_base64(image_bytes):
     return base64.b64encode(image_bytes).decode('utf-8')
 
 
-def analyze_writing(base64_image, assignment=None):
-    """Hybrid analysis approach for fast, accurate writing assessment.
-    Uses a combination of parallel API calls and early results to optimize speed."""
-    try:
-        start_time = time.time()
-        logger.debug("Starting hybrid analysis approach...")
-        
-        # Build a condensed system prompt for maximum efficiency
-        system_prompt = """You are an expert teacher analyzing student writing. Be extremely concise and precise.
+def _analysis_prompt(assignment=None) -> str:
+    # Build a condensed system prompt for maximum efficiency
+    system_prompt = """You are an expert teacher analyzing student writing. Be extremely concise and precise.
 
         Format EXACTLY like this:
         WRITING AGE: [X years Y months]
@@ -50,9 +45,9 @@ def analyze_writing(base64_image, assignment=None):
 
         Keep analysis brief and focused. Each point MUST include a quoted example."""
 
-        if assignment:
-            # Add only essential assignment context
-            system_prompt += f"""
+    if assignment:
+        # Add only essential assignment context
+        system_prompt += f"""
 
         Key assessment criteria:
         - {assignment.curriculum} standards
@@ -60,6 +55,83 @@ def analyze_writing(base64_image, assignment=None):
         - {assignment.genre if assignment.genre else 'writing type'} features
         """
 
+    return system_prompt
+
+
+def _combine_analyses(all_responses: list[str]) -> dict:
+    """Average the writing ages and merge the feedback of several analysis passes."""
+    # Extract writing ages from each response
+    all_ages = []
+    for content in all_responses:
+        if 'WRITING AGE:' in content.upper():
+            age_line = [line for line in content.split('\n') if 'WRITING AGE:' in line.upper()][0]
+            age_text = age_line.split(':', 1)[1].strip()
+            # Extract years and months
+            try:
+                years = int(age_text.split('years')[0].strip())
+                months = int(age_text.split('months')[0].split('years')[1].strip())
+                age_in_months = years * 12 + months
+                all_ages.append(age_in_months)
+            except Exception as e:
+                logger.warning(f"Could not parse age from: {age_text} - {str(e)}")
+
+    # Calculate average age
+    if all_ages:
+        avg_months = sum(all_ages) / len(all_ages)
+        avg_years = int(avg_months // 12)
+        avg_months_remainder = int(avg_months % 12)
+        avg_age = f"{avg_years} years {avg_months_remainder} months"
+    else:
+        avg_age = "Unable to determine"
+
+    # Process and combine feedback from all passes
+    strengths_set = set()
+    development_set = set()
+
+    for response in all_responses:
+        parts = response.split('\n\n')
+        for part in parts:
+            if 'Strengths:' in part:
+                points = [p.strip() for p in part.split('\n') if p.strip().startswith('-')]
+                strengths_set.update(points)
+            elif 'Areas for Development:' in part:
+                points = [p.strip() for p in part.split('\n') if p.strip().startswith('-')]
+                development_set.update(points)
+
+    # Filter out duplicates and format combined feedback
+    strengths_list = sorted(list(set(strengths_set)))[:3]  # Take top 3 unique strengths
+    development_list = sorted(list(set(development_set)))[:3]  # Take top 3 unique areas
+
+    # Remove any duplicate points between lists by comparing lowercase versions
+    lower_strengths = [s.lower() for s in strengths_list]
+    development_list = [d for d in development_list if d.lower() not in lower_strengths]
+
+    # Format combined feedback
+    combined_feedback = "Strengths:\n"
+    combined_feedback += '\n'.join(strengths_list)
+    combined_feedback += "\n\nAreas for Development:\n"
+    combined_feedback += '\n'.join(development_list)
+
+    # Initialize analysis structure
+    analysis_parts = {
+        'age': avg_age,
+        'feedback': combined_feedback,
+        'justification': '',
+        'extracted_text': ''
+    }
+
+    return analysis_parts
+
+
+def analyze_writing(base64_image, assignment=None):
+    """Hybrid analysis approach for fast, accurate writing assessment.
+    Uses a combination of parallel API calls and early results to optimize speed."""
+    try:
+        start_time = time.time()
+        logger.debug("Starting hybrid analysis approach...")
+        
+        system_prompt = _analysis_prompt(assignment)
+
         # Track if we've already returned a result
         result_returned = threading.Event()
         final_response = []
@@ -72,7 +144,8 @@ def analyze_writing(base64_image, assignment=None):
                 
             try:
                 logger.debug(f"Starting API call {_+1}")
-                response = client.chat.completions.create(
+                response = complete(
+                    "analysis",
                     model=MODEL_NAME,
                     messages=[
                         {
@@ -100,12 +173,16 @@ def analyze_writing(base64_image, assignment=None):
                 )
                 logger.debug(f"Completed API call {_+1}")
                 return response.choices[0].message.content
+            except TokenBudgetExceeded:
+                raise
             except Exception as e:
                 logger.error(f"API call {_+1} error: {str(e)}")
                 return None
                 
         # Function to process the first valid response separately
         def process_first_response(future):
+            if future.exception():
+                return
             result = future.result()
             if result and not result_returned.is_set():
                 final_response.append(result)
@@ -118,7 +195,7 @@ def analyze_writing(base64_image, assignment=None):
             # Submit first two API calls with callback to process first valid result
             futures = []
             for i in range(3):
-                future = executor.submit(make_api_call, i)
+                future = executor.submit(contextvars.copy_context().run, make_api_call, i)
                 # First future gets special callback to potentially return results early
                 if i == 0:
                     future.add_done_callback(process_first_response)
@@ -152,65 +229,7 @@ def analyze_writing(base64_image, assignment=None):
                 'extracted_text': ''
             }
 
-        # Extract writing ages from each response
-        all_ages = []
-        for content in all_responses:
-            if 'WRITING AGE:' in content.upper():
-                age_line = [line for line in content.split('\n') if 'WRITING AGE:' in line.upper()][0]
-                age_text = age_line.split(':', 1)[1].strip()
-                # Extract years and months
-                try:
-                    years = int(age_text.split('years')[0].strip())
-                    months = int(age_text.split('months')[0].split('years')[1].strip())
-                    age_in_months = years * 12 + months
-                    all_ages.append(age_in_months)
-                except Exception as e:
-                    logger.warning(f"Could not parse age from: {age_text} - {str(e)}")
-
-        # Calculate average age
-        if all_ages:
-            avg_months = sum(all_ages) / len(all_ages)
-            avg_years = int(avg_months // 12)
-            avg_months_remainder = int(avg_months % 12)
-            avg_age = f"{avg_years} years {avg_months_remainder} months"
-        else:
-            avg_age = "Unable to determine"
-
-        # Process and combine feedback from all passes
-        strengths_set = set()
-        development_set = set()
-
-        for response in all_responses:
-            parts = response.split('\n\n')
-            for part in parts:
-                if 'Strengths:' in part:
-                    points = [p.strip() for p in part.split('\n') if p.strip().startswith('-')]
-                    strengths_set.update(points)
-                elif 'Areas for Development:' in part:
-                    points = [p.strip() for p in part.split('\n') if p.strip().startswith('-')]
-                    development_set.update(points)
-
-        # Filter out duplicates and format combined feedback
-        strengths_list = sorted(list(set(strengths_set)))[:3]  # Take top 3 unique strengths
-        development_list = sorted(list(set(development_set)))[:3]  # Take top 3 unique areas
-
-        # Remove any duplicate points between lists by comparing lowercase versions
-        lower_strengths = [s.lower() for s in strengths_list]
-        development_list = [d for d in development_list if d.lower() not in lower_strengths]
-
-        # Format combined feedback
-        combined_feedback = "Strengths:\n"
-        combined_feedback += '\n'.join(strengths_list)
-        combined_feedback += "\n\nAreas for Development:\n"
-        combined_feedback += '\n'.join(development_list)
-
-        # Initialize analysis structure
-        analysis_parts = {
-            'age': avg_age,
-            'feedback': combined_feedback,
-            'justification': '',
-            'extracted_text': ''
-        }
+        analysis_parts = _combine_analyses(all_responses)
 
         # Record time taken and log it
         end_time = time.time()
@@ -219,6 +238,8 @@ def analyze_writing(base64_image, assignment=None):
 
         return analysis_parts
 
+    except TokenBudgetExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing writing: {str(e)}")
         return {
@@ -234,24 +255,55 @@ def analyze_writing(base64_image, assignment=None):
 
 
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY')) 
-MODEL_NAME = "gpt-4o"
-
-def evaluate_criteria(assignment: Assignment, writing_text: str) -> list[dict]:
+def analyze_text(writing_text: str, assignment=None, teacher_id=None, priority=None) -> dict:
     """
-    Evaluate a writing sample against the criteria of a given assignment using OpenAI.
-    
-    Args:
-        assignment (Assignment): The assignment object with criteria
-        writing_text (str): The complete writing text from the student
-    
-    Returns:
-        List[dict]: List of evaluations, each with `criterion`, `score`, and `justification`
+    analyze_writing() for an existing transcription instead of a page
+    image, in a single pass, for re-analysing stored writing. Raises if
+    the model call fails, so callers can tell failure from feedback.
     """
-    if not assignment or not assignment.criteria:
-        logger.warning("No assignment or criteria to evaluate.")
-        return []
-    
+    response = complete(
+        "analysis",
+        teacher_id=teacher_id,
+        priority=priority,
+        model=MODEL_NAME,
+        messages=[
+            {"role": "system", "content": _analysis_prompt(assignment)},
+            {
+                "role": "user",
+                "content": f"Analyze this writing quickly. Start with WRITING AGE:\n\n{writing_text}",
+            },
+        ],
+        max_tokens=600,
+        temperature=0.3,
+    )
+    return _combine_analyses([response.choices[0].message.content])
+
+
+def tidy_feedback(analysis_response) -> tuple[str, str]:
+    """Writing age and the strengths/development text from an analysis result."""
+    age_estimate, feedback = "0 years 0 months", "Feedback unavailable"
+
+    if analysis_response:
+        age_estimate = analysis_response.get("age", age_estimate)
+        feedback = analysis_response.get("feedback", feedback)
+        feedback = feedback.replace("WRITING AGE:", "").strip()
+        sections = feedback.split("\n\n")
+        strengths = next((s for s in sections if "Strengths" in s), "")
+        development = next((s for s in sections if "Areas for Development" in s), "")
+        feedback = f"{strengths}\n\n{development}".strip()
+        feedback = (
+            feedback.replace("**Key", "")
+            .replace("**", "")
+            .replace("ize", "ise")
+            .replace("yze", "yse")
+        )
+    return age_estimate, feedback
+
+
+MODEL_NAME = "gpt-4o"
+
+def criteria_request(assignment: Assignment, writing_text: str) -> dict:
+    """chat.completions kwargs scoring `writing_text` against the assignment's criteria."""
     if assignment:
      
         criteria_prompt = """You are an expert teacher evaluating a writing sample against specific success criteria.
@@ -305,16 +357,45 @@ def evaluate_criteria(assignment: Assignment, writing_text: str) -> list[dict]:
     2. Explain why these examples merit the given score
     3. Reference the scoring guidelines above"""
 
+    return dict(
+        model=MODEL_NAME,
+        messages=[
+            {"role": "system", "content": criteria_prompt},
+            {"role": "user", "content": f"Please evaluate this writing sample against the provided criteria:\n\n{writing_text}"}
+        ],
+        temperature=0.2,
+        max_tokens=1500
+    )
+
+
+def parse_evaluations(content: str) -> list[dict]:
+    return json.loads(content.strip()).get("evaluations", [])
+
+
+def evaluate_criteria(assignment: Assignment, writing_text: str, teacher_id=None, priority=None) -> list[dict]:
+    """
+    Evaluate a writing sample against the criteria of a given assignment using OpenAI.
+    
+    Args:
+        assignment (Assignment): The assignment object with criteria
+        writing_text (str): The complete writing text from the student
+        teacher_id, priority: Passed to llm.complete() for calls made
+            outside a request
+    
+    Returns:
+        List[dict]: List of evaluations, each with `criterion`, `score`, and `justification`
+    """
+    if not assignment or not assignment.criteria:
+        logger.warning("No assignment or criteria to evaluate.")
+        return []
+    
     try:
         logger.debug(f"Evaluating text against criteria for assignment {assignment.id}")
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": criteria_prompt},
-                {"role": "user", "content": f"Please evaluate this writing sample against the provided criteria:\n\n{writing_text}"}
-            ],
-            temperature=0.2,
-            max_tokens=1500
+        response = complete(
+            "criteria",
+            teacher_id=teacher_id,
+            priority=priority,
+            **criteria_request(assignment, writing_text),
         )
 
         content = response.choices[0].message.content.strip()
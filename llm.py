@@ -0,0 +1,102 @@
+import os
+import time
+from functools import lru_cache
+from types import SimpleNamespace
+
+import llm_scheduler
+import llm_usage
+
+
+def _openai_client():
+    from openai import OpenAI
+
+    # LLM_BASE_URL points the real client at a compatible server, such as
+    # the fake one in fake_llm.py
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("LLM_BASE_URL") or None,
+        # llm_scheduler retries 429s with a shared pause instead
+        max_retries=0,
+    )
+
+
+def _fake_client():
+    from fake_llm import FakeClient
+
+    return FakeClient()
+
+
+# LLM_PROVIDER name -> factory returning a client with chat.completions.create
+PROVIDERS = {
+    "openai": _openai_client,
+    "fake": _fake_client,
+}
+
+
+def register_provider(name: str, factory):
+    """Make a client factory selectable with LLM_PROVIDER=name."""
+    PROVIDERS[name] = factory
+    get_client.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """
+    Shared model client, created on first use. Importing the openai package
+    is one of the slowest parts of app startup, so it is deferred until a
+    route actually needs the model.
+
+    LLM_PROVIDER selects the implementation (default "openai"); "fake"
+    answers from canned responses without touching the network.
+    """
+    provider = os.getenv("LLM_PROVIDER", "openai")
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER {provider!r}; expected one of {sorted(PROVIDERS)}")
+    return PROVIDERS[provider]()
+
+
+def complete(prompt_type: str, teacher_id: int = None, priority: int = None, **kwargs):
+    """
+    chat.completions.create(**kwargs) on the shared client, admitted by
+    llm_scheduler and recorded in the usage ledger under `prompt_type`.
+    The teacher defaults to the one signed in for the current request.
+    Calls made while serving a request run at INTERACTIVE priority and
+    others at BACKGROUND unless `priority` says otherwise. Raises
+    llm_usage.TokenBudgetExceeded if the teacher has no tokens left today.
+    """
+    tags = llm_usage.current_tags(teacher_id)
+    llm_usage.check_budget(tags["teacher_id"])
+    if priority is None:
+        priority = llm_scheduler.INTERACTIVE if tags["route"] else llm_scheduler.BACKGROUND
+    response, latency = llm_scheduler.run(
+        get_client().chat.completions.create, kwargs, priority, tags["teacher_id"]
+    )
+    llm_usage.record(prompt_type, response, latency, **tags)
+    return response
+
+
+def stream(prompt_type: str, teacher_id: int = None, priority: int = None, **kwargs):
+    """
+    complete() for replies shown as they are written: yields the text in
+    pieces as the model generates it. Usage is recorded once the stream
+    has been read to the end, with latency measured from the first
+    request, including any wait for a scheduler slot.
+    """
+    tags = llm_usage.current_tags(teacher_id)
+    llm_usage.check_budget(tags["teacher_id"])
+    if priority is None:
+        priority = llm_scheduler.INTERACTIVE if tags["route"] else llm_scheduler.BACKGROUND
+    kwargs.update(stream=True, stream_options={"include_usage": True})
+
+    start = time.perf_counter()
+    model = usage = None
+    for chunk in llm_scheduler.run_stream(
+        get_client().chat.completions.create, kwargs, priority, tags["teacher_id"]
+    ):
+        model = getattr(chunk, "model", None) or model
+        usage = getattr(chunk, "usage", None) or usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+    llm_usage.record(
+        prompt_type, SimpleNamespace(model=model, usage=usage), time.perf_counter() - start, **tags
+    )
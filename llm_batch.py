@@ -0,0 +1,490 @@
+"""
+Offline batch execution for model work nobody is waiting for.
+
+Background refreshes of class feedback and WAGOLLs, and criteria
+re-scoring in batch-mode re-mark jobs, can wait hours for an answer. With
+LLM_BATCH set they are not sent as chat completions; enqueue() stores
+the request instead, and process_batches(), every LLM_BATCH_INTERVAL
+seconds:
+
+- submits the queued requests, up to LLM_BATCH_MAX_REQUESTS at a time,
+  as one JSONL batch file;
+- polls the submitted batches and, for each finished one, records usage
+  and hands every result to the handler registered for its kind, which
+  writes it to the database.
+
+LLM_BATCH selects the backend:
+
+- "openai" uploads the file to the OpenAI Batch API, which answers
+  within 24 hours at half the price and outside the chat rate limits;
+- "local" is a file-based stand-in: batch files are kept under
+  LLM_BATCH_PATH and answered through the configured chat client
+  (LLM_PROVIDER), one request at a time, for up to LOCAL_ANSWER_SECONDS
+  each time they are polled. Meant for development and small
+  installations.
+
+A batch is claimed through its status before it is submitted or
+collected, so processes sharing the database never send or apply the same
+batch twice. Work left half done by a crashed process is released once
+it is LLM_BATCH_STALE_MINUTES old.
+
+Run it from the command line to process batches in the foreground:
+    python llm_batch.py [--wait]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+from types import SimpleNamespace
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+import llm_scheduler
+import llm_usage
+from background import run_periodically
+from models import LLMBatch, LLMBatchRequest
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_INTERVAL = int(os.getenv("LLM_BATCH_INTERVAL", 600))
+MAX_REQUESTS = int(os.getenv("LLM_BATCH_MAX_REQUESTS", 5000))
+STALE_AFTER = timedelta(minutes=int(os.getenv("LLM_BATCH_STALE_MINUTES", 30)))
+# A local batch is answered in slices this long, so a poll stays well
+# inside STALE_AFTER and the "collecting" claim is never taken for stale
+LOCAL_ANSWER_SECONDS = 120
+
+# Provider statuses after which a batch's results are final
+TERMINAL = ("completed", "failed", "expired", "cancelled")
+
+
+def _parse_jsonl(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _as_dict(value):
+    """A response object (pydantic or SimpleNamespace) as plain JSON data."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, SimpleNamespace):
+        return {k: _as_dict(v) for k, v in vars(value).items()}
+    if isinstance(value, list):
+        return [_as_dict(v) for v in value]
+    return value
+
+
+class LocalBatchBackend:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, batch_id: str, part: str) -> str:
+        return os.path.join(self.root, f"{batch_id}.{part}.jsonl")
+
+    def submit(self, data: bytes) -> str:
+        batch_id = f"local-{uuid.uuid4().hex}"
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(batch_id, "input"), "wb") as f:
+            f.write(data)
+        return batch_id
+
+    def _answer(self, batch_id: str) -> bool:
+        """
+        Answer the batch's next requests for up to LOCAL_ANSWER_SECONDS.
+        Answers are appended to a partial file, so the next poll (or the
+        next process, after a crash) carries on where this one stopped.
+        True once the output is complete.
+        """
+        from llm import get_client
+
+        client = get_client()
+        with open(self._path(batch_id, "input")) as f:
+            requests = _parse_jsonl(f.read())
+        partial = self._path(batch_id, "partial")
+        answered = ""
+        if os.path.exists(partial):
+            with open(partial) as f:
+                answered = f.read()
+            # Drop a line cut short by a crash
+            answered = answered[: answered.rfind("\n") + 1]
+        deadline = time.monotonic() + LOCAL_ANSWER_SECONDS
+        with open(partial, "w") as f:
+            f.write(answered)
+            remaining = requests[answered.count("\n"):]
+            for index, request in enumerate(remaining):
+                if index and time.monotonic() > deadline:
+                    return False
+                line = {"id": f"{batch_id}-{request['custom_id']}", "custom_id": request["custom_id"]}
+                try:
+                    response, _ = llm_scheduler.run(
+                        client.chat.completions.create, request["body"], llm_scheduler.BACKGROUND
+                    )
+                    line.update(response={"status_code": 200, "body": _as_dict(response)}, error=None)
+                except Exception as e:
+                    line.update(response=None, error={"code": type(e).__name__, "message": str(e)})
+                f.write(json.dumps(line) + "\n")
+                f.flush()
+        os.replace(partial, self._path(batch_id, "output"))
+        return True
+
+    def poll(self, batch_id: str):
+        if not os.path.exists(self._path(batch_id, "output")) and not self._answer(batch_id):
+            return "in_progress", None
+        with open(self._path(batch_id, "output")) as f:
+            return "completed", _parse_jsonl(f.read())
+
+
+class OpenAIBatchBackend:
+    def __init__(self):
+        from llm import get_client
+
+        self.client = get_client()
+
+    def submit(self, data: bytes) -> str:
+        upload = self.client.files.create(file=("batch.jsonl", data), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def poll(self, batch_id: str):
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status not in TERMINAL:
+            return batch.status, None
+        # Failed requests, and those left when a batch expires, are in the
+        # error file
+        results = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                results.extend(_parse_jsonl(self.client.files.content(file_id).text))
+        return batch.status, results
+
+
+def _local_backend():
+    return LocalBatchBackend(os.getenv("LLM_BATCH_PATH", os.path.join("instance", "batches")))
+
+
+# LLM_BATCH name -> factory returning a backend with submit(data) -> batch
+# id and poll(batch id) -> (status, results, or None until they are final)
+BACKENDS = {
+    "local": _local_backend,
+    "openai": OpenAIBatchBackend,
+}
+
+# kind -> (apply(db, request, content), failed(db, request) or None)
+HANDLERS = {}
+
+
+def register_handler(kind: str, apply, failed=None):
+    """
+    Route results of `kind` requests to apply(db, request, content), which
+    raises if the result is unusable. failed(db, request) is called instead
+    when the request gets no usable result; its changes are committed
+    together with the request's status.
+    """
+    HANDLERS[kind] = (apply, failed)
+
+
+def enabled() -> bool:
+    return (os.getenv("LLM_BATCH") or "off") != "off"
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    backend = os.getenv("LLM_BATCH") or "off"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BATCH {backend!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend]()
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    target_id: int,
+    body: dict,
+    teacher_id: int = None,
+    context: dict = None,
+    replace: bool = True,
+):
+    """
+    Queue chat.completions.create(**body) for the next batch. With
+    `replace`, a request for the same target that is still queued is
+    superseded, and one already submitted with the same context is left
+    to finish. Raises llm_usage.TokenBudgetExceeded if the teacher has no
+    tokens left today. Does not commit.
+    """
+    llm_usage.check_budget(teacher_id)
+    context = json.dumps(context) if context is not None else None
+    if replace:
+        existing = db.scalars(
+            select(LLMBatchRequest).where(
+                LLMBatchRequest.kind == kind,
+                LLMBatchRequest.target_id == target_id,
+                LLMBatchRequest.status.in_(("queued", "submitted")),
+            )
+        ).all()
+        if any(r.status == "submitted" and r.context == context for r in existing):
+            return
+        queued = [r for r in existing if r.status == "queued"]
+        if queued:
+            queued[0].body = json.dumps(body)
+            queued[0].context = context
+            queued[0].teacher_id = teacher_id
+            return
+
+    db.add(
+        LLMBatchRequest(
+            kind=kind,
+            target_id=target_id,
+            teacher_id=teacher_id,
+            body=json.dumps(body),
+            context=context,
+        )
+    )
+
+
+def _release_stale(db: Session):
+    """Undo claims left by a process that stopped part way."""
+    stale = datetime.now() - STALE_AFTER
+    for batch in db.scalars(
+        select(LLMBatch).where(
+            LLMBatch.status.in_(("preparing", "collecting")), LLMBatch.updated_at < stale
+        )
+    ):
+        if batch.status == "collecting":
+            logger.warning(f"Collecting LLM batch {batch.id} again")
+            batch.status = "submitted"
+            continue
+        # Never reached the provider: its requests go in the next batch
+        db.execute(
+            update(LLMBatchRequest)
+            .where(LLMBatchRequest.batch_id == batch.id)
+            .values(status="queued", batch_id=None)
+        )
+        batch.status = "failed"
+        batch.error = "abandoned before submission"
+    db.commit()
+
+
+def submit_queued(db: Session) -> int:
+    """Send up to MAX_REQUESTS queued requests as one batch. Returns how many."""
+    backend_name = os.getenv("LLM_BATCH") or "off"
+    batch = LLMBatch(backend=backend_name)
+    db.add(batch)
+    db.flush()
+    claimed = db.execute(
+        update(LLMBatchRequest)
+        .where(
+            LLMBatchRequest.id.in_(
+                select(LLMBatchRequest.id)
+                .where(LLMBatchRequest.status == "queued")
+                .order_by(LLMBatchRequest.id)
+                .limit(MAX_REQUESTS)
+            ),
+            LLMBatchRequest.status == "queued",
+        )
+        .values(status="submitted", batch_id=batch.id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.rollback()
+        return 0
+    batch.request_count = claimed
+    db.commit()
+
+    lines = [
+        json.dumps(
+            {
+                "custom_id": str(request_id),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": json.loads(body),
+            }
+        )
+        for request_id, body in db.execute(
+            select(LLMBatchRequest.id, LLMBatchRequest.body)
+            .where(LLMBatchRequest.batch_id == batch.id)
+            .order_by(LLMBatchRequest.id)
+        )
+    ]
+    try:
+        batch.provider_batch_id = get_backend().submit(("\n".join(lines) + "\n").encode())
+    except Exception as e:
+        logger.error(f"Error submitting LLM batch {batch.id}: {str(e)}")
+        db.rollback()
+        db.execute(
+            update(LLMBatchRequest)
+            .where(LLMBatchRequest.batch_id == batch.id)
+            .values(status="queued", batch_id=None)
+        )
+        batch.status = "failed"
+        batch.error = str(e)
+        batch.finished_at = datetime.now()
+        db.commit()
+        return 0
+
+    batch.status = "submitted"
+    db.commit()
+    logger.info(f"Submitted LLM batch {batch.id} ({batch.provider_batch_id}) with {claimed} requests")
+    return claimed
+
+
+def _content(result: dict):
+    """(reply text, response body) from a batch output line, or (None, error)."""
+    response = result.get("response") or {}
+    if response.get("status_code") == 200:
+        body = response["body"]
+        return body["choices"][0]["message"]["content"], body
+    error = result.get("error") or (response.get("body") or {}).get("error") or {}
+    return None, error.get("message") or f"status {response.get('status_code')}"
+
+
+def _usage_view(body: dict):
+    """The response attributes llm_usage.record() reads."""
+    usage = body.get("usage") or {}
+    return SimpleNamespace(
+        model=body.get("model"),
+        usage=SimpleNamespace(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            prompt_tokens_details=SimpleNamespace(
+                cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+            ),
+        ),
+    )
+
+
+def _apply_result(db: Session, request: LLMBatchRequest, result: dict):
+    content, detail = _content(result) if result else (None, "no result in the batch output")
+    if content is not None:
+        llm_usage.record(request.kind, _usage_view(detail), 0, teacher_id=request.teacher_id)
+
+    apply, failed = HANDLERS.get(request.kind, (None, None))
+    try:
+        if apply is None:
+            raise RuntimeError(f"no handler for {request.kind!r} results")
+        if content is None:
+            raise RuntimeError(detail)
+        apply(db, request, content)
+        request.status = "done"
+    except Exception as e:
+        logger.warning(f"LLM batch request {request.id} ({request.kind} {request.target_id}) failed: {str(e)}")
+        db.rollback()
+        if failed:
+            failed(db, request)
+        request.status = "failed"
+        request.error = str(e)
+    request.body = None
+    request.finished_at = datetime.now()
+    db.commit()
+
+
+def collect(db: Session, batch_id: int) -> bool:
+    """Apply a submitted batch's results if the provider has finished it."""
+    claimed = db.execute(
+        update(LLMBatch)
+        .where(LLMBatch.id == batch_id, LLMBatch.status == "submitted")
+        .values(status="collecting", updated_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return False
+
+    batch = db.get(LLMBatch, batch_id)
+    try:
+        status, results = get_backend().poll(batch.provider_batch_id)
+    except Exception as e:
+        logger.error(f"Error polling LLM batch {batch.id}: {str(e)}")
+        status, results = None, None
+    if results is None:
+        batch.status = "submitted"
+        batch.provider_status = status or batch.provider_status
+        db.commit()
+        return False
+
+    by_id = {result.get("custom_id"): result for result in results}
+    pending = db.scalars(
+        select(LLMBatchRequest)
+        .where(LLMBatchRequest.batch_id == batch.id, LLMBatchRequest.status == "submitted")
+        .order_by(LLMBatchRequest.id)
+    ).all()
+    for request in pending:
+        _apply_result(db, request, by_id.get(str(request.id)))
+
+    batch.status = "done"
+    batch.provider_status = status
+    batch.finished_at = datetime.now()
+    db.commit()
+    logger.info(f"Collected LLM batch {batch.id} ({status}): {len(pending)} results")
+    return True
+
+
+def process_batches(db: Session):
+    """Collect finished batches, then submit everything queued since."""
+    _release_stale(db)
+    for batch_id in db.scalars(
+        select(LLMBatch.id).where(LLMBatch.status == "submitted").order_by(LLMBatch.id)
+    ).all():
+        collect(db, batch_id)
+    while submit_queued(db) == MAX_REQUESTS:
+        pass
+
+
+def start_processor():
+    """Process batches every BATCH_INTERVAL seconds, if batching is on."""
+    if not enabled():
+        return None
+    return run_periodically("LLM batch processing", process_batches, BATCH_INTERVAL, BATCH_INTERVAL)
+
+
+def batch_status(batch: LLMBatch) -> dict:
+    return {
+        "id": batch.id,
+        "backend": batch.backend,
+        "provider_batch_id": batch.provider_batch_id,
+        "status": batch.status,
+        "provider_status": batch.provider_status,
+        "request_count": batch.request_count,
+        "created_at": batch.created_at.isoformat() if batch.created_at else None,
+        "finished_at": batch.finished_at.isoformat() if batch.finished_at else None,
+        "error": batch.error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--wait", action="store_true", help="keep polling until every batch is collected"
+    )
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    # Imported for the result handlers they register
+    import class_feedback  # noqa: F401
+    import remarking  # noqa: F401
+    import wagoll_generation  # noqa: F401
+
+    db = SessionLocal()
+    try:
+        process_batches(db)
+        while args.wait and db.scalar(
+            select(LLMBatch.id).where(LLMBatch.status.in_(("submitted", "collecting")))
+        ):
+            time.sleep(60)
+            process_batches(db)
+        for batch in db.scalars(select(LLMBatch).order_by(LLMBatch.id.desc()).limit(10)):
+            print(batch_status(batch))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Process-wide admission control for model calls.
+
+Every llm.complete() call waits here for a slot before it reaches the
+API, so concurrent uploads cannot open dozens of simultaneous requests
+and run into 429s together. A call is admitted when:
+
+- fewer than MAX_CONCURRENCY calls are in flight;
+- the requests-per-minute and tokens-per-minute buckets, sized to the
+  account's rate-limit tier, can cover it. Tokens are estimated up front
+  (text length, a flat cost per image, max_tokens) and corrected with
+  response.usage afterwards;
+- it is next in line: waiting calls are served by priority
+  (INTERACTIVE, then BATCH, then BACKGROUND) and, within a priority,
+  round-robin across teachers, so one teacher's bulk upload does not
+  starve everyone else.
+
+When the API still answers 429, the scheduler pauses all admissions for
+the Retry-After period (or an exponential backoff) before the call is
+retried, rather than every thread retrying on its own.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+# The limits are for the whole deployment; each web worker has its own
+# scheduler, so it gets an equal share (as database.pool_settings() does)
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+MAX_CONCURRENCY = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", 8)) // WORKERS)
+# Defaults match OpenAI usage tier 1 for gpt-4o
+REQUESTS_PER_MINUTE = max(1, int(os.getenv("LLM_REQUESTS_PER_MINUTE", 500)) // WORKERS)
+TOKENS_PER_MINUTE = max(1, int(os.getenv("LLM_TOKENS_PER_MINUTE", 30000)) // WORKERS)
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+
+# A typical scanned page at detail=auto
+IMAGE_TOKENS = 1105
+
+INTERACTIVE, BATCH, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", BACKGROUND: "background"}
+
+
+class TokenBucket:
+    """Continuously refilled allowance of `rate` units per minute."""
+
+    def __init__(self, rate: int):
+        self.capacity = float(rate)
+        self.level = float(rate)
+        self.rate = rate / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill(now)
+        # A call bigger than the whole bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+def estimate_tokens(kwargs: dict) -> int:
+    """Rough prompt plus completion tokens for a chat.completions request."""
+    chars = images = 0
+    for message in kwargs.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                images += 1
+            else:
+                chars += len(part.get("text", ""))
+    return chars // 4 + images * IMAGE_TOKENS + (kwargs.get("max_tokens") or 1000)
+
+
+class _Ticket:
+    __slots__ = ("teacher", "tokens")
+
+    def __init__(self, teacher, tokens):
+        self.teacher = teacher
+        self.tokens = tokens
+
+
+class Scheduler:
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENCY,
+        requests_per_minute: int = REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = TOKENS_PER_MINUTE,
+    ):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.active = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        # priority -> teacher -> waiting tickets, and the teachers' turn order
+        self._waiting = {p: {} for p in PRIORITY_NAMES}
+        self._turns = {p: deque() for p in PRIORITY_NAMES}
+
+    def _head(self):
+        for priority in sorted(self._turns):
+            if self._turns[priority]:
+                teacher = self._turns[priority][0]
+                return priority, self._waiting[priority][teacher][0]
+        return None, None
+
+    def _dequeue(self, priority, ticket):
+        queue = self._waiting[priority][ticket.teacher]
+        queue.remove(ticket)
+        turns = self._turns[priority]
+        if turns and turns[0] == ticket.teacher:
+            turns.popleft()
+            if queue:
+                turns.append(ticket.teacher)  # back of the line for their next call
+        if not queue:
+            del self._waiting[priority][ticket.teacher]
+            if ticket.teacher in turns:
+                turns.remove(ticket.teacher)
+
+    def acquire(self, priority: int = INTERACTIVE, teacher_id=None, tokens: int = 0) -> _Ticket:
+        """Block until this call may run; returns the ticket for release()."""
+        ticket = _Ticket(teacher_id, tokens)
+        with self._cond:
+            if ticket.teacher not in self._waiting[priority]:
+                self._waiting[priority][ticket.teacher] = deque()
+                self._turns[priority].append(ticket.teacher)
+            self._waiting[priority][ticket.teacher].append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._head()[1] is ticket and self.active < self.max_concurrency:
+                        wait = max(
+                            self.paused_until - now,
+                            self.requests.wait_time(1, now),
+                            self.tokens.wait_time(tokens, now),
+                        )
+                        if wait <= 0:
+                            break
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                self._dequeue(priority, ticket)
+                self._cond.notify_all()
+                raise
+            self._dequeue(priority, ticket)
+            self.requests.take(1)
+            self.tokens.take(min(tokens, self.tokens.capacity))
+            self.active += 1
+            # The next ticket in line may also be admissible
+            self._cond.notify_all()
+        return ticket
+
+    def release(self, ticket: _Ticket, used_tokens: int = None):
+        """Free the slot; `used_tokens` corrects the up-front estimate."""
+        with self._cond:
+            self.active -= 1
+            if used_tokens is not None:
+                estimate = min(ticket.tokens, self.tokens.capacity)
+                if used_tokens < estimate:
+                    self.tokens.give(estimate - used_tokens)
+                else:
+                    self.tokens.take(used_tokens - estimate)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Hold all admissions for `seconds`, e.g. after a 429."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "active": self.active,
+                "max_concurrency": self.max_concurrency,
+                "waiting": {
+                    PRIORITY_NAMES[p]: sum(len(q) for q in teachers.values())
+                    for p, teachers in self._waiting.items()
+                },
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            }
+
+
+scheduler = Scheduler()
+
+
+def _retry_after(error) -> float:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def is_rate_limited(error) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def _is_transient(error) -> bool:
+    # Server errors, and connection failures, which carry no status code
+    status = getattr(error, "status_code", None)
+    return (status or 0) >= 500 or type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_delay(error, attempt: int):
+    """Seconds to wait before retrying after `error`, or None to give up."""
+    if attempt >= MAX_RETRIES or not (is_rate_limited(error) or _is_transient(error)):
+        return None
+    return _retry_after(error) or min(60.0, 2 ** attempt + random.random())
+
+
+def _backoff(error, delay: float, attempt: int):
+    logger.warning(f"Model call failed ({str(error)}), retrying in {delay:.1f}s (attempt {attempt + 1})")
+    if is_rate_limited(error):
+        scheduler.pause(delay)
+    time.sleep(delay)
+
+
+def run(call, kwargs: dict, priority: int = INTERACTIVE, teacher_id=None):
+    """
+    call(**kwargs) once admitted by the scheduler, retrying 429s, server
+    errors and dropped connections up to MAX_RETRIES times. A 429 pauses
+    every caller; other failures back off this call only. Returns
+    (response, seconds spent in the API).
+    """
+    estimate = estimate_tokens(kwargs)
+    for attempt in range(MAX_RETRIES + 1):
+        ticket = scheduler.acquire(priority, teacher_id, estimate)
+        used = None
+        try:
+            start = time.perf_counter()
+            response = call(**kwargs)
+            elapsed = time.perf_counter() - start
+            used = getattr(getattr(response, "usage", None), "total_tokens", None)
+            return response, elapsed
+        except Exception as e:
+            error, delay = e, _retry_delay(e, attempt)
+            if delay is None:
+                raise
+        finally:
+            scheduler.release(ticket, used)
+        _backoff(error, delay, attempt)
+
+
+def run_stream(call, kwargs: dict, priority: int = INTERACTIVE, teacher_id=None):
+    """
+    run() for stream=True calls: yields the chunks, holding the slot until
+    the stream ends or is closed. Failures are only retried before the
+    first chunk, since a partly delivered reply cannot be replayed.
+    """
+    estimate = estimate_tokens(kwargs)
+    for attempt in range(MAX_RETRIES + 1):
+        ticket = scheduler.acquire(priority, teacher_id, estimate)
+        used = None
+        started = False
+        try:
+            for chunk in call(**kwargs):
+                started = True
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    used = usage.total_tokens
+                yield chunk
+            return
+        except Exception as e:
+            error, delay = e, _retry_delay(e, attempt)
+            if started or delay is None:
+                raise
+        finally:
+            scheduler.release(ticket, used)
+        _backoff(error, delay, attempt)
@@ -0,0 +1,232 @@
+"""
+Usage ledger for model calls.
+
+llm.complete() records one LLMUsage row per call: prompt, completion and
+cached tokens from response.usage, latency, the model that answered, and
+the prompt type (transcription, analysis, criteria, wagoll,
+class_feedback). Calls made while serving a request are also tagged with
+the signed-in teacher and the route template; get_current_user() sets
+those tags for the request via tag_request(). Background jobs pass the
+teacher explicitly.
+
+Teachers have a daily token budget, LLM_DAILY_TOKEN_BUDGET unless their
+User.daily_token_budget overrides it (0 means unlimited). Once today's
+ledger total reaches it, further calls raise TokenBudgetExceeded, which
+the app turns into a 429.
+
+usage_report() aggregates the ledger for the admin usage endpoint, with
+an estimated cost from MODEL_PRICES.
+"""
+import logging
+import os
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import LLMUsage, User
+
+logger = logging.getLogger(__name__)
+
+
+DAILY_TOKEN_BUDGET = int(os.getenv("LLM_DAILY_TOKEN_BUDGET", 0))
+
+# USD per million tokens: (input, cached input, output). Model names are
+# matched by prefix, longest first, so dated snapshots share a price.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+}
+
+TOP_TEACHERS = 20
+
+_tags = ContextVar("llm_usage_tags", default=None)
+
+
+class TokenBudgetExceeded(Exception):
+    """The teacher has used their daily token budget."""
+
+    def __init__(self, teacher_id: int, used: int, budget: int):
+        super().__init__(
+            f"Teacher {teacher_id} has used {used} of {budget} tokens today"
+        )
+        self.teacher_id = teacher_id
+        self.used = used
+        self.budget = budget
+
+
+def tag_request(request, teacher_id: int):
+    """Attribute model calls made while serving `request` to `teacher_id`."""
+    route = request.scope.get("route")
+    _tags.set({"teacher_id": teacher_id, "route": getattr(route, "path", request.url.path)})
+
+
+def current_tags(teacher_id: int = None) -> dict:
+    tags = dict(_tags.get() or {"teacher_id": None, "route": None})
+    if teacher_id is not None:
+        tags["teacher_id"] = teacher_id
+    return tags
+
+
+def tokens_today(db: Session, teacher_id: int) -> int:
+    start = datetime.combine(date.today(), datetime.min.time())
+    return db.query(
+        func.coalesce(func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens), 0)
+    ).filter(LLMUsage.teacher_id == teacher_id, LLMUsage.created_at >= start).scalar()
+
+
+def budget_for(db: Session, teacher_id: int) -> int:
+    override = db.query(User.daily_token_budget).filter(User.id == teacher_id).scalar()
+    return DAILY_TOKEN_BUDGET if override is None else override
+
+
+def check_budget(teacher_id: int):
+    """Raise TokenBudgetExceeded if the teacher has no budget left today."""
+    if teacher_id is None:
+        return
+    db = SessionLocal()
+    try:
+        budget = budget_for(db, teacher_id)
+        if not budget:
+            return
+        used = tokens_today(db, teacher_id)
+    finally:
+        db.close()
+    if used >= budget:
+        raise TokenBudgetExceeded(teacher_id, used, budget)
+
+
+def record(prompt_type: str, response, latency: float, teacher_id: int = None, route: str = None):
+    """Write a ledger row for a completed call. Never fails the caller."""
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    db = SessionLocal()
+    try:
+        db.add(
+            LLMUsage(
+                teacher_id=teacher_id,
+                route=route,
+                prompt_type=prompt_type,
+                model=getattr(response, "model", None),
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+                latency_ms=int(latency * 1000),
+            )
+        )
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error recording LLM usage: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def estimate_cost(model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int):
+    """Estimated USD for the tokens, or None for a model without a price."""
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model and model.startswith(prefix):
+            input_price, cached_price, output_price = MODEL_PRICES[prefix]
+            return round(
+                (
+                    (prompt_tokens - cached_tokens) * input_price
+                    + cached_tokens * cached_price
+                    + completion_tokens * output_price
+                ) / 1_000_000,
+                4,
+            )
+    return None
+
+
+def _grouped(db: Session, since: datetime, *keys):
+    """Totals per `keys` (plus model, for pricing) since `since`."""
+    rows = (
+        db.query(
+            *keys,
+            LLMUsage.model,
+            func.count(LLMUsage.id),
+            func.coalesce(func.sum(LLMUsage.prompt_tokens), 0),
+            func.coalesce(func.sum(LLMUsage.cached_tokens), 0),
+            func.coalesce(func.sum(LLMUsage.completion_tokens), 0),
+            func.coalesce(func.sum(LLMUsage.latency_ms), 0),
+        )
+        .filter(LLMUsage.created_at >= since)
+        .group_by(*keys, LLMUsage.model)
+    )
+    totals = {}
+    for *key, model, calls, prompt, cached, completion, latency in rows:
+        key = key[0] if len(key) == 1 else tuple(key)
+        entry = totals.setdefault(key, {
+            "calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+            "completion_tokens": 0, "total_tokens": 0, "latency_ms": 0, "cost_usd": 0.0,
+        })
+        entry["calls"] += calls
+        entry["prompt_tokens"] += int(prompt)
+        entry["cached_tokens"] += int(cached)
+        entry["completion_tokens"] += int(completion)
+        entry["total_tokens"] += int(prompt) + int(completion)
+        entry["latency_ms"] += int(latency)
+        cost = estimate_cost(model, int(prompt), int(cached), int(completion))
+        if cost is not None:
+            entry["cost_usd"] = round(entry["cost_usd"] + cost, 4)
+    for entry in totals.values():
+        entry["avg_latency_ms"] = entry.pop("latency_ms") // max(entry["calls"], 1)
+    return totals
+
+
+def usage_report(db: Session, days: int = 30) -> dict:
+    """Ledger totals for the last `days` days, overall and by breakdown."""
+    since = datetime.combine(date.today() - timedelta(days=days - 1), datetime.min.time())
+
+    by_teacher = _grouped(db, since, LLMUsage.teacher_id)
+    top = sorted(
+        (teacher_id for teacher_id in by_teacher if teacher_id is not None),
+        key=lambda teacher_id: by_teacher[teacher_id]["total_tokens"],
+        reverse=True,
+    )[:TOP_TEACHERS]
+    teachers = {
+        user.id: user
+        for user in db.query(User).filter(User.id.in_(top))
+    } if top else {}
+    today = {
+        teacher_id: int(used)
+        for teacher_id, used in db.query(
+            LLMUsage.teacher_id,
+            func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens),
+        )
+        .filter(
+            LLMUsage.teacher_id.in_(top),
+            LLMUsage.created_at >= datetime.combine(date.today(), datetime.min.time()),
+        )
+        .group_by(LLMUsage.teacher_id)
+    } if top else {}
+
+    return {
+        "since": since.date().isoformat(),
+        "totals": _grouped(db, since).get((), {}),
+        "by_prompt_type": _grouped(db, since, LLMUsage.prompt_type),
+        "by_route": _grouped(db, since, LLMUsage.route),
+        "by_model": _grouped(db, since, LLMUsage.model),
+        "by_day": {
+            str(day): totals
+            for day, totals in sorted(
+                _grouped(db, since, func.date(LLMUsage.created_at)).items()
+            )
+        },
+        "top_teachers": [
+            {
+                "id": teacher_id,
+                "name": teachers[teacher_id].name if teacher_id in teachers else None,
+                "tokens_today": today.get(teacher_id, 0),
+                "daily_budget": (
+                    DAILY_TOKEN_BUDGET
+                    if teacher_id not in teachers or teachers[teacher_id].daily_token_budget is None
+                    else teachers[teacher_id].daily_token_budget
+                ),
+                **by_teacher[teacher_id],
+            }
+            for teacher_id in top
+        ],
+    }
@@ -8,6 +8,11 @@ port = int(os.getenv("PORT", 5000))
 
 
 if __name__ == "__main__":
+    if not is_development():
+        # Multi-worker production server, configured in gunicorn.conf.py
+        os.environ["PORT"] = str(port)
+        os.execvp("gunicorn", ["gunicorn", "-c", "gunicorn.conf.py", "app:app"])
+
     try:
         uvicorn.run(
             "app:app",                     
@@ -10,8 +10,9 @@ from sqlalchemy import (
     ForeignKey,
     Date,
     Float,
+    LargeBinary,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from database import Base
 from passlib.context import CryptContext
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -27,11 +28,18 @@ class User(Base):
     last_name = Column(String(50), nullable=False)
     email = Column(String(120), unique=True, nullable=False)
     school_name = Column(String(200), nullable=True)
-    school_logo = Column(Text, nullable=True)
+    # Legacy base64 logo, migrated to school_logo_data by check_updates()
+    school_logo = deferred(Column(Text, nullable=True))
+    # PNG bytes are deferred so authentication never loads them; the hash is
+    # cheap and doubles as the ETag for the /school_logo endpoint
+    school_logo_data = deferred(Column(LargeBinary, nullable=True))
+    school_logo_hash = Column(String(64), nullable=True)
     password_hash = Column(String, unique=True, nullable=False)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.now)
     last_login = Column(DateTime, nullable=True)
+    # Overrides LLM_DAILY_TOKEN_BUDGET for this teacher; 0 means unlimited
+    daily_token_budget = Column(Integer, nullable=True)
 
     classes = relationship(
         "Class", backref="teacher", lazy=True, cascade="all, delete-orphan"
@@ -144,12 +152,105 @@ class Writing(Base):
         Integer, ForeignKey("assignment.id", ondelete="SET NULL"), nullable=True
     )
     total_marks_percentage = Column(Float, nullable=True)
+    # Bumped on every highlight change; doubles as the highlights ETag
+    highlights_revision = Column(Integer, default=0)
     criteria_marks = relationship(
         "CriteriaMark", backref="writing", lazy=True, cascade="all, delete-orphan"
     )
     analysis_feedback = relationship(
         "AnalysisFeedback", backref="writing", lazy=True, cascade="all, delete-orphan"
     )
+    highlights = relationship(
+        "Highlight",
+        backref="writing",
+        lazy=True,
+        cascade="all, delete-orphan",
+        order_by="Highlight.start",
+    )
+    quote_anchors = relationship(
+        "QuoteAnchor",
+        backref="writing",
+        lazy=True,
+        cascade="all, delete-orphan",
+        order_by="QuoteAnchor.start",
+    )
+    pages = relationship(
+        "PageImage",
+        backref="writing",
+        lazy=True,
+        cascade="all, delete-orphan",
+        order_by="PageImage.page",
+    )
+
+
+class Highlight(Base):
+
+    __tablename__ = "highlight"
+
+    id = Column(Integer, primary_key=True)
+    writing_id = Column(
+        Integer, ForeignKey("writing.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    # Character offsets into Writing.text_content, end exclusive
+    start = Column(Integer, nullable=False)
+    end = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    color = Column(String(32), nullable=True)
+    tooltip = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class QuoteAnchor(Base):
+    """Where a quote from the AI feedback sits in Writing.text_content."""
+
+    __tablename__ = "quote_anchor"
+
+    id = Column(Integer, primary_key=True)
+    writing_id = Column(
+        Integer, ForeignKey("writing.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    criteria_id = Column(
+        Integer, ForeignKey("criteria.id", ondelete="CASCADE"), nullable=True
+    )
+    source = Column(String(20), nullable=False)  # "feedback" or "criteria"
+    label = Column(Text, nullable=True)
+    quote = Column(Text, nullable=False)
+    start = Column(Integer, nullable=False)
+    end = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class ImageBlob(Base):
+    """An uploaded page image in the blob store, keyed by its SHA-256."""
+
+    __tablename__ = "image_blob"
+
+    hash = Column(String(64), primary_key=True)
+    content_type = Column(String(50), nullable=False)
+    size = Column(Integer, nullable=False)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    thumbnail_hash = Column(String(64), nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    # Stamped whenever an upload stores or reuses the image; prune_blobs()
+    # only removes blobs unused for a while
+    last_used_at = Column(DateTime, default=datetime.now)
+
+
+class PageImage(Base):
+    """One uploaded page of a writing sample (page_images)."""
+
+    __tablename__ = "page_image"
+
+    id = Column(Integer, primary_key=True)
+    writing_id = Column(
+        Integer, ForeignKey("writing.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    page = Column(Integer, nullable=False)
+    filename = Column(String(255), nullable=True)
+    blob_hash = Column(String(64), ForeignKey("image_blob.hash"), nullable=False, index=True)
+    blob = relationship("ImageBlob", lazy="joined")
 
 
 class Assignment(Base):
@@ -173,6 +274,45 @@ class Assignment(Base):
     submissions = relationship("Writing", backref="assignment", lazy=True)
 
 
+class ClassFeedbackReport(Base):
+    """Last generated class feedback for an assignment."""
+
+    __tablename__ = "class_feedback_report"
+
+    id = Column(Integer, primary_key=True)
+    assignment_id = Column(
+        Integer,
+        ForeignKey("assignment.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+    )
+    # sha256 of the submissions and marks the report was generated from
+    fingerprint = Column(String(64), nullable=False)
+    report = Column(Text, nullable=False)  # JSON
+    submission_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class GeneratedWagoll(Base):
+    """Last AI-generated WAGOLL for an assignment."""
+
+    __tablename__ = "generated_wagoll"
+
+    id = Column(Integer, primary_key=True)
+    assignment_id = Column(
+        Integer,
+        ForeignKey("assignment.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+    )
+    # sha256 of the criteria set and best examples it was generated from
+    fingerprint = Column(String(64), nullable=False)
+    result = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
 class Criteria(Base):
 
     __tablename__ = "criteria"
@@ -243,3 +383,138 @@ class WagollExample(Base):
     assignment = relationship("Assignment", backref="wagollexamples", lazy=True)
 
 
+
+
+class TeacherActivity(Base):
+    """Per-teacher counters for the admin dashboards, kept by admin_metrics."""
+
+    __tablename__ = "teacher_activity"
+
+    teacher_id = Column(
+        Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True
+    )
+    class_count = Column(Integer, nullable=False, default=0)
+    student_count = Column(Integer, nullable=False, default=0)
+    writing_count = Column(Integer, nullable=False, default=0)
+    last_activity = Column(DateTime, nullable=True)
+    refreshed_at = Column(DateTime, default=datetime.now)
+
+
+class DailyActivity(Base):
+    """Submissions and AI feedback ratings per day, kept by admin_metrics."""
+
+    __tablename__ = "daily_activity"
+
+    day = Column(Date, primary_key=True)
+    submissions = Column(Integer, nullable=False, default=0)
+    feedback_count = Column(Integer, nullable=False, default=0)
+    helpful_count = Column(Integer, nullable=False, default=0)
+    writing_age_accurate = Column(Integer, nullable=False, default=0)
+    strengths_accurate = Column(Integer, nullable=False, default=0)
+    development_accurate = Column(Integer, nullable=False, default=0)
+    criteria_accurate = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=datetime.now)
+
+
+class LLMUsage(Base):
+    """One model call: tokens, latency and who it was made for (llm_usage)."""
+
+    __tablename__ = "llm_usage"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    # Kept when the teacher is deleted so spend totals stay correct
+    teacher_id = Column(
+        Integer, ForeignKey("user.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    route = Column(String(200), nullable=True)
+    prompt_type = Column(String(50), nullable=False)
+    model = Column(String(100), nullable=True)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    cached_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Integer, nullable=False, default=0)
+
+
+class RemarkJob(Base):
+    """A bulk re-mark of stored writing, run and checkpointed by remarking."""
+
+    __tablename__ = "remark_job"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.now)
+    created_by = Column(
+        Integer, ForeignKey("user.id", ondelete="SET NULL"), nullable=True
+    )
+    # Filter; unset fields match everything
+    assignment_id = Column(Integer, nullable=True)
+    class_id = Column(Integer, nullable=True)
+    date_from = Column(DateTime, nullable=True)
+    date_to = Column(DateTime, nullable=True)
+    rescore_criteria = Column(Boolean, nullable=False, default=True)
+    reanalyse = Column(Boolean, nullable=False, default=False)
+    # Queue the criteria scoring through llm_batch instead of calling the
+    # model directly
+    batch = Column(Boolean, nullable=False, default=False)
+    # pending, running, batched (queued, waiting for batch results), done,
+    # failed or cancelled
+    status = Column(String(20), nullable=False, default="pending")
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    # Checkpoint: writings are re-marked in id order, so every matching
+    # writing up to this id is done
+    last_writing_id = Column(Integer, nullable=False, default=0)
+    # Touched by the worker running the job; a stale heartbeat lets
+    # another process resume it
+    heartbeat_at = Column(DateTime, nullable=True)
+    # Token of the run that claimed the job; a run that has been taken
+    # over stops writing
+    worker = Column(String(32), nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
+
+
+class LLMBatch(Base):
+    """One batch of model requests submitted by llm_batch."""
+
+    __tablename__ = "llm_batch"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    backend = Column(String(20), nullable=False)
+    provider_batch_id = Column(String(100), nullable=True)
+    # preparing, submitted, collecting, done or failed
+    status = Column(String(20), nullable=False, default="preparing")
+    # The provider's last word on it, e.g. completed or expired
+    provider_status = Column(String(20), nullable=True)
+    request_count = Column(Integer, nullable=False, default=0)
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
+
+
+class LLMBatchRequest(Base):
+    """A chat completion waiting for, or answered by, an LLMBatch."""
+
+    __tablename__ = "llm_batch_request"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.now)
+    batch_id = Column(
+        Integer, ForeignKey("llm_batch.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    # Which handler applies the result (class_feedback, wagoll, criteria)
+    # and the row it is for: an assignment or a writing
+    kind = Column(String(30), nullable=False)
+    target_id = Column(Integer, nullable=False)
+    teacher_id = Column(
+        Integer, ForeignKey("user.id", ondelete="SET NULL"), nullable=True
+    )
+    # queued, submitted, done or failed
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    body = Column(Text, nullable=True)  # JSON chat.completions kwargs, cleared once answered
+    context = Column(Text, nullable=True)  # JSON the handler needs to apply the result
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
@@ -0,0 +1,148 @@
+"""
+In-process HTTP cache for the public marketing and legal pages.
+
+These pages carry no per-user data, so the rendered HTML is held in memory
+with ETag / Last-Modified validators and a public Cache-Control header.
+They can be pre-rendered at startup (PUBLIC_BASE_URLS) or exported to
+static files:
+
+    python page_cache.py export ./static_export --base-url https://scribl-v1.onrender.com
+"""
+import argparse
+import hashlib
+import logging
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from templating import static_fragments
+
+logger = logging.getLogger(__name__)
+
+
+# Public path -> template. Route handlers and the export use the same table.
+PUBLIC_PAGES = {
+    "/landing": "landing_page.html",
+    "/terms": "terms.html",
+    "/privacy": "privacy.html",
+    "/data-protection": "data_protection.html",
+    "/data-processing": "data_processing.html",
+}
+
+DEFAULT_MAX_AGE = int(os.getenv("PUBLIC_PAGE_MAX_AGE", 3600))
+
+
+class PublicPageCache:
+    def __init__(self, fragments, max_age: int = DEFAULT_MAX_AGE):
+        self.fragments = fragments
+        self.max_age = max_age
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, request: Request, name: str) -> dict:
+        mtime = self.fragments.last_modified(name)
+        key = (name, str(request.base_url))
+        entry = self._pages.get(key)
+        if entry and entry["mtime"] == mtime:
+            return entry
+
+        body = self.fragments.render(request, name).encode("utf-8")
+        entry = {
+            "mtime": mtime,
+            "body": body,
+            "etag": f'"{hashlib.sha1(body).hexdigest()}"',
+            "last_modified": formatdate(mtime, usegmt=True),
+        }
+        with self._lock:
+            self._pages[key] = entry
+        return entry
+
+    def _not_modified(self, request: Request, entry: dict) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            return entry["etag"] in [tag.strip() for tag in if_none_match.split(",")]
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(entry["mtime"]) <= since
+        return False
+
+    def response(self, request: Request, name: str) -> Response:
+        entry = self._entry(request, name)
+        headers = {
+            "ETag": entry["etag"],
+            "Last-Modified": entry["last_modified"],
+            "Cache-Control": f"public, max-age={self.max_age}",
+        }
+        if self._not_modified(request, entry):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry["body"], media_type="text/html", headers=headers)
+
+    def prerender(self, app, base_url: str) -> int:
+        """Render every public page for `base_url` without a real request."""
+        rendered = 0
+        for path, name in PUBLIC_PAGES.items():
+            try:
+                self._entry(build_request(app, base_url, path), name)
+                rendered += 1
+            except Exception as e:
+                logger.warning(f"Could not pre-render {path} for {base_url}: {e}")
+        return rendered
+
+    def export(self, app, base_url: str, directory: str) -> list[str]:
+        """Write every public page to `directory` as <path>.html."""
+        os.makedirs(directory, exist_ok=True)
+        written = []
+        for path, name in PUBLIC_PAGES.items():
+            entry = self._entry(build_request(app, base_url, path), name)
+            target = os.path.join(directory, f"{path.strip('/')}.html")
+            with open(target, "wb") as f:
+                f.write(entry["body"])
+            written.append(target)
+        return written
+
+
+def build_request(app, base_url: str, path: str) -> Request:
+    scheme, _, netloc = base_url.rstrip("/").partition("://")
+    host, _, port_str = netloc.partition(":")
+    port = int(port_str) if port_str else (443 if scheme == "https" else 80)
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "scheme": scheme,
+        "server": (host, port),
+        "path": path,
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", netloc.encode("latin-1"))],
+        "app": app,
+        "router": app.router,
+    }
+    return Request(scope)
+
+
+public_pages = PublicPageCache(static_fragments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the public pages as static HTML")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("directory")
+    parser.add_argument("--base-url", required=True)
+    args = parser.parse_args()
+
+    from app import app
+
+    for target in public_pages.export(app, args.base_url, args.directory):
+        print(target)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Original page images for writing samples.
+
+/process keeps every uploaded page: the bytes go to the blob store
+(blob_store) and a PageImage row links the page to its writing. An
+ImageBlob row per distinct image holds its size, dimensions and
+thumbnail, so identical pages are stored once and thumbnailed once,
+however many writings use them.
+
+Re-transcription, re-marking and the portfolio read pages back from
+here instead of asking for another upload. Deleting a writing removes
+its PageImage rows only; prune_blobs() later removes images no page
+refers to any more and no upload has used for PRUNE_GRACE. An upload
+reusing an image stamps its row, which also locks it against a prune
+running at the same time.
+"""
+import io
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from background import run_periodically
+from blob_store import blob_key, get_store
+from models import ImageBlob, PageImage
+
+logger = logging.getLogger(__name__)
+
+
+THUMBNAIL_SIZE = (320, 320)
+PRUNE_INTERVAL = int(os.getenv("BLOB_PRUNE_INTERVAL", 3600))
+# Blobs used more recently than this are left alone, in case the upload
+# that stored them has not committed its pages yet
+PRUNE_GRACE = timedelta(hours=1)
+
+
+def _thumbnail(data: bytes):
+    """(thumbnail JPEG bytes, width, height) of an image, or Nones if unreadable."""
+    from PIL import Image
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        width, height = img.size
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail(THUMBNAIL_SIZE)
+        output = io.BytesIO()
+        img.save(output, format="JPEG", quality=80)
+        return output.getvalue(), width, height
+    except Exception as e:
+        logger.warning(f"Could not thumbnail page image: {str(e)}")
+        return None, None, None
+
+
+def _content_type(filename: str) -> str:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    return {"png": "image/png", "gif": "image/gif", "webp": "image/webp"}.get(extension, "image/jpeg")
+
+
+def store_blob(db: Session, data: bytes, filename: str = None) -> ImageBlob:
+    """The ImageBlob for `data`, storing it and its thumbnail if it is new."""
+    key = blob_key(data)
+    # Waits for a prune that is deleting the row, and then finds nothing
+    reused = (
+        db.query(ImageBlob)
+        .filter(ImageBlob.hash == key)
+        .update({ImageBlob.last_used_at: datetime.now()}, synchronize_session=False)
+    )
+    if reused:
+        return db.get(ImageBlob, key)
+
+    store = get_store()
+    store.put(data)
+    thumbnail, width, height = _thumbnail(data)
+    blob = ImageBlob(
+        hash=key,
+        content_type=_content_type(filename),
+        size=len(data),
+        width=width,
+        height=height,
+        thumbnail_hash=store.put(thumbnail) if thumbnail else None,
+        last_used_at=datetime.now(),
+    )
+    db.add(blob)
+    return blob
+
+
+def store_pages(db: Session, writing_id: int, pages) -> list[PageImage]:
+    """
+    Keep the uploaded `pages`, (filename, bytes) pairs in page order, for
+    a writing. Replaces any pages it already had. Commits.
+    """
+    for attempt in range(2):
+        db.query(PageImage).filter(PageImage.writing_id == writing_id).delete(
+            synchronize_session=False
+        )
+        rows = []
+        for number, (filename, data) in enumerate(pages, start=1):
+            blob = store_blob(db, data, filename)
+            rows.append(
+                PageImage(writing_id=writing_id, page=number, filename=filename, blob_hash=blob.hash)
+            )
+        db.add_all(rows)
+        try:
+            db.commit()
+            return rows
+        except IntegrityError:
+            # Another upload stored the same image first; use its row
+            db.rollback()
+            if attempt:
+                raise
+
+
+def load_pages(db: Session, writing_id: int) -> list[tuple[str, bytes]]:
+    """A writing's stored pages as (filename, bytes), in page order."""
+    store = get_store()
+    return [
+        (filename, store.get(blob_hash))
+        for filename, blob_hash in db.query(PageImage.filename, PageImage.blob_hash)
+        .filter(PageImage.writing_id == writing_id)
+        .order_by(PageImage.page)
+    ]
+
+
+def prune_blobs(db: Session) -> int:
+    """Delete stored images that no page refers to. Returns how many went."""
+    unused = (
+        func.coalesce(ImageBlob.last_used_at, ImageBlob.created_at) < datetime.now() - PRUNE_GRACE,
+        ImageBlob.hash.not_in(select(PageImage.blob_hash)),
+    )
+    orphans = db.query(ImageBlob.hash, ImageBlob.thumbnail_hash).filter(*unused).all()
+
+    keys = set()
+    pruned = 0
+    for blob_hash, thumbnail_hash in orphans:
+        # Deleted one by one with the conditions checked again, so a blob an
+        # upload has stamped since the select above is kept
+        if db.query(ImageBlob).filter(ImageBlob.hash == blob_hash, *unused).delete(
+            synchronize_session=False
+        ):
+            keys.update(key for key in (blob_hash, thumbnail_hash) if key)
+            pruned += 1
+    if not pruned:
+        db.rollback()
+        return 0
+    # Identical thumbnails of different uploads share a key
+    for kept in db.query(ImageBlob.hash, ImageBlob.thumbnail_hash).filter(
+        or_(ImageBlob.hash.in_(keys), ImageBlob.thumbnail_hash.in_(keys))
+    ):
+        keys.difference_update(kept)
+
+    # The files go while the deleted rows are still locked: an upload of
+    # the same image waits for the commit, finds no row and writes the file
+    # again, rather than reusing a file about to be unlinked
+    store = get_store()
+    for key in keys:
+        try:
+            store.delete(key)
+        except Exception as e:
+            logger.error(f"Error deleting blob {key}: {str(e)}")
+    db.commit()
+    logger.info(f"Pruned {pruned} unused page images")
+    return pruned
+
+
+def start_pruner():
+    """Prune unused page images every PRUNE_INTERVAL seconds."""
+    return run_periodically("page image pruning", prune_blobs, PRUNE_INTERVAL, PRUNE_INTERVAL)
@@ -0,0 +1,554 @@
+"""
+Bulk re-marking of stored writing.
+
+When the prompts or the model change, a RemarkJob re-scores history: it
+selects writings by assignment, class and date range, and re-runs
+criteria scoring (image_processing.evaluate_criteria) and/or the
+writing-age analysis (analyze_text) over their stored transcriptions.
+
+A job works through its writings in id order, REMARK_CHUNK_SIZE at a
+time. Each chunk's model calls run REMARK_WORKERS at a time at BATCH
+priority, so llm_scheduler serves teachers' own uploads first, and the
+chunk's results are written in one transaction together with the job's
+checkpoint (last_writing_id). A writing whose calls fail keeps its old
+marks and is counted in `failed`.
+
+A batch-mode job (criteria scoring only) makes no model calls itself:
+each chunk's requests are queued for llm_batch together with the
+checkpoint, the job waits as "batched", and every result counts towards
+`processed` as its batch comes back. The job is done once they all have.
+
+A job that stops part way, because the process restarted or crashed,
+carries on from its checkpoint: resume_stale_jobs() runs at startup and
+every RESUME_INTERVAL seconds and restarts unfinished jobs whose
+heartbeat has gone stale. The heartbeat, refreshed every HEARTBEAT_INTERVAL
+seconds while a chunk's calls are in flight, also stops two processes
+from running the same job: each run claims the job with its own token,
+and a run that finds the job taken over stops without committing.
+
+Run it from the command line to re-mark in the foreground:
+    python remarking.py [--assignment ID] [--class ID] [--from 2025-09-01]
+        [--to 2026-07-31] [--analysis] [--no-criteria] [--batch]
+    python remarking.py --resume JOB_ID
+"""
+import argparse
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+import llm_batch
+import llm_scheduler
+from anchoring import anchor_feedback, feedback_sources
+from background import run_in_thread, run_periodically
+from class_feedback import schedule_refresh
+from image_processing import (
+    analyze_text,
+    criteria_request,
+    evaluate_criteria,
+    parse_evaluations,
+    tidy_feedback,
+)
+from llm_usage import TokenBudgetExceeded
+from models import Assignment, CriteriaMark, QuoteAnchor, RemarkJob, Student, Writing
+
+logger = logging.getLogger(__name__)
+
+
+REMARK_CHUNK_SIZE = int(os.getenv("REMARK_CHUNK_SIZE", 50))
+REMARK_WORKERS = int(os.getenv("REMARK_WORKERS", 4))
+# A running job whose heartbeat is older than this has lost its worker
+STALE_AFTER = timedelta(minutes=int(os.getenv("REMARK_STALE_MINUTES", 10)))
+RESUME_INTERVAL = 300
+HEARTBEAT_INTERVAL = 60
+
+UNFINISHED = ("pending", "running")
+
+
+def _matching(job: RemarkJob):
+    """Select of the ids of the writings a job covers."""
+    query = select(Writing.id)
+    if job.class_id:
+        query = query.join(Student, Writing.student_id == Student.id).where(
+            Student.class_id == job.class_id
+        )
+    if job.assignment_id:
+        query = query.where(Writing.assignment_id == job.assignment_id)
+    if job.date_from:
+        query = query.where(Writing.created_at >= job.date_from)
+    if job.date_to:
+        query = query.where(Writing.created_at < job.date_to)
+    if not job.reanalyse:
+        # Only writing set for an assignment has criteria to score
+        query = query.where(Writing.assignment_id.is_not(None))
+    return query
+
+
+def create_job(
+    db: Session,
+    created_by: int = None,
+    assignment_id: int = None,
+    class_id: int = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    rescore_criteria: bool = True,
+    reanalyse: bool = False,
+    batch: bool = False,
+) -> RemarkJob:
+    """Record a job for the writings matching the filter; date_to is exclusive."""
+    if not (rescore_criteria or reanalyse):
+        raise ValueError("Choose criteria scoring, analysis or both")
+    if batch and (reanalyse or not rescore_criteria):
+        raise ValueError("Batch mode re-scores criteria only")
+    if batch and not llm_batch.enabled():
+        raise ValueError("Batch mode needs LLM_BATCH to be set")
+
+    job = RemarkJob(
+        created_by=created_by,
+        assignment_id=assignment_id,
+        class_id=class_id,
+        date_from=date_from,
+        date_to=date_to,
+        rescore_criteria=rescore_criteria,
+        reanalyse=reanalyse,
+        batch=batch,
+    )
+    job.total = db.scalar(select(func.count()).select_from(_matching(job).subquery()))
+    db.add(job)
+    db.commit()
+    return job
+
+
+def _claim(db: Session, job_id: int) -> Optional[str]:
+    """
+    Take the job for this run, unless another one is running it. Returns
+    the run's owner token, or None.
+    """
+    now = datetime.now()
+    owner = uuid.uuid4().hex
+    result = db.execute(
+        update(RemarkJob)
+        .where(
+            RemarkJob.id == job_id,
+            RemarkJob.status.in_(UNFINISHED),
+            or_(RemarkJob.heartbeat_at.is_(None), RemarkJob.heartbeat_at < now - STALE_AFTER),
+        )
+        .values(
+            status="running",
+            heartbeat_at=now,
+            worker=owner,
+            started_at=func.coalesce(RemarkJob.started_at, now),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return owner if result.rowcount == 1 else None
+
+
+def _heartbeat(connection, job_id: int, owner: str) -> bool:
+    """Touch the job's heartbeat. False if another run has taken it over."""
+    result = connection.execute(
+        update(RemarkJob)
+        .where(RemarkJob.id == job_id, RemarkJob.worker == owner)
+        .values(heartbeat_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _wait(db: Session, job_id: int, owner: str, futures) -> bool:
+    """
+    Wait for a chunk's calls, keeping the heartbeat fresh. The heartbeat is
+    written on its own connection so the session's loaded chunk is not
+    expired by a commit. False if the job was taken over meanwhile.
+    """
+    pending = set(futures)
+    while pending:
+        _, pending = wait(pending, timeout=HEARTBEAT_INTERVAL)
+        if pending:
+            with db.get_bind().begin() as connection:
+                if not _heartbeat(connection, job_id, owner):
+                    return False
+    return True
+
+
+def _marks(criteria, evaluations: list[dict]) -> list[dict]:
+    if not evaluations:
+        raise RuntimeError("criteria scoring returned no evaluations")
+    return [
+        {
+            "criteria": criterion.description,
+            "criteria_id": criterion.id,
+            "score": min(2, max(0, int(evaluation.get("score", 0)))),
+            "justification": evaluation.get("justification", ""),
+        }
+        for criterion, evaluation in zip(criteria, evaluations)
+    ]
+
+
+def _remark(rescore_criteria: bool, reanalyse: bool, text: str, assignment, teacher_id) -> dict:
+    """New marks and/or analysis for one writing. Runs on a worker thread."""
+    result = {}
+    if rescore_criteria and assignment and assignment.criteria:
+        evaluations = evaluate_criteria(
+            assignment, text, teacher_id=teacher_id, priority=llm_scheduler.BATCH
+        )
+        result["marks"] = _marks(assignment.criteria, evaluations)
+    if reanalyse:
+        analysis = analyze_text(text, assignment, teacher_id=teacher_id, priority=llm_scheduler.BATCH)
+        if analysis["age"] == "Unable to determine":
+            raise RuntimeError("analysis gave no writing age")
+        result["writing_age"], result["feedback"] = tidy_feedback(analysis)
+    result["anchors"] = anchor_feedback(
+        text, feedback_sources(result.get("feedback", ""), result.get("marks", []))
+    )
+    return result
+
+
+def _apply(db: Session, writing: Writing, result: dict):
+    """Replace a writing's marks and/or analysis, and their quote anchors."""
+    sources = []
+    marks = result.get("marks")
+    if marks is not None:
+        sources.append("criteria")
+        db.query(CriteriaMark).filter_by(writing_id=writing.id).delete(synchronize_session=False)
+        db.add_all(
+            CriteriaMark(writing_id=writing.id, criteria_id=mark["criteria_id"], score=mark["score"])
+            for mark in marks
+        )
+        if marks:
+            writing.total_marks_percentage = (
+                sum(mark["score"] for mark in marks) / (len(marks) * 2)
+            ) * 100
+    if "feedback" in result:
+        sources.append("feedback")
+        writing.writing_age = result["writing_age"]
+        writing.feedback = result["feedback"]
+    if not sources:
+        return
+
+    db.query(QuoteAnchor).filter(
+        QuoteAnchor.writing_id == writing.id, QuoteAnchor.source.in_(sources)
+    ).delete(synchronize_session=False)
+    db.add_all(QuoteAnchor(writing_id=writing.id, **anchor) for anchor in result["anchors"])
+    # The anchors are served with the highlights, so their ETag has to change
+    writing.highlights_revision = func.coalesce(Writing.highlights_revision, 0) + 1
+
+
+def _next_chunk(db: Session, job: RemarkJob) -> list[Writing]:
+    return (
+        db.query(Writing)
+        .options(
+            selectinload(Writing.assignment).selectinload(Assignment.criteria),
+            selectinload(Writing.assignment).joinedload(Assignment.class_group),
+            joinedload(Writing.student).joinedload(Student.class_group),
+        )
+        .filter(Writing.id.in_(_matching(job)), Writing.id > job.last_writing_id)
+        .order_by(Writing.id)
+        .limit(REMARK_CHUNK_SIZE)
+        .all()
+    )
+
+
+def _queue_chunk(db: Session, job: RemarkJob, writings: list[Writing]) -> tuple[int, int]:
+    """
+    Queue batch requests for a chunk's criteria scoring. Returns (done,
+    failed): writings with no criteria to score, and those whose teacher
+    is out of tokens, which are counted now rather than when a batch
+    comes back.
+    """
+    done = failed = 0
+    for writing in writings:
+        criteria = writing.assignment.criteria if writing.assignment else []
+        if not criteria:
+            done += 1
+            continue
+        try:
+            llm_batch.enqueue(
+                db,
+                "criteria",
+                writing.id,
+                criteria_request(writing.assignment, writing.text_content),
+                teacher_id=writing.student.class_group.teacher_id,
+                context={"job_id": job.id, "criteria_ids": [c.id for c in criteria]},
+                replace=False,
+            )
+        except TokenBudgetExceeded as e:
+            logger.warning(f"Re-mark job {job.id}: writing {writing.id} failed: {str(e)}")
+            failed += 1
+    return done + failed, failed
+
+
+def _count(db: Session, job_id: int, processed: int, failed: int = 0):
+    """Add to a job's counters in SQL, as batch results land concurrently."""
+    db.execute(
+        update(RemarkJob)
+        .where(RemarkJob.id == job_id)
+        .values(processed=RemarkJob.processed + processed, failed=RemarkJob.failed + failed)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _finish_batched(db: Session, job_id: int):
+    """Mark a batched job done once every queued writing has come back."""
+    db.execute(
+        update(RemarkJob)
+        .where(
+            RemarkJob.id == job_id,
+            RemarkJob.status == "batched",
+            RemarkJob.processed >= RemarkJob.total,
+        )
+        .values(status="done", finished_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _apply_batch_result(db: Session, request, content: str):
+    context = json.loads(request.context)
+    writing = (
+        db.query(Writing)
+        .options(selectinload(Writing.assignment).selectinload(Assignment.criteria))
+        .filter(Writing.id == request.target_id)
+        .first()
+    )
+    if writing is None:
+        raise RuntimeError("writing was deleted")
+    criteria = writing.assignment.criteria if writing.assignment else []
+    if [c.id for c in criteria] != context["criteria_ids"]:
+        raise RuntimeError("criteria changed after the request was queued")
+
+    marks = _marks(criteria, parse_evaluations(content))
+    _apply(
+        db,
+        writing,
+        {"marks": marks, "anchors": anchor_feedback(writing.text_content, feedback_sources("", marks))},
+    )
+    _count(db, context["job_id"], 1)
+    _finish_batched(db, context["job_id"])
+    # Class summaries quote the marks, so they are rebuilt as well
+    schedule_refresh(writing.assignment_id)
+
+
+def _batch_request_failed(db: Session, request):
+    job_id = json.loads(request.context)["job_id"]
+    _count(db, job_id, 1, 1)
+    _finish_batched(db, job_id)
+
+
+llm_batch.register_handler("criteria", _apply_batch_result, _batch_request_failed)
+
+
+def run_job(db: Session, job_id: int):
+    """Work through a job from its checkpoint until it is done or cancelled."""
+    owner = _claim(db, job_id)
+    if owner is None:
+        logger.info(f"Re-mark job {job_id} is finished or running elsewhere")
+        return
+
+    job = db.get(RemarkJob, job_id)
+    assignments = set()
+    executor = ThreadPoolExecutor(max_workers=REMARK_WORKERS, thread_name_prefix="remark")
+    try:
+        while True:
+            db.refresh(job)
+            if job.status != "running":
+                break
+
+            writings = _next_chunk(db, job)
+            if not writings:
+                if job.batch:
+                    # Count what was actually queued, in case writings came
+                    # or went since the job was created
+                    job.total = db.scalar(
+                        select(func.count()).select_from(
+                            _matching(job).where(Writing.id <= job.last_writing_id).subquery()
+                        )
+                    )
+                    job.status = "batched"
+                    db.flush()
+                    _finish_batched(db, job.id)
+                else:
+                    job.status = "done"
+                    job.finished_at = datetime.now()
+                if not _heartbeat(db, job.id, owner):
+                    db.rollback()
+                    logger.warning(f"Re-mark job {job_id} was taken over by another run")
+                    break
+                db.commit()
+                break
+
+            if job.batch:
+                done, failed = _queue_chunk(db, job, writings)
+                _count(db, job.id, done, failed)
+                job.last_writing_id = writings[-1].id
+                if not _heartbeat(db, job.id, owner):
+                    db.rollback()
+                    logger.warning(f"Re-mark job {job_id} was taken over by another run")
+                    break
+                db.commit()
+                logger.info(f"Re-mark job {job_id}: queued up to writing {job.last_writing_id}")
+                continue
+
+            futures = [
+                executor.submit(
+                    _remark,
+                    job.rescore_criteria,
+                    job.reanalyse,
+                    writing.text_content,
+                    writing.assignment,
+                    writing.student.class_group.teacher_id,
+                )
+                for writing in writings
+            ]
+            if not _wait(db, job.id, owner, futures):
+                logger.warning(f"Re-mark job {job_id} was taken over by another run")
+                break
+            results = []
+            for writing, future in zip(writings, futures):
+                try:
+                    results.append((writing, future.result()))
+                except Exception as e:
+                    logger.warning(f"Re-mark job {job_id}: writing {writing.id} failed: {str(e)}")
+
+            # Written only once every call is back, so the transaction stays
+            # short. A database error fails the chunk as a whole, leaving the
+            # checkpoint where it was.
+            for writing, result in results:
+                _apply(db, writing, result)
+                if writing.assignment_id:
+                    assignments.add(writing.assignment_id)
+
+            job.processed += len(writings)
+            job.failed += len(writings) - len(results)
+            job.last_writing_id = writings[-1].id
+            # Checked in the chunk's own transaction, so a run that has been
+            # taken over cannot move the checkpoint
+            if not _heartbeat(db, job.id, owner):
+                db.rollback()
+                logger.warning(f"Re-mark job {job_id} was taken over by another run")
+                break
+            db.commit()
+            logger.info(f"Re-mark job {job_id}: {job.processed}/{job.total} writings")
+
+    except Exception as e:
+        logger.error(f"Re-mark job {job_id} failed: {str(e)}")
+        db.rollback()
+        if _heartbeat(db, job.id, owner):
+            job.status = "failed"
+            job.error = str(e)
+            job.finished_at = datetime.now()
+        db.commit()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        # Class summaries quote the marks, so they are rebuilt as well
+        for assignment_id in assignments:
+            schedule_refresh(assignment_id)
+
+
+def start_job(job_id: int):
+    """Run a job on its own thread; it can take hours."""
+    return run_in_thread(f"re-mark job {job_id}", run_job, job_id)
+
+
+def cancel_job(db: Session, job_id: int) -> bool:
+    """Stop a job after its current chunk. False if it had already finished."""
+    result = db.execute(
+        update(RemarkJob)
+        .where(RemarkJob.id == job_id, RemarkJob.status.in_(UNFINISHED))
+        .values(status="cancelled", finished_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def resume_stale_jobs(db: Session) -> int:
+    """Restart unfinished jobs that no process is working on."""
+    job_ids = db.scalars(
+        select(RemarkJob.id).where(
+            RemarkJob.status.in_(UNFINISHED),
+            or_(
+                RemarkJob.heartbeat_at.is_(None),
+                RemarkJob.heartbeat_at < datetime.now() - STALE_AFTER,
+            ),
+        )
+    ).all()
+    for job_id in job_ids:
+        logger.info(f"Resuming re-mark job {job_id}")
+        start_job(job_id)
+    return len(job_ids)
+
+
+def start_resumer():
+    return run_periodically("re-mark job resume", resume_stale_jobs, RESUME_INTERVAL)
+
+
+def job_status(job: RemarkJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "assignment_id": job.assignment_id,
+        "class_id": job.class_id,
+        "date_from": job.date_from.isoformat() if job.date_from else None,
+        "date_to": job.date_to.isoformat() if job.date_to else None,
+        "rescore_criteria": job.rescore_criteria,
+        "reanalyse": job.reanalyse,
+        "batch": bool(job.batch),
+        "total": job.total,
+        "processed": job.processed,
+        "failed": job.failed,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "error": job.error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--assignment", type=int)
+    parser.add_argument("--class", dest="class_id", type=int)
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="inclusive")
+    parser.add_argument("--analysis", action="store_true", help="re-run the writing-age analysis")
+    parser.add_argument("--no-criteria", action="store_true", help="keep the criteria marks")
+    parser.add_argument(
+        "--batch", action="store_true", help="queue the criteria scoring for llm_batch"
+    )
+    parser.add_argument("--resume", type=int, metavar="JOB_ID")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        job_id = args.resume
+        if job_id is None:
+            job_id = create_job(
+                db,
+                assignment_id=args.assignment,
+                class_id=args.class_id,
+                date_from=datetime.combine(args.date_from, datetime.min.time()) if args.date_from else None,
+                date_to=(
+                    datetime.combine(args.date_to + timedelta(days=1), datetime.min.time())
+                    if args.date_to else None
+                ),
+                rescore_criteria=not args.no_criteria,
+                reanalyse=args.analysis,
+                batch=args.batch,
+            ).id
+            print(f"Created re-mark job {job_id}")
+        run_job(db, job_id)
+        print(job_status(db.get(RemarkJob, job_id)))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Streaming CSV roster import.
+
+Rows are read from the uploaded file as they are parsed, so a whole-year
+roster never sits in memory as one decoded string. Each batch of
+BATCH_SIZE rows is validated together and written with one statement per
+kind of change:
+
+- new students: a multi-row INSERT, or COPY FROM STDIN on PostgreSQL;
+- students whose Student ID is already in the class: an executemany
+  UPDATE by primary key (upsert on Student ID within the class).
+
+Rows that fail validation are skipped and reported back with their
+spreadsheet row number (the header is row 1). The import commits once at
+the end, so a database error leaves the class unchanged.
+"""
+import csv
+import io
+import logging
+import re
+from datetime import date, datetime
+from typing import BinaryIO, Iterator
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from models import Student
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+MAX_FIELD_LENGTH = 50  # Student.student_id, first_name and last_name
+
+REQUIRED_COLUMNS = ("First Name", "Last Name", "Date of Birth")
+DATE_PATTERN = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+
+COPY_COLUMNS = ("student_id", "first_name", "last_name", "date_of_birth", "class_id", "created_at")
+
+
+class RosterImportError(ValueError):
+    """The file as a whole cannot be imported (wrong encoding or headers)."""
+
+
+def iter_batches(upload: BinaryIO, batch_size: int = BATCH_SIZE) -> Iterator[list[tuple[int, dict]]]:
+    """
+    Yield lists of (row_number, row) from a binary CSV stream. The stream
+    is decoded incrementally; a byte-order mark from Excel is ignored.
+    """
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        columns = [c.strip() for c in (reader.fieldnames or [])]
+        missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+        if missing:
+            raise RosterImportError(f"Missing columns: {', '.join(missing)}")
+        reader.fieldnames = columns
+
+        batch = []
+        for row in reader:
+            batch.append((reader.line_num, row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    except UnicodeDecodeError:
+        raise RosterImportError("The file is not UTF-8 encoded")
+    finally:
+        # Leave the upload open for its owner to close
+        text.detach()
+
+
+def _parse_date(value: str, cache: dict):
+    """YYYY-MM-DD to a date, or None. Rosters repeat birth dates, so cache."""
+    if value in cache:
+        return cache[value]
+    parsed = None
+    match = DATE_PATTERN.match(value)
+    if match:
+        try:
+            parsed = date(*(int(part) for part in match.groups()))
+        except ValueError:
+            pass
+    cache[value] = parsed
+    return parsed
+
+
+def validate_batch(batch, seen_ids: dict, errors: list) -> list[dict]:
+    """
+    Clean one batch of rows into Student column dicts. Invalid rows are
+    appended to `errors` as {"row", "error"}; `seen_ids` maps Student IDs
+    already imported from this file to their row number.
+    """
+    dates = {}
+    records = []
+    for row_number, row in batch:
+        first_name = (row.get("First Name") or "").strip()
+        last_name = (row.get("Last Name") or "").strip()
+        student_id = (row.get("Student ID") or "").strip() or None
+        dob_text = (row.get("Date of Birth") or "").strip()
+
+        if not first_name and not last_name and not dob_text and not student_id:
+            continue  # blank line
+        if not first_name or not last_name:
+            error = "First and last name required"
+        elif max(len(first_name), len(last_name), len(student_id or "")) > MAX_FIELD_LENGTH:
+            error = f"Fields must be at most {MAX_FIELD_LENGTH} characters"
+        elif student_id and student_id in seen_ids:
+            error = f"Duplicate Student ID {student_id} (also on row {seen_ids[student_id]})"
+        else:
+            error = None
+            dob = _parse_date(dob_text, dates)
+            if dob is None:
+                error = "Invalid date format, expected YYYY-MM-DD"
+
+        if error:
+            errors.append({"row": row_number, "error": error})
+            continue
+
+        if student_id:
+            seen_ids[student_id] = row_number
+        records.append(
+            {
+                "student_id": student_id,
+                "first_name": first_name,
+                "last_name": last_name,
+                "date_of_birth": dob,
+            }
+        )
+    return records
+
+
+def _copy_students(db: Session, records: list[dict]):
+    """COPY new students in (PostgreSQL with psycopg2 only)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        writer.writerow(
+            ["" if record[c] is None else record[c] for c in COPY_COLUMNS]
+        )
+    buffer.seek(0)
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY student ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_students(db: Session, records: list[dict]):
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+        _copy_students(db, records)
+    else:
+        db.execute(insert(Student), records)
+
+
+def import_students(db: Session, class_id: int, upload: BinaryIO) -> dict:
+    """
+    Import a roster CSV into a class. Rows whose Student ID already exists
+    in the class update that student; the rest are added. Returns counts
+    and the per-row error report. Raises RosterImportError for files that
+    cannot be read at all.
+    """
+    inserted = updated = 0
+    errors = []
+    seen_ids = {}
+    now = datetime.now()
+
+    try:
+        for batch in iter_batches(upload):
+            records = validate_batch(batch, seen_ids, errors)
+            if not records:
+                continue
+
+            batch_ids = [r["student_id"] for r in records if r["student_id"]]
+            existing = dict(
+                db.query(Student.student_id, Student.id).filter(
+                    Student.class_id == class_id, Student.student_id.in_(batch_ids)
+                )
+            ) if batch_ids else {}
+
+            new, changed = [], []
+            for record in records:
+                if record["student_id"] in existing:
+                    changed.append({"id": existing[record["student_id"]], **record})
+                else:
+                    new.append({**record, "class_id": class_id, "created_at": now})
+
+            if new:
+                _insert_students(db, new)
+            if changed:
+                db.execute(update(Student), changed)
+            inserted += len(new)
+            updated += len(changed)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(
+        f"Roster import for class {class_id}: {inserted} added, {updated} updated, "
+        f"{len(errors)} rows rejected"
+    )
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "error_count": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+    }
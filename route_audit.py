@@ -0,0 +1,44 @@
+import logging
+from collections import defaultdict
+
+from starlette.routing import Mount, Route
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateRouteError(RuntimeError):
+    pass
+
+
+def route_table(app) -> list[tuple[str, str, str]]:
+    """(method, path, endpoint name) for every HTTP route, in match order."""
+    table = []
+    for route in app.routes:
+        if isinstance(route, Mount) or not isinstance(route, Route):
+            continue
+        for method in sorted(route.methods or []):
+            if method == "HEAD":
+                continue
+            table.append((method, route.path, route.name))
+    return table
+
+
+def audit_routes(app):
+    """
+    Raise DuplicateRouteError when two handlers are registered for the same
+    method and path. Starlette matches the first registration, so any later
+    one is dead code that still costs a comparison on every request.
+    """
+    handlers = defaultdict(list)
+    for method, path, name in route_table(app):
+        handlers[(method, path)].append(name)
+
+    duplicates = {key: names for key, names in handlers.items() if len(names) > 1}
+    if duplicates:
+        details = "; ".join(
+            f"{method} {path} -> {', '.join(names)}"
+            for (method, path), names in sorted(duplicates.items())
+        )
+        raise DuplicateRouteError(f"Duplicate routes registered: {details}")
+
+    logger.debug(f"Route audit passed for {len(handlers)} method/path pairs")
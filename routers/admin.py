@@ -0,0 +1,467 @@
+"""Admin dashboard, user management and usage metrics."""
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import RedirectResponse, JSONResponse
+from starlette.responses import HTMLResponse, StreamingResponse
+from starlette.status import HTTP_200_OK
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import get_db
+from models import LLMBatch, LLMBatchRequest, RemarkJob, User
+from dependencies.auth import get_current_user
+from templating import templates
+from io import BytesIO
+import admin_metrics
+import deletion
+import llm_batch
+import llm_scheduler
+import llm_usage
+import remarking
+from datetime import date, datetime, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Bulk user deletions above this size run after the response is sent
+DELETE_BACKGROUND_THRESHOLD = int(os.getenv("DELETE_BACKGROUND_THRESHOLD", 20))
+
+
+def _teacher_fields(teacher: User) -> dict:
+    return {
+        "id": teacher.id,
+        "first_name": teacher.first_name,
+        "last_name": teacher.last_name,
+        "email": teacher.email,
+        "school_name": teacher.school_name,
+        "is_admin": teacher.is_admin,
+        "created_at": teacher.created_at,
+        "last_login": teacher.last_login,
+    }
+
+
+@router.post("/admin/delete-user/{user_id}")
+def delete_user(
+    user_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Delete a single user and their associated data."""
+    logger.info(f"Delete user request received for user_id: {user_id}")
+
+    if not current_user.is_admin:
+        logger.warning(f"Unauthorized: User {current_user.email} is not an admin")
+        return JSONResponse(
+            status_code=403, content={"error": "Unauthorized - not admin"}
+        )
+
+    # Don't allow admin to delete themselves
+    if user_id == current_user.id:
+        logger.warning("Attempted to delete own admin account")
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Cannot delete your own admin account"},
+        )
+
+    try:
+        if not deletion.delete_users(db, [user_id]):
+            return JSONResponse(status_code=404, content={"error": "User not found"})
+
+        admin_metrics.invalidate()
+        logger.info(f"Successfully deleted user {user_id}")
+        return JSONResponse(
+            status_code=200, content={"message": "User deleted successfully"}
+        )
+
+    except Exception as e:
+        logger.error(f"Error deleting user {user_id}: {str(e)}")
+        db.rollback()
+        return JSONResponse(status_code=500, content={"error": "Failed to delete user"})
+
+
+@router.get("/admin")
+def admin_dashboard(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Admin dashboard with enhanced user metrics and management."""
+    if not current_user.is_admin:
+        request.session["flash"] = "Unauthorized access"
+        return RedirectResponse(url="index")
+
+    try:
+        # Get all teachers (non-admin users), with counters from the rollups
+        metrics = admin_metrics.dashboard_metrics(db)
+        teachers = [
+            {**_teacher_fields(teacher), **metrics["teachers"].get(teacher.id, {})}
+            for teacher in db.query(User).filter_by(is_admin=False)
+        ]
+
+        logger.info(f"Admin dashboard loaded with {len(teachers)} teachers")
+        return templates.TemplateResponse(
+            "admin_dashboard.html",
+            {"request": request, "teachers": teachers, "metrics": metrics["totals"]},
+        )
+
+    except Exception as e:
+        logger.error(f"Error loading admin dashboard: {str(e)}")
+        request.session["flash"] = "An error occurred while loading the dashboard"
+        return RedirectResponse(url="index")
+
+
+@router.get("/admin/export")
+def export_users(
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+
+    import pandas as pd
+
+    try:
+        counters = admin_metrics.dashboard_metrics(db)["teachers"]
+        users_data = [
+            {
+                **_teacher_fields(teacher),
+                "created_at": teacher.created_at.isoformat() if teacher.created_at else None,
+                "last_login": teacher.last_login.isoformat() if teacher.last_login else None,
+                "class_count": 0,
+                "student_count": 0,
+                "upload_count": 0,
+                **{
+                    key: value
+                    for key, value in counters.get(teacher.id, {}).items()
+                    if key != "last_activity"
+                },
+            }
+            for teacher in db.query(User).filter_by(is_admin=False)
+        ]
+
+        df = pd.DataFrame(users_data)
+
+        columns = [
+            "first_name",
+            "last_name",
+            "email",
+            "school_name",
+            "created_at",
+            "last_login",
+            "class_count",
+            "student_count",
+            "upload_count",
+        ]
+        df = df[columns]
+
+        column_names = {
+            "first_name": "First Name",
+            "last_name": "Last Name",
+            "email": "Email",
+            "school_name": "School",
+            "created_at": "Signup Date",
+            "last_login": "Last Login",
+            "class_count": "Number of Classes",
+            "student_count": "Total Students",
+            "upload_count": "Total Uploads",
+        }
+        df.rename(columns=column_names, inplace=True)
+
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name="Teachers")
+            worksheet = writer.sheets["Teachers"]
+            for idx, col in enumerate(df.columns):
+                max_len = max(df[col].astype(str).apply(len).max(), len(col)) + 2
+                worksheet.column_dimensions[chr(65 + idx)].width = max_len
+
+        output.seek(0)
+        return StreamingResponse(
+            output,
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": "attachment;filename=teachers_report.xlsx"},
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+
+@router.post("/admin/delete-users")
+async def delete_users(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Delete multiple users and their associated data. Selections larger than
+    DELETE_BACKGROUND_THRESHOLD are queued and answered with 202.
+    """
+    logger.info("Bulk delete users request received")
+
+    if not current_user.is_admin:
+        logger.warning(f"Unauthorized: User {current_user.email} is not an admin")
+        return JSONResponse(
+            status_code=403, content={"error": "Unauthorized - not admin"}
+        )
+
+    try:
+        data = await request.json()
+        if not data or "user_ids" not in data:
+            logger.warning("No user IDs provided in request")
+            return JSONResponse(
+                status_code=400, content={"error": "No user IDs provided"}
+            )
+
+        user_ids = data["user_ids"]
+        if not isinstance(user_ids, list):
+            logger.warning("Invalid user IDs format provided")
+            return JSONResponse(
+                status_code=400, content={"error": "Invalid user IDs format"}
+            )
+        try:
+            user_ids = [int(user_id) for user_id in user_ids]
+        except (TypeError, ValueError):
+            return JSONResponse(
+                status_code=400, content={"error": "Invalid user IDs format"}
+            )
+
+        # Don't allow admin to delete themselves
+        if current_user.id in user_ids:
+            logger.warning("Attempted to delete own admin account in bulk delete")
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Cannot delete your own admin account"},
+            )
+
+        if len(user_ids) > DELETE_BACKGROUND_THRESHOLD:
+            deletion.delete_in_background("user", user_ids)
+            logger.info(f"Queued deletion of {len(user_ids)} users")
+            return JSONResponse(
+                status_code=202,
+                content={"message": f"Deleting {len(user_ids)} users in the background"},
+            )
+
+        deleted_count = deletion.delete_users(db, user_ids)
+        admin_metrics.invalidate()
+        logger.info(f"Successfully deleted {deleted_count} users")
+        return JSONResponse(
+            status_code=200,
+            content={"message": f"Successfully deleted {deleted_count} users"},
+        )
+
+    except Exception as e:
+        logger.error(f"Error deleting users: {str(e)}")
+        db.rollback()
+        return JSONResponse(
+            status_code=500, content={"error": "Failed to delete users"}
+        )
+
+
+@router.get("/teacher_activity", response_class=HTMLResponse)
+async def teacher_activity(
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+
+    top_teachers = admin_metrics.dashboard_metrics(db)["top_teachers"]
+    return HTMLResponse(
+        content=f"Top teachers: {top_teachers}", status_code=HTTP_200_OK
+    )
+
+
+@router.get("/feedback_metrics", response_class=HTMLResponse)
+async def feedback_metrics(
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+
+    feedback_data = admin_metrics.dashboard_metrics(db)["feedback"]
+    return HTMLResponse(
+        content=f"Feedback metrics: {feedback_data}", status_code=HTTP_200_OK
+    )
+
+
+@router.get("/submissions_over_time", response_class=HTMLResponse)
+async def submissions_over_time(
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+
+    submission_counts = admin_metrics.dashboard_metrics(db)["submission_counts"]
+    return HTMLResponse(
+        content=f"Submission counts: {submission_counts}", status_code=HTTP_200_OK
+    )
+
+
+@router.get("/admin/llm_usage")
+def llm_usage_report(
+    days: int = 30,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Token, latency and cost totals by prompt type, route, model, day and
+    teacher, plus the model-call scheduler's current queue.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+
+    report = llm_usage.usage_report(db, max(1, min(days, 365)))
+    report["scheduler"] = llm_scheduler.scheduler.snapshot()
+    return JSONResponse(content=report)
+
+
+@router.post("/admin/user/{user_id}/token_budget")
+async def set_token_budget(
+    user_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Set a teacher's daily token budget; null restores the default, 0 is unlimited."""
+    if not current_user.is_admin:
+        return JSONResponse(status_code=403, content={"error": "Unauthorized - not admin"})
+
+    try:
+        budget = (await request.json()).get("daily_token_budget")
+        if budget is not None and (not isinstance(budget, int) or budget < 0):
+            return JSONResponse(
+                status_code=400,
+                content={"error": "daily_token_budget must be a non-negative integer or null"},
+            )
+
+        user = db.get(User, user_id)
+        if not user:
+            return JSONResponse(status_code=404, content={"error": "User not found"})
+
+        user.daily_token_budget = budget
+        db.commit()
+        return JSONResponse(
+            status_code=200,
+            content={
+                "daily_token_budget": llm_usage.budget_for(db, user_id),
+                "tokens_today": llm_usage.tokens_today(db, user_id),
+            },
+        )
+
+    except Exception as e:
+        logger.error(f"Error setting token budget for user {user_id}: {str(e)}")
+        db.rollback()
+        return JSONResponse(status_code=500, content={"error": "Failed to set token budget"})
+
+
+@router.get("/admin/llm_batches")
+def list_llm_batches(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Recent batches and how many requests are waiting, by kind and status."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+
+    waiting = {}
+    for kind, status, count in (
+        db.query(LLMBatchRequest.kind, LLMBatchRequest.status, func.count(LLMBatchRequest.id))
+        .filter(LLMBatchRequest.status.in_(("queued", "submitted")))
+        .group_by(LLMBatchRequest.kind, LLMBatchRequest.status)
+    ):
+        waiting.setdefault(kind, {})[status] = count
+    batches = db.query(LLMBatch).order_by(LLMBatch.id.desc()).limit(50)
+    return JSONResponse(
+        content={
+            "enabled": llm_batch.enabled(),
+            "waiting": waiting,
+            "batches": [llm_batch.batch_status(batch) for batch in batches],
+        }
+    )
+
+
+def _parse_day(value):
+    return datetime.combine(date.fromisoformat(value), datetime.min.time()) if value else None
+
+
+@router.post("/admin/remark_jobs")
+async def create_remark_job(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Start re-marking stored writing. JSON body: assignment_id, class_id,
+    date_from and date_to (inclusive YYYY-MM-DD), all optional, plus
+    rescore_criteria (default true) and reanalyse (default false). With
+    batch (default false) the criteria scoring goes through llm_batch.
+    """
+    if not current_user.is_admin:
+        return JSONResponse(status_code=403, content={"error": "Unauthorized - not admin"})
+
+    try:
+        body = await request.json()
+        date_to = _parse_day(body.get("date_to"))
+        job = remarking.create_job(
+            db,
+            created_by=current_user.id,
+            assignment_id=body.get("assignment_id"),
+            class_id=body.get("class_id"),
+            date_from=_parse_day(body.get("date_from")),
+            date_to=date_to + timedelta(days=1) if date_to else None,
+            rescore_criteria=bool(body.get("rescore_criteria", True)),
+            reanalyse=bool(body.get("reanalyse", False)),
+            batch=bool(body.get("batch", False)),
+        )
+    except ValueError as e:
+        db.rollback()
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        logger.error(f"Error creating re-mark job: {str(e)}")
+        db.rollback()
+        return JSONResponse(status_code=500, content={"error": "Failed to create re-mark job"})
+
+    remarking.start_job(job.id)
+    return JSONResponse(status_code=202, content=remarking.job_status(job))
+
+
+@router.get("/admin/remark_jobs")
+def list_remark_jobs(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+
+    jobs = db.query(RemarkJob).order_by(RemarkJob.id.desc()).limit(50)
+    return JSONResponse(content={"jobs": [remarking.job_status(job) for job in jobs]})
+
+
+@router.get("/admin/remark_jobs/{job_id}")
+def remark_job_status(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+
+    job = db.get(RemarkJob, job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return JSONResponse(content=remarking.job_status(job))
+
+
+@router.post("/admin/remark_jobs/{job_id}/cancel")
+def cancel_remark_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Stop a job once its current chunk is written."""
+    if not current_user.is_admin:
+        return JSONResponse(status_code=403, content={"error": "Unauthorized - not admin"})
+
+    if not remarking.cancel_job(db, job_id):
+        return JSONResponse(status_code=409, content={"error": "Job is not running"})
+    return JSONResponse(content=remarking.job_status(db.get(RemarkJob, job_id)))
@@ -0,0 +1,250 @@
+"""Data analysis page and its chart APIs."""
+from fastapi import APIRouter, Request, Depends, Query
+from fastapi.responses import JSONResponse
+from starlette.responses import HTMLResponse
+from sqlalchemy.orm import Session
+from database import get_db
+from models import Student, Class, User, Writing
+from dependencies.auth import get_current_user
+from templating import templates
+from typing import Optional
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/data_analysis", response_class=HTMLResponse)
+async def data_analysis(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    user_classes = db.query(Class).filter_by(teacher_id=current_user.id).all()
+    now = datetime.now()
+
+    return templates.TemplateResponse(
+        "data_analysis.html", {"request": request, "classes": user_classes, "now": now}
+    )
+
+
+@router.get("/api/students")
+async def get_api_students(
+    class_id: str = Query("all"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if class_id == "all":
+        students = (
+            db.query(Student)
+            .join(Class)
+            .filter(Class.teacher_id == current_user.id)
+            .order_by(Student.first_name, Student.last_name)
+            .all()
+        )
+    else:
+        students = (
+            db.query(Student)
+            .join(Class)
+            .filter(Class.id == class_id, Class.teacher_id == current_user.id)
+            .order_by(Student.first_name, Student.last_name)
+            .all()
+        )
+
+    return JSONResponse(
+        {
+            "students": [
+                {
+                    "id": student.id,
+                    "name": f"{student.first_name} {student.last_name}",
+                    "class_id": student.class_id,
+                }
+                for student in students
+            ]
+        }
+    )
+
+
+@router.get("/api/student_data")
+async def get_api_student_data(
+    ids: Optional[str] = Query(default=""),
+    class_id: Optional[str] = Query(default="all"),
+    time_period: Optional[str] = Query(default="all"),
+    chart_type: Optional[str] = Query(default="writing_scores"),
+    include_average: Optional[bool] = Query(default=False),
+    average_type: Optional[str] = Query(default="all"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    student_id_list = [int(sid) for sid in ids.split(",") if sid.isdigit()]
+    time_filter = None
+
+    if time_period != "all":
+        now = datetime.now()
+        days_map = {"month": 30, "quarter": 90, "year": 365}
+        if time_period in days_map:
+            time_filter = now - timedelta(days=days_map[time_period])
+
+    datasets = []
+    all_dates = set()
+
+    for student_id in student_id_list:
+        student = (
+            db.query(Student)
+            .join(Class)
+            .filter(Student.id == student_id, Class.teacher_id == current_user.id)
+            .first()
+        )
+        if not student:
+            continue
+
+        query = db.query(Writing).filter(Writing.student_id == student_id)
+        if time_filter:
+            query = query.filter(Writing.created_at >= time_filter)
+        samples = query.order_by(Writing.created_at).all()
+
+        data_points = []
+        for sample in samples:
+            value = None
+            if chart_type == "writing_scores" and sample.criteria_marks:
+                total = len(sample.criteria_marks)
+                met = sum(1 for m in sample.criteria_marks if m.score == 2)
+                partial = sum(1 for m in sample.criteria_marks if m.score == 1)
+                value = (met / total) * 100 + (partial / total) * 50
+            elif chart_type == "writing_age" and sample.writing_age:
+                try:
+                    value = float(sample.writing_age.split()[0])
+                except:
+                    continue
+            elif chart_type == "age_difference" and sample.writing_age:
+                try:
+                    writing_age = float(sample.writing_age.split()[0])
+                    actual_age = (
+                        sample.created_at.date() - student.date_of_birth
+                    ).days / 365.25
+                    value = writing_age - actual_age
+                except:
+                    continue
+            else:
+                continue
+
+            date_str = f"{sample.created_at.strftime('%Y-%m-%d')} ({sample.id})"
+            date_display = sample.created_at.strftime("%d %b %Y")
+            all_dates.add(date_str)
+            data_points.append(
+                {
+                    "date": date_str,
+                    "date_display": date_display,
+                    "value": value,
+                    "writing_id": sample.id,
+                }
+            )
+
+        if data_points:
+            sorted_points = sorted(data_points, key=lambda x: x["date"])
+            datasets.append(
+                {
+                    "student_id": student.id,
+                    "name": f"{student.first_name} {student.last_name}",
+                    "data": [p["value"] for p in sorted_points],
+                    "dates": [p["date"] for p in sorted_points],
+                    "is_average": False,
+                }
+            )
+
+    # Average dataset for class
+    if include_average and class_id != "all" and class_id.isdigit():
+        class_obj = (
+            db.query(Class)
+            .filter_by(id=int(class_id), teacher_id=current_user.id)
+            .first()
+        )
+        if class_obj:
+            student_ids = [
+                s.id for s in db.query(Student).filter_by(class_id=class_obj.id).all()
+            ]
+            all_dates_list = sorted(all_dates)
+            avg_data = []
+
+            for date_str in all_dates_list:
+                if " (" in date_str:
+                    date_part = date_str.split(" (")[0]
+                    date_obj = datetime.strptime(date_part, "%Y-%m-%d").date()
+                    next_day = date_obj + timedelta(days=1)
+                    writings = (
+                        db.query(Writing)
+                        .filter(
+                            Writing.student_id.in_(student_ids),
+                            Writing.created_at >= date_obj,
+                            Writing.created_at < next_day,
+                        )
+                        .all()
+                    )
+
+                    values = []
+                    for w in writings:
+                        if chart_type == "writing_scores" and w.criteria_marks:
+                            total = len(w.criteria_marks)
+                            achieved = sum(m.score for m in w.criteria_marks)
+                            if total:
+                                values.append((achieved / (total * 2)) * 100)
+                        elif chart_type == "writing_age" and w.writing_age:
+                            try:
+                                values.append(float(w.writing_age.split()[0]))
+                            except:
+                                pass
+                        elif chart_type == "age_difference" and w.writing_age:
+                            try:
+                                writing_age = float(w.writing_age.split()[0])
+                                actual_age = (
+                                    w.created_at.date() - student.date_of_birth
+                                ).days / 365.25
+                                values.append(writing_age - actual_age)
+                            except:
+                                pass
+                    avg_data.append(sum(values) / len(values) if values else None)
+
+            if any(avg_data):
+                datasets.append(
+                    {
+                        "student_id": "average",
+                        "name": f"{class_obj.name} Class Average",
+                        "data": avg_data,
+                        "dates": all_dates_list,
+                        "is_average": True,
+                    }
+                )
+
+    # Format date display map
+    date_display_map = {}
+    for ds in datasets:
+        for date_key in ds.get("dates", []):
+            if " (" in date_key:
+                date_part = date_key.split(" (")[0]
+                try:
+                    date_obj = datetime.strptime(date_part, "%Y-%m-%d")
+                    display = date_obj.strftime("%d %b %Y")
+                    date_display_map[date_key] = display
+                except:
+                    date_display_map[date_key] = date_key
+
+    insights = {}
+    if datasets:
+        insights = {
+            "key_observations": [
+                "Select multiple students to compare their progress over time.",
+                "Use the chart filters to explore different metrics and time periods.",
+            ],
+            "recommendations": "Focus on students showing significant differences from the class average.",
+        }
+
+    return JSONResponse(
+        {
+            "labels": sorted(all_dates),
+            "date_displays": date_display_map,
+            "datasets": datasets,
+            "insights": insights,
+        }
+    )
@@ -0,0 +1,314 @@
+"""Assignments, success criteria and class feedback."""
+from fastapi import APIRouter, Request, Depends, Form, HTTPException
+from fastapi.responses import RedirectResponse, JSONResponse, Response
+from starlette.responses import HTMLResponse
+from starlette.status import HTTP_302_FOUND
+from sqlalchemy.orm import Session
+from database import get_db
+from models import Class, User, Assignment, Criteria
+from forms import AssignmentForm
+from dependencies.auth import get_current_user
+from templating import templates
+from deletion import delete_assignments
+import class_feedback
+from llm_usage import TokenBudgetExceeded
+from typing import List
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/class/{class_id}/assignments/new", response_class=HTMLResponse)
+async def get_assignment_form(
+    class_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: any = Depends(get_current_user),
+):
+    class_obj = db.query(Class).filter(Class.id == class_id).first()
+    if not class_obj:
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    if class_obj.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    return templates.TemplateResponse(
+        "create_assignment.html",
+        {
+            "request": request,
+            "class_obj": class_obj,
+            "form_data": {},
+            "form_errors": [],
+        },
+    )
+
+
+@router.get("/assignment/{assignment_id}/class-feedback")
+def get_class_feedback(
+    assignment_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    assignment = db.query(Assignment).get(assignment_id)
+    if not assignment or assignment.class_group.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    try:
+        fingerprint, _ = class_feedback.submission_fingerprint(db, assignment)
+        headers = {"ETag": f'"{fingerprint}"', "Cache-Control": "private, no-cache"}
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+
+        report = class_feedback.get_report(db, assignment, fingerprint)
+        return JSONResponse(content=report, headers=headers)
+
+    except TokenBudgetExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating class feedback: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={
+                "strengths": ["Error analyzing submissions"],
+                "areas_fordevelopment": ["Error analyzing submissions"],
+                "practice_activities": ["Error analyzing submissions"],
+            },
+        )
+
+
+@router.get("/assignments", response_class=HTMLResponse)
+async def assignments(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+):
+    return templates.TemplateResponse(
+        "assignments.html", {"request": request, "current_user": current_user}
+    )
+
+
+@router.post("/class/{class_id}/assignments/new")
+async def create_assignment(
+    class_id: int,
+    title: str = Form(...),
+    curriculum: str = Form(...),
+    genre: str = Form(...),
+    custom_genre: str = Form(None),
+    criteria_description: List[str] = Form(None),
+    request: Request = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    class_obj = db.query(Class).filter(Class.id == class_id).first()
+    if not class_obj:
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    if class_obj.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    logger.debug(f"Creating assignment for class {class_id}")
+
+    form = AssignmentForm(
+        title=title, curriculum=curriculum, genre=genre, custom_genre=custom_genre
+    )
+
+    if not criteria_description:
+        return templates.TemplateResponse(
+            "create_assignment.html",
+            {
+                "request": request,
+                "form": form,
+                "class_obj": class_obj,
+                "error": "Please add at least one success criterion.",
+            },
+        )
+
+    try:
+        genre = form.genre
+        if genre == "custom" and form.custom_genre:
+            genre = form.custom_genre
+
+        assignment = Assignment(
+            title=form.title, curriculum=form.curriculum, genre=genre, class_id=class_id
+        )
+        db.add(assignment)
+        db.commit()
+        db.refresh(assignment)
+
+        for desc in criteria_description:
+            if desc.strip():
+                criteria = Criteria(
+                    description=desc.strip(), assignment_id=assignment.id
+                )
+                db.add(criteria)
+        db.commit()
+        logger.debug("Assignment and criteria created")
+        return RedirectResponse(url="/assignments", status_code=303)
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error: {str(e)}")
+        return templates.TemplateResponse(
+            "create_assignment.html",
+            {
+                "request": request,
+                "form": form,
+                "class_obj": class_obj,
+                "error": "Error creating assignment. Please try again.",
+            },
+        )
+
+
+@router.api_route(
+    "/assignment/{assignment_id}/edit",
+    methods=["GET", "POST"],
+    response_class=HTMLResponse,
+)
+async def edit_assignment(
+    request: Request,
+    assignment_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    assignment = db.query(Assignment).filter_by(id=assignment_id).first()
+    if not assignment:
+        return RedirectResponse(url="/assignments", status_code=HTTP_302_FOUND)
+
+    if assignment.class_group.teacher_id != current_user.id:
+        request.session["flash"] = {
+            "message": "You do not have permission to edit this assignment.",
+            "category": "danger",
+        }
+        return RedirectResponse(url="/assignments", status_code=HTTP_302_FOUND)
+
+    form_errors = {}
+    form_data = {
+        "title": assignment.title,
+        "description": assignment.description,
+        "curriculum": assignment.curriculum,
+        "genre": assignment.genre,
+        "custom_genre": "" if assignment.genre != "custom" else assignment.genre,
+    }
+
+    if request.method == "POST":
+        post_data = await request.form()
+        criteria_descriptions = post_data.getlist("criteria-description[]")
+
+        # Update form_data with submitted values to keep user input on error
+        form_data["title"] = post_data.get("title")
+        form_data["description"] = post_data.get("description")
+        form_data["curriculum"] = post_data.get("curriculum")
+        form_data["genre"] = post_data.get("genre")
+        form_data["custom_genre"] = post_data.get("custom_genre")
+
+        # Validate criteria
+        if not criteria_descriptions or all(
+            not desc.strip() for desc in criteria_descriptions
+        ):
+            form_errors["criteria"] = ["Please add at least one success criterion."]
+
+        # Validate title and description
+        if not form_data["title"]:
+            form_errors["title"] = ["Title is required."]
+        if not form_data["description"] or len(form_data["description"].strip()) < 10:
+            form_errors["description"] = ["Description must be at least 10 characters."]
+
+        if form_errors:
+            # Render template directly with errors and user input — no flashing or redirecting
+            return templates.TemplateResponse(
+                "edit_assignment.html",
+                {
+                    "request": request,
+                    "form": form_data,
+                    "form_errors": form_errors,
+                    "assignment": assignment,
+                },
+            )
+
+        # If no errors, update DB
+        try:
+            assignment.title = form_data["title"]
+            assignment.description = form_data["description"]
+            assignment.curriculum = form_data["curriculum"]
+            genre = (
+                form_data["custom_genre"]
+                if form_data["genre"] == "custom" and form_data["custom_genre"]
+                else form_data["genre"]
+            )
+            assignment.genre = genre
+
+            existing_criteria = {c.description: c for c in assignment.criteria}
+            new_criteria = []
+            for desc in criteria_descriptions:
+                desc = desc.strip()
+                if desc:
+                    if desc in existing_criteria:
+                        new_criteria.append(existing_criteria[desc])
+                    else:
+                        new_criteria.append(
+                            Criteria(description=desc, assignment_id=assignment.id)
+                        )
+
+            for criterion in assignment.criteria:
+                if criterion not in new_criteria:
+                    db.delete(criterion)
+
+            assignment.criteria = new_criteria
+            db.commit()
+
+            # Set flash message and redirect after successful POST
+            request.session["flash"] = {
+                "message": "Assignment updated successfully!",
+                "category": "success",
+            }
+            return RedirectResponse(url="/assignments", status_code=HTTP_302_FOUND)
+
+        except Exception:
+            db.rollback()
+            form_errors["database"] = ["Error updating assignment. Please try again."]
+            # Render template with DB error message
+            return templates.TemplateResponse(
+                "edit_assignment.html",
+                {
+                    "request": request,
+                    "form": form_data,
+                    "form_errors": form_errors,
+                    "assignment": assignment,
+                },
+            )
+
+    # GET request — just render form with initial data
+    return templates.TemplateResponse(
+        "edit_assignment.html",
+        {
+            "request": request,
+            "form": form_data,
+            "form_errors": form_errors,
+            "assignment": assignment,
+        },
+    )
+
+
+@router.post("/assignment/{assignment_id}/delete", response_class=JSONResponse)
+async def delete_assignment(
+    request: Request,
+    assignment_id,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    assignment = db.query(Assignment).get(assignment_id)
+
+    # Check if current user is the teacher of this class
+    if assignment.class_group.teacher_id != current_user.id:
+        return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+    try:
+        delete_assignments(db, [assignment.id])
+        request.session["flash"] = ("Assignment deleted successfully!", "success")
+        return JSONResponse(status_code=200, content={"success": True})
+    except Exception as e:
+        logger.error(f"Error deleting assignment: {str(e)}")
+        db.rollback()
+        return JSONResponse({"error": "Failed todelete assignment"}), 500
@@ -0,0 +1,183 @@
+"""Login, signup and logout."""
+from fastapi import APIRouter, Request, Depends, Form
+from fastapi.responses import RedirectResponse
+from starlette.responses import Response, HTMLResponse
+from starlette.status import HTTP_302_FOUND
+from sqlalchemy.orm import Session
+from database import get_db
+from models import User
+from forms import SignupForm
+from dependencies.auth import login_user
+from dependencies.csrf import get_csrf_token, validate_csrf_token
+from mailchimp_utils import add_user_to_mailchimp
+from templating import templates
+from datetime import datetime
+import admin_metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/login")
+async def show_login_form(request: Request):
+    csrf_token = await get_csrf_token(request)
+    response = templates.TemplateResponse(
+        "login.html", {"request": request, "csrf_token": csrf_token}
+    )
+    # Explicitly set cookie headers
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response.headers["Pragma"] = "no-cache"
+    response.headers["Expires"] = "0"
+    return response
+
+
+@router.post("/login", response_class=HTMLResponse)
+async def login(
+    request: Request,
+    email: str = Form(...),
+    password: str = Form(...),
+    csrf_token: str = Form(...),
+    db: Session = Depends(get_db),
+):
+    # Validate CSRF token first
+    await validate_csrf_token(request, csrf_token)
+
+    email = email.lower()
+    user = db.query(User).filter_by(email=email).first()
+
+    try:
+        if not user:
+            logger.warning(f"Failed login attempt for user: {email}")
+            return RedirectResponse(
+                url="/login?error=Invalid+email+or+password", status_code=HTTP_302_FOUND
+            )
+
+        if not user.check_password(password):
+            logger.warning(f"Failed login attempt for user: {email}")
+            return RedirectResponse(
+                url="/login?error=Invalid+email+or+password", status_code=HTTP_302_FOUND
+            )
+
+        # Successful login
+        db.commit()
+
+        request.session["user_id"] = user.id
+        request.session["_fresh"] = True  # Mark session as fresh
+        logger.info(f"Successful login for user: {email}")
+
+        return RedirectResponse(url="/home", status_code=HTTP_302_FOUND)
+
+    except Exception as e:
+        logger.error(f"Error during login: {e}")
+        return RedirectResponse(
+            url="/login?error=An+error+occurred+during+login",
+            status_code=HTTP_302_FOUND,
+        )
+
+
+@router.post("/signup", response_class=HTMLResponse)
+async def signup(
+    request: Request,
+    first_name: str = Form(...),
+    last_name: str = Form(...),
+    email: str = Form(...),
+    password: str = Form(...),
+    confirm_password: str = Form(...),
+    db: Session = Depends(get_db),
+):
+    try:
+        form = SignupForm(
+            first_name=first_name,
+            last_name=last_name,
+            email=email,
+            password=password,
+            confirm_password=confirm_password,
+        )
+    except Exception as e:
+        return templates.TemplateResponse(
+            "signup.html",
+            {
+                "request": request,
+                "form": {
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "email": email,
+                },
+                "error": str(e),
+            },
+        )
+
+    if db.query(User).filter_by(email=form.email).first():
+        return templates.TemplateResponse(
+            "signup.html",
+            {
+                "request": request,
+                "form": {
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "email": email,
+                },
+                "error": "Email already registered",
+            },
+        )
+
+    user = User(
+        first_name=form.first_name,
+        last_name=form.last_name,
+        email=form.email,
+        created_at=datetime.now(),
+    )
+    user.set_password(form.password)
+   
+    try:
+        db.add(user)
+        db.commit()
+        admin_metrics.record_activity(user.id)
+        logger.info(f"Successfully created user account for {user.email}")
+
+        try:
+            success = add_user_to_mailchimp(
+                email=user.email, first_name=user.first_name, last_name=user.last_name
+            )
+            if success:
+                request.session["flash"] = "User Created Successfully.."
+                logger.info(f"Successfully added {user.email} to Mailchimp audience")
+            else:
+                logger.warning(f"Failed to add {user.email} to Mailchimp audience")
+        except Exception as e:
+            logger.error(f"Mailchimp error for {user.email}: {str(e)}")
+
+        login_user(request, user)
+        return RedirectResponse(url="/login", status_code=HTTP_302_FOUND)
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Database error during signup: {str(e)}")
+        return templates.TemplateResponse(
+            "signup.html",
+            {
+                "request": request,
+                "form": {
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "email": email,
+                },
+                "error": "An error occurred during signup. Please try again.",
+            },
+        )
+
+
+@router.get("/logout", name="logout")
+async def logout(request: Request, response: Response):
+    request.session.pop("user_id", None)
+    response.delete_cookie("session")
+    return RedirectResponse(url="/login", status_code=HTTP_302_FOUND)
+
+
+@router.get("/signup", response_class=HTMLResponse)
+async def show_signup(request: Request):
+    return templates.TemplateResponse(
+        "signup.html", {"request": request, "form": {}, "error": None}
+    )
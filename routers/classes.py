@@ -0,0 +1,485 @@
+"""Classes and their student rosters."""
+from fastapi import APIRouter, Request, Depends, Form, HTTPException, UploadFile
+from fastapi.responses import RedirectResponse, JSONResponse
+from starlette.responses import HTMLResponse, StreamingResponse
+from starlette.status import HTTP_302_FOUND, HTTP_200_OK, HTTP_303_SEE_OTHER
+from sqlalchemy.orm import Session
+from database import get_db
+from models import Student, Class, User, Writing, Assignment
+from forms import StudentForm, ClassForm
+from dependencies.auth import get_current_user
+from templating import templates
+from deletion import delete_classes, delete_students
+from roster_import import RosterImportError, import_students
+import admin_metrics
+from datetime import datetime, date
+from io import StringIO
+import csv
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+# Add Student
+@router.post("/add_student")
+async def add_student(
+    request: Request,
+    student_id: str = Form(...),
+    first_name: str = Form(...),
+    last_name: str = Form(...),
+    date_of_birth: date = Form(None),
+    class_id: str = Form(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if not class_id:
+        request.session["flash"] = {"message": "Class ID is required", "type": "error"}
+        return RedirectResponse(url="/classes", status_code=HTTP_302_FOUND)
+
+    class_obj = db.get(Class, class_id)
+    if not class_obj or class_obj.teacher_id != request.session["user_id"]:
+        request.session["flash"] = {
+            "message": "Invalid Class Selected",
+            "category": "error",
+        }
+        return RedirectResponse(url="/classes", status_code=HTTP_302_FOUND)
+
+    try:
+        student = Student(
+            student_id=student_id,
+            first_name=first_name,
+            last_name=last_name,
+            date_of_birth=date_of_birth,
+            class_id=class_id,
+        )
+        db.add(student)
+        db.commit()
+        admin_metrics.record_activity(current_user.id)
+        request.session["flash"] = {
+            "message": "Student added successfully",
+            "category": "success",
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error adding student: {e}")
+        request.session["flash"] = {
+            "message": "Error adding student",
+            "category": "error",
+        }
+
+    return RedirectResponse(
+        url=f"/classes?class_id={class_id}", status_code=HTTP_302_FOUND
+    )
+
+
+@router.get("/get_students/{class_id}", response_class=JSONResponse)
+async def get_students(
+    request: Request,
+    class_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Retrieve class or return 404
+    class_obj = db.query(Class).filter_by(id=class_id).first()
+    if not class_obj:
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    # Check teacher ownership
+    if class_obj.teacher_id != request.session["user_id"]:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    # Query students for the class
+    students = db.query(Student).filter_by(class_id=class_id).all()
+
+    # Calculate age (approximate)
+    today = date.today()
+    student_data = [
+        {
+            "id": student.id,
+            "name": f"{student.first_name} {student.last_name}",
+            "age": (today - student.date_of_birth).days // 365,
+        }
+        for student in students
+    ]
+
+    return student_data
+
+
+@router.post("/student/{student_id}/delete")
+def delete_student(
+    request: Request,
+    student_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    from models import Student
+
+    student = db.query(Student).get(student_id)
+
+    # Check if current user is the teacher of this student's class
+    if student.class_group.teacher_id != current_user.id:
+        return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+    try:
+        delete_students(db, [student_id])
+        admin_metrics.record_activity(current_user.id)
+        request.session["flash"] = ("Student deleted successfully!", "success")
+        return JSONResponse(status_code=200, content={"success": True})
+    except Exception as e:
+        logger.error(f"Error deleting student: {str(e)}")
+        db.rollback()
+        return JSONResponse(
+            status_code=500, content={"error": "Failed to delete student"}
+        )
+
+
+@router.get("/classes", response_class=HTMLResponse)
+async def classes(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    class_form = ClassForm(name="New", year_group="2025")
+    student_form = StudentForm(
+        student_id=None, first_name="John", last_name="Doe", date_of_birth=date.today()
+    )
+
+    user_classes = db.query(Class).filter_by(teacher_id=current_user.id).all()
+
+    for class_ in user_classes:
+        class_.students = sorted(
+            class_.students, key=lambda s: f"{s.first_name} {s.last_name}"
+        )
+        for student in class_.students:
+            student.writing_samples = (
+                db.query(Writing).filter_by(student_id=student.id).all()
+            )
+
+    return templates.TemplateResponse(
+        "classes.html",
+        {
+            "request": request,
+            "class_form": class_form,
+            "student_form": student_form,
+            "classes": user_classes,
+        },
+    )
+
+
+@router.get("/view_classes/export/{class_id}", response_class=StreamingResponse)
+def export_class_overview(
+    class_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    class_obj = db.query(Class).get(class_id)
+
+    if not class_obj:
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    if class_obj.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    output = StringIO()
+    writer = csv.writer(output)
+
+    writer.writerow(
+        [
+            "Student Name",
+            "Latest Writing Age",
+            "Total Submissions",
+            "Assignment Submissions",
+            "Free Writing Submissions",
+            "Average Score",
+            "Latest Submission Date",
+        ]
+    )
+
+    for student in class_obj.students:
+        samples = (
+            db.query(Writing)
+            .filter_by(student_id=student.id)
+            .order_by(Writing.created_at.desc())
+            .all()
+        )
+
+        if samples:
+            latest_writing_age = samples[0].writing_age
+            latest_submission = samples[0].created_at.strftime("%Y-%m-%d")
+            total_submissions = len(samples)
+            assignment_submissions = len([s for s in samples if s.assignment_id])
+            free_writing = total_submissions - assignment_submissions
+
+            scores = []
+            for sample in samples:
+                if sample.assignment_id and sample.criteria_marks:
+                    total_possible = len(sample.criteria_marks) * 2
+                    achieved = sum(mark.score for mark in sample.criteria_marks)
+                    if total_possible > 0:
+                        scores.append((achieved / total_possible) * 100)
+
+            avg_score = f"{round(sum(scores) / len(scores), 1)}%" if scores else "N/A"
+        else:
+            latest_writing_age = "No submissions"
+            latest_submission = "N/A"
+            total_submissions = 0
+            assignment_submissions = 0
+            free_writing = 0
+            avg_score = "N/A"
+
+        writer.writerow(
+            [
+                f"{student.first_name} {student.last_name}",
+                latest_writing_age,
+                total_submissions,
+                assignment_submissions,
+                free_writing,
+                avg_score,
+                latest_submission,
+            ]
+        )
+
+    output.seek(0)
+    return StreamingResponse(
+        iter([output.getvalue()]),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": f"attachment; filename=class_{class_id}_overview_{datetime.now().strftime('%Y%m%d')}.csv"
+        },
+    )
+
+
+@router.post("/class/{class_id}/delete", status_code=200)
+async def delete_class(
+    class_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)
+):
+    class_obj = db.query(Class).filter_by(id=class_id).first()
+
+    if not class_obj:
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    if class_obj.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+
+    try:
+        delete_classes(db, [class_id])
+        admin_metrics.record_activity(current_user.id)
+        return JSONResponse(content={"success": True}, status_code=HTTP_200_OK)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error deleting class {class_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to delete class")
+
+
+@router.post("/upload_students")
+async def upload_students(
+    request: Request,
+    file: UploadFile,
+    class_id: int = Form(...),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Import students from a roster CSV. Rows with a Student ID already in the
+    class update that student. JSON clients get the per-row error report;
+    form posts get a flash message and a redirect.
+    """
+    wants_json = request.headers.get("accept", "").startswith("application/json")
+
+    def respond(message, category, report=None, status_code=HTTP_200_OK):
+        if wants_json:
+            content = dict(report or {})
+            content["message"] = message
+            if category == "error":
+                content["error"] = message
+            return JSONResponse(status_code=status_code, content=content)
+        request.session["flash"] = (message, category)
+        return RedirectResponse(url="/classes", status_code=HTTP_303_SEE_OTHER)
+
+    if not file.filename.endswith(".csv"):
+        return respond("Please upload a CSV file", "error", status_code=400)
+
+    class_obj = db.query(Class).get(class_id)
+    if not class_obj or class_obj.teacher_id != current_user.id:
+        return respond("Class not found", "error", status_code=404)
+
+    try:
+        report = import_students(db, class_id, file.file)
+        admin_metrics.record_activity(current_user.id)
+    except RosterImportError as e:
+        return respond(
+            f"{e}. Format: Student ID, First Name, Last Name, Date of Birth (YYYY-MM-DD)",
+            "error",
+            status_code=400,
+        )
+    except Exception as e:
+        logger.error(f"Roster import error: {str(e)}")
+        return respond("Error saving students.", "error", status_code=500)
+
+    if not report["inserted"] and not report["updated"]:
+        message = "No students added. Check CSV format."
+        category = "warning"
+    else:
+        parts = []
+        if report["inserted"]:
+            parts.append(f"Added {report['inserted']} students.")
+        if report["updated"]:
+            parts.append(f"Updated {report['updated']} existing students.")
+        message = " ".join(parts)
+        category = "info"
+    if report["errors"]:
+        shown = "; ".join(
+            f"Row {e['row']}: {e['error']}" for e in report["errors"][:3]
+        )
+        more = report["error_count"] - 3
+        message += f" {report['error_count']} rows skipped ({shown}"
+        message += f" and {more} more)." if more > 0 else ")."
+    return respond(message, category, report)
+
+
+@router.get("/class/{class_id}/export_data")
+async def export_class_data(
+    class_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    class_obj = db.query(Class).get(class_id)
+
+    if not class_obj:
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    if class_obj.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    try:
+        output = StringIO()
+        writer = csv.writer(output)
+
+        writer.writerow(
+            [
+                "Student Name",
+                "Assignment Title",
+                "Submission Date",
+                "Writing Age",
+                "Total Score",
+                "Max Possible Score",
+                "Achievement Percentage",
+                "Strengths",
+                "Areas for Development",
+            ]
+        )
+
+        assignments = db.query(Assignment).filter_by(class_id=class_id).all()
+
+        for student in class_obj.students:
+            for assignment in assignments:
+                submission = (
+                    db.query(Writing)
+                    .filter_by(student_id=student.id, assignment_id=assignment.id)
+                    .first()
+                )
+
+                if submission:
+                    total_possible_marks = len(submission.criteria_marks) * 2
+                    achieved_marks = sum(
+                        mark.score for mark in submission.criteria_marks
+                    )
+                    percentage = (
+                        round((achieved_marks / total_possible_marks * 100), 1)
+                        if total_possible_marks > 0
+                        else 0
+                    )
+
+                    feedback_parts = (
+                        submission.feedback.split("\n\n")
+                        if submission.feedback
+                        else ["", ""]
+                    )
+                    strengths = (
+                        feedback_parts[0].replace("Strengths:", "").strip()
+                        if len(feedback_parts) > 0
+                        else ""
+                    )
+                    development = (
+                        feedback_parts[1].replace("Areas for Development:", "").strip()
+                        if len(feedback_parts) > 1
+                        else ""
+                    )
+
+                    writer.writerow(
+                        [
+                            f"{student.first_name} {student.last_name}",
+                            assignment.title,
+                            submission.created_at.strftime("%Y-%m-%d"),
+                            submission.writing_age,
+                            achieved_marks,
+                            total_possible_marks,
+                            f"{percentage}%",
+                            strengths,
+                            development,
+                        ]
+                    )
+
+        output.seek(0)
+        return StreamingResponse(
+            iter([output.getvalue()]),
+            media_type="text/csv",
+            headers={
+                "Content-Disposition": f'attachment; filename=class_{class_id}_performance_{datetime.now().strftime("%Y%m%d")}.csv'
+            },
+        )
+
+    except Exception as e:
+        logger.error(f"Error exporting class data: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to export class data")
+
+
+@router.get("/get_assignments/{class_id}", response_class=JSONResponse)
+async def get_assignments(
+    class_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    class_obj = db.query(Class).filter_by(id=class_id).first()
+    if not class_obj:
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    if class_obj.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    assignments = (
+        db.query(Assignment)
+        .filter_by(class_id=class_id)
+        .order_by(Assignment.created_at.desc())
+        .all()
+    )
+
+    return [
+        {
+            "id": a.id,
+            "title": a.title,
+            "curriculum": a.curriculum,
+            "genre": a.genre,
+            "created_at": a.created_at,
+        }
+        for a in assignments
+    ]
+
+
+@router.post("/add_class", response_class=HTMLResponse)
+def add_class(
+    name: str = Form(...),
+    year_group: str = Form(...),
+    request: Request = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    new_class = Class(name=name, year_group=year_group, teacher_id=current_user.id)
+    db.add(new_class)
+    db.commit()
+    admin_metrics.record_activity(current_user.id)
+
+    request.session["flash"] = ("Class added successfully!", "success")
+    return RedirectResponse(url="/classes", status_code=HTTP_303_SEE_OTHER)
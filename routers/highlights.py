@@ -0,0 +1,310 @@
+"""
+Teacher highlights on a writing sample, stored as spans of its text, plus
+the quote anchors computed for its AI feedback at /process time.
+"""
+from fastapi import APIRouter, Request, Depends, Header
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import get_db
+from models import Student, Class, User, Writing, Highlight, QuoteAnchor
+from dependencies.auth import get_current_user
+from typing import Optional, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+# The colour goes into a style attribute: a hex colour or rgb()/rgba(),
+# as the colour buttons produce, and nothing else
+COLOR_PATTERN = (
+    r"^(#[0-9a-fA-F]{3,8}"
+    r"|rgba?\(\s*\d{1,3}(\s*,\s*\d{1,3}){2}(\s*,\s*(0|1|0?\.\d+))?\s*\))$"
+)
+
+
+class HighlightIn(BaseModel):
+    id: Optional[int] = None
+    text: str
+    start: Optional[int] = None
+    end: Optional[int] = None
+    color: Optional[str] = Field(None, max_length=32, pattern=COLOR_PATTERN)
+    tooltip: Optional[str] = None
+
+
+class HighlightReplace(BaseModel):
+    highlights: List[HighlightIn]
+
+
+class HighlightPatch(BaseModel):
+    base_revision: Optional[int] = None
+    upsert: List[HighlightIn] = []
+    delete: List[int] = []
+
+
+def highlights_etag(writing_id: int, revision: Optional[int]) -> str:
+    return f'W/"highlights-{writing_id}-{revision or 0}"'
+
+
+def locate_span(content: str, item: HighlightIn) -> Optional[tuple[int, int]]:
+    """
+    Resolve a highlight to (start, end) offsets in `content`. Offsets sent by
+    the client are kept when they still point at the highlighted text;
+    otherwise the text is searched for, starting from the client's hint.
+    """
+    if item.start is not None and item.end is not None:
+        if content[item.start:item.end] == item.text:
+            return item.start, item.end
+
+    hint = max(0, item.start or 0)
+    for haystack, needle in ((content, item.text), (content.lower(), item.text.lower())):
+        position = haystack.find(needle, hint)
+        if position < 0:
+            position = haystack.find(needle)
+        if position >= 0:
+            return position, position + len(needle)
+    return None
+
+
+def serialize_highlight(highlight) -> dict:
+    return {
+        "id": highlight.id,
+        "start": highlight.start,
+        "end": highlight.end,
+        "text": highlight.text,
+        "color": highlight.color,
+        "tooltip": highlight.tooltip,
+    }
+
+
+def serialize_anchor(anchor) -> dict:
+    return {
+        "source": anchor.source,
+        "label": anchor.label,
+        "criteria_id": anchor.criteria_id,
+        "quote": anchor.quote,
+        "start": anchor.start,
+        "end": anchor.end,
+        "score": anchor.score,
+    }
+
+
+def _owned_writing(db: Session, writing_id: int, current_user: User):
+    """(id, revision) for a writing the teacher owns, or None."""
+    return (
+        db.query(Writing.id, Writing.highlights_revision)
+        .join(Student, Writing.student_id == Student.id)
+        .join(Class, Student.class_id == Class.id)
+        .filter(Writing.id == writing_id, Class.teacher_id == current_user.id)
+        .first()
+    )
+
+
+def _highlights_response(db: Session, writing_id: int, revision: Optional[int], **extra):
+    highlights = (
+        db.query(Highlight)
+        .filter(Highlight.writing_id == writing_id)
+        .order_by(Highlight.start, Highlight.id)
+        .all()
+    )
+    anchors = (
+        db.query(QuoteAnchor)
+        .filter(QuoteAnchor.writing_id == writing_id)
+        .order_by(QuoteAnchor.start, QuoteAnchor.id)
+        .all()
+    )
+    text_length = (
+        db.query(func.length(Writing.text_content)).filter(Writing.id == writing_id).scalar()
+    )
+    return JSONResponse(
+        content={
+            "highlights": [serialize_highlight(h) for h in highlights],
+            "anchors": [serialize_anchor(a) for a in anchors],
+            "text_length": text_length or 0,
+            "revision": revision or 0,
+            **extra,
+        },
+        headers={
+            "ETag": highlights_etag(writing_id, revision),
+            "Cache-Control": "private, no-cache",
+        },
+    )
+
+
+def _bump_revision(db: Session, writing_id: int, base_revision: Optional[int]) -> Optional[int]:
+    """
+    Compare-and-swap the highlights revision. Returns the new revision, or
+    None if another save landed since `base_revision` was read.
+    """
+    current = func.coalesce(Writing.highlights_revision, 0)
+    query = db.query(Writing).filter(Writing.id == writing_id)
+    if base_revision is not None:
+        query = query.filter(current == base_revision)
+    updated = query.update(
+        {Writing.highlights_revision: current + 1}, synchronize_session=False
+    )
+    if not updated:
+        return None
+    return db.query(Writing.highlights_revision).filter(Writing.id == writing_id).scalar()
+
+
+def _parse_if_match(if_match: Optional[str], writing_id: int) -> Optional[int]:
+    if not if_match:
+        return None
+    prefix = f'W/"highlights-{writing_id}-'
+    tag = if_match.strip()
+    if tag.startswith(prefix) and tag.endswith('"'):
+        try:
+            return int(tag[len(prefix):-1])
+        except ValueError:
+            pass
+    return -1  # never matches, forces a 412
+
+
+@router.get("/api/writings/{writing_id}/highlights")
+async def get_highlights(
+    writing_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Saved highlights for a writing sample, revalidated by ETag."""
+    writing = _owned_writing(db, writing_id, current_user)
+    if not writing:
+        return JSONResponse(status_code=404, content={"error": "Writing not found"})
+
+    etag = highlights_etag(writing.id, writing.highlights_revision)
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+        )
+
+    return _highlights_response(db, writing.id, writing.highlights_revision)
+
+
+@router.post("/api/writings/{writing_id}/highlights")
+async def replace_highlights(
+    writing_id: int,
+    payload: HighlightReplace,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Replace every highlight on a writing sample."""
+    writing = _owned_writing(db, writing_id, current_user)
+    if not writing:
+        return JSONResponse(status_code=404, content={"error": "Writing not found"})
+
+    try:
+        content = db.query(Writing.text_content).filter(Writing.id == writing_id).scalar() or ""
+        unplaced = []
+        db.query(Highlight).filter(Highlight.writing_id == writing_id).delete(
+            synchronize_session=False
+        )
+        for item in payload.highlights:
+            span = locate_span(content, item)
+            if span is None:
+                unplaced.append(item.text)
+                continue
+            db.add(
+                Highlight(
+                    writing_id=writing_id,
+                    start=span[0],
+                    end=span[1],
+                    text=content[span[0]:span[1]],
+                    color=item.color,
+                    tooltip=item.tooltip,
+                )
+            )
+        revision = _bump_revision(db, writing_id, None)
+        db.commit()
+        return _highlights_response(db, writing_id, revision, unplaced=unplaced)
+    except Exception as e:
+        logger.error(f"Error saving highlights: {str(e)}")
+        db.rollback()
+        return JSONResponse(status_code=500, content={"error": "Failed to save highlights"})
+
+
+@router.patch("/api/writings/{writing_id}/highlights")
+async def patch_highlights(
+    writing_id: int,
+    payload: HighlightPatch,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Apply only the changed spans: `upsert` adds new highlights (no id) or
+    updates existing ones, `delete` removes by id. `base_revision` (or an
+    If-Match ETag) guards against overwriting a concurrent save. The reply
+    lists the id given to each `upsert` entry, in order, as `upserted`
+    (null where the text could not be placed).
+    """
+    writing = _owned_writing(db, writing_id, current_user)
+    if not writing:
+        return JSONResponse(status_code=404, content={"error": "Writing not found"})
+
+    base_revision = payload.base_revision
+    if base_revision is None:
+        base_revision = _parse_if_match(if_match, writing_id)
+
+    try:
+        revision = _bump_revision(db, writing_id, base_revision)
+        if revision is None:
+            db.rollback()
+            return JSONResponse(
+                status_code=412 if if_match else 409,
+                content={
+                    "error": "Highlights were changed elsewhere, reload and retry",
+                    "revision": writing.highlights_revision or 0,
+                },
+            )
+
+        if payload.delete:
+            db.query(Highlight).filter(
+                Highlight.writing_id == writing_id, Highlight.id.in_(payload.delete)
+            ).delete(synchronize_session=False)
+
+        content = ""
+        if payload.upsert:
+            content = db.query(Writing.text_content).filter(Writing.id == writing_id).scalar() or ""
+        existing_ids = [item.id for item in payload.upsert if item.id is not None]
+        existing = {
+            h.id: h
+            for h in db.query(Highlight).filter(
+                Highlight.writing_id == writing_id, Highlight.id.in_(existing_ids)
+            )
+        } if existing_ids else {}
+
+        unplaced = []
+        upserted = []
+        for item in payload.upsert:
+            span = locate_span(content, item)
+            if span is None:
+                unplaced.append(item.text)
+                upserted.append(None)
+                continue
+            highlight = existing.get(item.id)
+            if highlight is None:
+                highlight = Highlight(writing_id=writing_id)
+                db.add(highlight)
+            highlight.start, highlight.end = span
+            highlight.text = content[span[0]:span[1]]
+            highlight.color = item.color
+            highlight.tooltip = item.tooltip
+            upserted.append(highlight)
+
+        db.flush()
+        upserted = [highlight.id if highlight else None for highlight in upserted]
+        db.commit()
+        return _highlights_response(
+            db, writing_id, revision, unplaced=unplaced, upserted=upserted
+        )
+    except Exception as e:
+        logger.error(f"Error updating highlights: {str(e)}")
+        db.rollback()
+        return JSONResponse(status_code=500, content={"error": "Failed to update highlights"})
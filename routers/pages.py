@@ -0,0 +1,108 @@
+"""Public pages, static assets and the logged-in home page."""
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import FileResponse, RedirectResponse
+from starlette.responses import HTMLResponse
+from models import User
+from dependencies.auth import get_current_user
+from templating import templates
+from page_cache import public_pages
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+# Static files with no-cache headers
+@router.get("/static/{filename:path}", name="static")
+async def static_files(filename: str):
+    static_file_path = os.path.join("static", filename)
+    if not os.path.exists(static_file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    headers = {
+        "Cache-Control": "no-cache, no-store, must-revalidate",
+        "Pragma": "no-cache",
+        "Expires": "0",
+    }
+    return FileResponse(static_file_path, headers=headers)
+
+
+@router.get("/")
+async def root(request: Request):
+    # Every host lands on the same public page, so the redirect is cacheable
+    response = RedirectResponse(url="/landing")
+    response.headers["Cache-Control"] = f"public, max-age={public_pages.max_age}"
+    return response
+
+
+@router.get("/static/attached_assets/{filename:path}", response_class=FileResponse)
+def serve_attached_assets(filename: str):
+    file_path = os.path.join("static/attached_assets", filename)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(file_path)
+
+
+@router.get("/landing", response_class=HTMLResponse, name="landing")
+async def landing(request: Request):
+    return public_pages.response(request, "landing_page.html")
+
+
+@router.route("/analyzer")
+def analyzer(request: Request, current_user: User = Depends(get_current_user)):
+    if current_user is None:
+        return RedirectResponse(url="/login")
+    elif current_user in request.session:
+        return RedirectResponse(url=("add_writing"))
+
+
+@router.get("/terms", response_class=HTMLResponse)
+def terms(request: Request):
+    return public_pages.response(request, "terms.html")
+
+
+@router.get("/privacy", response_class=HTMLResponse)
+def privacy(request: Request):
+    return public_pages.response(request, "privacy.html")
+
+
+@router.get("/data-protection", response_class=HTMLResponse)
+def data_protection(request: Request):
+    return public_pages.response(request, "data_protection.html")
+
+
+@router.get("/data-processing", response_class=HTMLResponse)
+def data_processing(request: Request):
+    return public_pages.response(request, "data_processing.html")
+
+
+@router.get("/home", response_class=HTMLResponse, name="home")
+def home(request: Request, current_user=Depends(get_current_user)):
+    return templates.TemplateResponse(
+        "home.html", {"request": request, "current_user": current_user, "form_data": {}}
+    )
+
+
+@router.get("/mobile-camera")
+def mobile_camera(request: Request):
+    """Completely isolated mobile camera implementation."""
+    student_id = request.args.get("student_id", "")
+    assignment_id = request.args.get("assignment_id", "")
+    # This template is self-contained with no shared JavaScript or templates
+    return templates.TemplateResponse(
+        "mobile_camera.html", student_id=student_id, assignment_id=assignment_id
+    )
+
+
+router.get("/single-camera")
+
+
+def single_camera(request: Request):
+    """Absolutely standalone camera with no dependencies or inherited templates."""
+    student_id = request.args.get("student_id", "")
+    assignment_id = request.args.get("assignment_id", "")
+    return templates.TemplateResponse(
+        "single_camera.html", student_id=student_id, assignment_id=assignment_id
+    )
@@ -0,0 +1,383 @@
+"""Student portfolio page, its chart and sample endpoints, and export."""
+from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi.responses import RedirectResponse, JSONResponse
+from starlette.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, selectinload
+from database import get_db
+from models import Student, Class, User, Writing, Assignment, CriteriaMark
+from dependencies.auth import get_current_user
+from templating import templates
+from datetime import datetime
+from io import StringIO
+from types import SimpleNamespace
+from typing import Optional
+import csv
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+SAMPLES_PAGE_SIZE = 10
+MAX_SAMPLES_PAGE_SIZE = 50
+
+PROGRESS_RATINGS = [
+    (3, "Excellent"),
+    (2, "Very Good"),
+    (1, "Good"),
+    (0, "Satisfactory"),
+]
+
+
+def _owned_student(db: Session, student_id: int, current_user: User):
+    """The student if they are in one of the teacher's classes, else None."""
+    return (
+        db.query(Student)
+        .join(Class, Student.class_id == Class.id)
+        .filter(Student.id == student_id, Class.teacher_id == current_user.id)
+        .first()
+    )
+
+
+def _age_in_years(date_of_birth) -> float:
+    return (datetime.now().date() - date_of_birth).days / 365.25
+
+
+def _writing_age_value(writing_age: Optional[str]) -> Optional[float]:
+    """Leading number of a writing age such as "9 years 3 months"."""
+    try:
+        return float(writing_age.split()[0])
+    except (ValueError, AttributeError, IndexError):
+        return None
+
+
+def class_neighbours(db: Session, student: Student):
+    """
+    (previous, next) students in the class by first name, wrapping round at
+    the ends, from one window query over the class. Each is a row with id
+    and first_name.
+    """
+    ordering = (Student.first_name, Student.id)
+    ordered = (
+        db.query(
+            Student.id.label("id"),
+            func.lag(Student.id).over(order_by=ordering).label("prev_id"),
+            func.lead(Student.id).over(order_by=ordering).label("next_id"),
+            func.last_value(Student.id)
+            .over(order_by=ordering, rows=(None, None))
+            .label("last_id"),
+            func.first_value(Student.id)
+            .over(order_by=ordering, rows=(None, None))
+            .label("first_id"),
+        )
+        .filter(Student.class_id == student.class_id)
+        .subquery()
+    )
+    position = (
+        db.query(
+            func.coalesce(ordered.c.prev_id, ordered.c.last_id),
+            func.coalesce(ordered.c.next_id, ordered.c.first_id),
+        )
+        .filter(ordered.c.id == student.id)
+        .first()
+    )
+    if not position:
+        return None, None
+
+    names = dict(
+        db.query(Student.id, Student.first_name).filter(Student.id.in_(position))
+    )
+    prev_id, next_id = position
+    return (
+        SimpleNamespace(id=prev_id, first_name=names.get(prev_id)),
+        SimpleNamespace(id=next_id, first_name=names.get(next_id)),
+    )
+
+
+def portfolio_stats(db: Session, student: Student) -> dict:
+    """Headline numbers for the portfolio, aggregated in SQL."""
+    sample_count = (
+        db.query(func.count(Writing.id)).filter(Writing.student_id == student.id).scalar()
+    )
+    assignment_count = (
+        db.query(func.count(Assignment.id))
+        .filter(Assignment.class_id == student.class_id)
+        .scalar()
+    )
+    score_total, mark_count = (
+        db.query(func.sum(CriteriaMark.score), func.count(CriteriaMark.id))
+        .join(Writing, CriteriaMark.writing_id == Writing.id)
+        .filter(Writing.student_id == student.id)
+        .one()
+    )
+    average_criteria_met = (
+        (score_total or 0) / (mark_count * 2) * 100 if mark_count else None
+    )
+
+    # Rating from the three most recent samples with a usable writing age
+    student_age = _age_in_years(student.date_of_birth)
+    recent = []
+    for (writing_age,) in (
+        db.query(Writing.writing_age)
+        .filter(Writing.student_id == student.id, Writing.writing_age.isnot(None))
+        .order_by(Writing.created_at.desc())
+        .yield_per(20)
+    ):
+        value = _writing_age_value(writing_age)
+        if value is not None:
+            recent.append(round(value - student_age, 1))
+            if len(recent) == 3:
+                break
+
+    progress_rating = None
+    if recent:
+        avg_diff = sum(recent) / len(recent)
+        progress_rating = next(
+            (label for floor, label in PROGRESS_RATINGS if avg_diff >= floor),
+            "Needs Support",
+        )
+
+    return {
+        "sample_count": sample_count,
+        "assignment_count": assignment_count,
+        "average_criteria_met": average_criteria_met,
+        "progress_rating": progress_rating,
+    }
+
+
+@router.get("/student/{student_id}/portfolio", name="student_portfolio")
+async def student_portfolio(
+    student_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    The portfolio shell: student details, headline stats and navigation.
+    Charts and writing samples are fetched by the page from the JSON
+    endpoints below.
+    """
+    student = db.query(Student).filter(Student.id == student_id).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    # Permission check
+    if student.class_group.teacher_id != current_user.id:
+        request.session["flash"] = {
+            "message": "You do not have permission to view this portfolio.",
+            "category": "danger",
+        }
+        return RedirectResponse(url="/", status_code=303)
+
+    prev_student, next_student = class_neighbours(db, student)
+
+    return templates.TemplateResponse(
+        "student_portfolio_new_temp.html",
+        context={
+            "request": request,
+            "student": student,
+            "stats": portfolio_stats(db, student),
+            "prev_student": prev_student,
+            "next_student": next_student,
+            "samples_page_size": SAMPLES_PAGE_SIZE,
+        },
+    )
+
+
+@router.get("/student/{student_id}/portfolio/charts")
+async def portfolio_charts(
+    student_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Chart series for the portfolio: score and writing age per sample, oldest first."""
+    student = _owned_student(db, student_id, current_user)
+    if not student:
+        return JSONResponse(status_code=404, content={"error": "Student not found"})
+
+    rows = (
+        db.query(
+            Writing.created_at,
+            Writing.writing_age,
+            func.sum(CriteriaMark.score),
+            func.count(CriteriaMark.id),
+        )
+        .outerjoin(CriteriaMark, CriteriaMark.writing_id == Writing.id)
+        .filter(Writing.student_id == student_id)
+        .group_by(Writing.id, Writing.created_at, Writing.writing_age)
+        .order_by(Writing.created_at, Writing.id)
+        .all()
+    )
+
+    student_age = _age_in_years(student.date_of_birth)
+    scores = {"labels": [], "data": []}
+    ages = {"labels": [], "writing_age": [], "actual_age": []}
+    for created_at, writing_age, score_total, mark_count in rows:
+        label = created_at.strftime("%d %b %Y")
+        scores["labels"].append(label)
+        scores["data"].append(
+            (score_total or 0) / (mark_count * 2) * 100 if mark_count else 0
+        )
+        value = _writing_age_value(writing_age)
+        if value is not None:
+            ages["labels"].append(label)
+            ages["writing_age"].append(value)
+            ages["actual_age"].append(round(student_age, 2))
+
+    return JSONResponse(
+        content={"scores": scores, "ages": ages},
+        headers={"Cache-Control": "private, no-cache"},
+    )
+
+
+@router.get("/student/{student_id}/portfolio/samples")
+async def portfolio_samples(
+    student_id: int,
+    request: Request,
+    offset: int = 0,
+    limit: int = SAMPLES_PAGE_SIZE,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    One page of writing samples, newest first. Returns the rendered table
+    rows in `html` so the page reuses the same markup and score macros.
+    """
+    student = _owned_student(db, student_id, current_user)
+    if not student:
+        return JSONResponse(status_code=404, content={"error": "Student not found"})
+
+    offset = max(0, offset)
+    limit = max(1, min(limit, MAX_SAMPLES_PAGE_SIZE))
+    samples = (
+        db.query(Writing)
+        .options(
+            selectinload(Writing.criteria_marks).joinedload(CriteriaMark.criteria),
+            selectinload(Writing.pages),
+            joinedload(Writing.assignment),
+        )
+        .filter(Writing.student_id == student_id)
+        .order_by(Writing.created_at.desc(), Writing.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(samples) > limit
+    samples = samples[:limit]
+
+    student_age = _age_in_years(student.date_of_birth)
+    age_differences = {}
+    for sample in samples:
+        value = _writing_age_value(sample.writing_age)
+        if value is not None:
+            age_differences[sample.id] = round(value - student_age, 1)
+
+    html = templates.get_template("portfolio_samples.html").render(
+        request=request,
+        samples=samples,
+        offset=offset,
+        age_differences=age_differences,
+    )
+    return JSONResponse(
+        content={
+            "html": html,
+            "count": len(samples),
+            "next_offset": offset + len(samples) if has_more else None,
+        }
+    )
+
+
+@router.get("/student/{student_id}/export_portfolio", name="export_student_portfolio")
+async def export_student_portfolio(
+    student_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Export a student's portfolio as a CSV file.
+    Only the student's class teacher is authorized to perform this export.
+    """
+    student = db.query(Student).get(student_id)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    if student.class_group.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    try:
+        output = StringIO()
+        writer = csv.writer(output)
+
+        # Header row
+        writer.writerow(
+            [
+                "Date",
+                "Assignment",
+                "Writing Age",
+                "Score",
+                "Max Score",
+                "Achievement %",
+                "Strengths",
+                "Areas for Development",
+            ]
+        )
+
+        samples = (
+            db.query(Writing)
+            .filter_by(student_id=student_id)
+            .order_by(Writing.created_at.desc())
+            .all()
+        )
+
+        for sample in samples:
+            max_score = len(sample.criteria_marks) * 2 if sample.assignment_id else 0
+            achieved_score = (
+                sum(mark.score for mark in sample.criteria_marks)
+                if sample.assignment_id
+                else 0
+            )
+            percent = (
+                round((achieved_score / max_score * 100), 1) if max_score > 0 else "N/A"
+            )
+
+            feedback_parts = (
+                sample.feedback.split("\n\n") if sample.feedback else ["", ""]
+            )
+            strengths = (
+                feedback_parts[0].replace("Strengths:", "").strip()
+                if len(feedback_parts) > 0
+                else ""
+            )
+            development = (
+                feedback_parts[1].replace("Areas for Development:", "").strip()
+                if len(feedback_parts) > 1
+                else ""
+            )
+
+            writer.writerow(
+                [
+                    sample.created_at.strftime("%Y-%m-%d"),
+                    sample.assignment.title if sample.assignment else "Free Writing",
+                    sample.writing_age,
+                    achieved_score if max_score > 0 else "N/A",
+                    max_score if max_score > 0 else "N/A",
+                    f"{percent}%" if isinstance(percent, (int, float)) else percent,
+                    strengths,
+                    development,
+                ]
+            )
+
+        output.seek(0)
+
+        filename = f"{student.first_name}_{student.last_name}_portfolio_{datetime.now().strftime('%Y%m%d')}.csv"
+        return StreamingResponse(
+            output,
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+
+    except Exception as e:
+        logger.error(f"Error exporting portfolio for student {student_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to export portfolio")
@@ -0,0 +1,205 @@
+"""Teacher account settings and school logo."""
+from fastapi import APIRouter, Request, Depends, Form, HTTPException, UploadFile, File
+from fastapi.responses import RedirectResponse, JSONResponse
+from starlette.responses import Response, HTMLResponse
+from starlette.status import HTTP_200_OK, HTTP_500_INTERNAL_SERVER_ERROR
+from sqlalchemy.orm import Session
+from database import get_db
+from models import User
+from forms import SettingsForm
+from dependencies.auth import get_current_user
+from image_processing import allowed_file
+from templating import templates
+from typing import Optional
+from io import BytesIO
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def save_school_logo(user: User, upload: UploadFile):
+    """Thumbnail an uploaded logo and store it as PNG bytes with its content hash."""
+    from PIL import Image
+
+    img = Image.open(upload.file)
+    img.thumbnail((200, 200))  # Resize while maintaining aspect ratio
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    data = buffer.getvalue()
+    user.school_logo_data = data
+    user.school_logo_hash = hashlib.sha256(data).hexdigest()
+    user.school_logo = None
+
+
+def clear_school_logo(user: User):
+    user.school_logo_data = None
+    user.school_logo_hash = None
+    user.school_logo = None
+
+
+@router.get("/school_logo", name="school_logo")
+def school_logo(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Serve the current teacher's school logo. Templates link to it with
+    ?v=<hash>, so the response can be cached until the logo changes.
+    """
+    if not current_user.school_logo_hash:
+        raise HTTPException(status_code=404, detail="No school logo")
+
+    etag = f'"{current_user.school_logo_hash}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    data = (
+        db.query(User.school_logo_data).filter(User.id == current_user.id).scalar()
+    )
+    if not data:
+        raise HTTPException(status_code=404, detail="No school logo")
+    return Response(content=data, media_type="image/png", headers=headers)
+
+
+@router.api_route("/settings", methods=["GET", "POST"], response_class=HTMLResponse)
+async def settings(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    school_logo: Optional[UploadFile] = File(None),
+):
+    """
+    Handles:
+    - GET: Settings page display
+    - POST (Form or multipart): Settings update
+    - POST (JSON): Logo removal
+    """
+    # Handle JSON payload for logo removal
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()
+            if body.get("remove_logo") is True:
+                clear_school_logo(current_user)
+                db.commit()
+                return JSONResponse(content={"success": True})
+        except Exception as e:
+            logger.error(f"Error removing logo: {str(e)}")
+            db.rollback()
+            return JSONResponse(
+                status_code=500, content={"error": "Failed to remove logo"}
+            )
+
+    if request.method == "POST":
+        form_data = await request.form()
+        try:
+            form = SettingsForm(
+                first_name=form_data.get("first_name"),
+                last_name=form_data.get("last_name"),
+                school_name=form_data.get("school_name"),
+            )
+        except Exception as e:
+            logger.warning(f"Validation error: {str(e)}")
+            return templates.TemplateResponse(
+                "settings.html",
+                {
+                    "request": request,
+                    "form_data": form_data,
+                    "errors": str(e),
+                },
+                status_code=422,
+            )
+
+        try:
+            current_user.first_name = form.first_name
+            current_user.last_name = form.last_name
+            current_user.school_name = form.school_name
+
+            if school_logo and allowed_file(school_logo.filename):
+                save_school_logo(current_user, school_logo)
+
+            db.commit()
+            request.session["flash"] = {
+                "message": "Settings updated successfully!",
+                "category": "success",
+            }
+            return RedirectResponse(url="/settings", status_code=302)
+
+        except Exception as e:
+            logger.error(f"Failed to update settings: {str(e)}")
+            db.rollback()
+            request.session["flash"] = {
+                "message": "Error updating settings",
+                "category": "danger",
+            }
+            return RedirectResponse(url="/settings", status_code=302)
+
+    # GET Request - render template
+    return templates.TemplateResponse(
+        "settings.html",
+        {
+            "request": request,
+            "current_user": current_user,
+            "form": {
+                "first_name": current_user.first_name,
+                "last_name": current_user.last_name,
+                "school_name": current_user.school_name,
+            },
+        },
+    )
+
+
+@router.post("/update_settings", response_class=HTMLResponse)
+async def update_settings(
+    first_name: str = Form(...),
+    last_name: str = Form(...),
+    school_name: Optional[str] = Form(None),
+    school_logo: Optional[UploadFile] = File(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    try:
+        # Update the user data
+        current_user.first_name = first_name
+        current_user.last_name = last_name
+        current_user.school_name = school_name
+
+        # Handle logo upload if available
+        if school_logo:
+            save_school_logo(current_user, school_logo)
+
+        db.commit()
+        return HTMLResponse(
+            content="Settings updated successfully!", status_code=HTTP_200_OK
+        )
+
+    except Exception as e:
+        db.rollback()
+        return HTMLResponse(
+            content=f"Error updating settings: {str(e)}",
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@router.post("/remove_logo", response_class=JSONResponse)
+async def remove_logo(
+    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    try:
+        # Remove the logo
+        clear_school_logo(current_user)
+        db.commit()
+        return JSONResponse(content={"success": True}, status_code=HTTP_200_OK)
+    except Exception as e:
+        db.rollback()
+        return JSONResponse(
+            content={"error": "Failed to remove logo"},
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+        )
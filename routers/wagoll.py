@@ -0,0 +1,343 @@
+"""WAGOLL (What A Good One Looks Like) generation and library."""
+from fastapi import APIRouter, Request, Depends, Query
+from fastapi.responses import JSONResponse
+from starlette.responses import HTMLResponse
+from sqlalchemy.orm import Session
+from database import get_db
+from models import User
+from dependencies.auth import get_current_user
+from templating import templates
+from wagoll_library import list_examples, PAGE_SIZE, MAX_PAGE_SIZE
+from typing import Optional
+import wagoll_generation
+from llm_usage import TokenBudgetExceeded
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/wagoll_library", response_class=HTMLResponse)
+async def wagoll_library(
+    request: Request,
+    q: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """View the first page of the teacher's and the public WAGOLL examples."""
+    my_examples, my_cursor = list_examples(db, current_user, "mine", search=q)
+    public_examples, public_cursor = list_examples(db, current_user, "public", search=q)
+
+    return templates.TemplateResponse(
+        "wagoll_library.html",
+        {
+            "request": request,
+            "search": q or "",
+            "my_examples": my_examples,
+            "my_cursor": my_cursor,
+            "public_examples": public_examples,
+            "public_cursor": public_cursor,
+        },
+    )
+
+
+@router.get("/api/wagoll_examples")
+def wagoll_examples_page(
+    scope: str = Query("mine", pattern="^(mine|public)$"),
+    q: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """One page of WAGOLL example summaries; full text via /wagoll_example/{id}."""
+    try:
+        examples, next_cursor = list_examples(
+            db, current_user, scope, search=q, cursor=cursor, limit=limit
+        )
+        return JSONResponse(content={"examples": examples, "next_cursor": next_cursor})
+    except Exception as e:
+        logger.error(f"Error listing WAGOLL examples: {str(e)}")
+        return JSONResponse(status_code=500, content={"error": "Failed to list examples"})
+
+
+@router.post("/save_to_wagoll")
+async def save_to_wagoll(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Save a writing sample as a WAGOLL example from index page."""
+    try:
+        data = await request.json()
+        title = data.get("title")
+        content = data.get("content")
+        explanations = data.get("explanations", "")
+        is_public = data.get("is_public", False)
+        writing_id = data.get("writing_id")
+        assignment_id = data.get("assignment_id")
+
+        logger.debug(
+            f"WAGOLL save request received: title={title}, content length={len(content) if content else 'None'}"
+        )
+
+        if not title or not content:
+            logger.error(
+                f"Missing required fields: title={bool(title)}, content={bool(content)}"
+            )
+            return (
+                JSONResponse(
+                    status_code=400,
+                    content={
+                        "success": False,
+                        "error": "Title and content are required",
+                    },
+                ),
+            )
+
+        # Import the model
+        from models import WagollExample, Writing
+
+        # If we have a writing ID but no content, try to get content from the writing sample
+        if writing_id and not content and db.query(Writing).get(writing_id):
+            writing = db.query(Writing).get(writing_id)
+            if writing and writing.text_content:
+                content = writing.text_content
+                logger.debug(f"Retrieved content from writing ID {writing_id}")
+
+        # Double-check content after potential retrieval
+        if not content:
+            logger.error(
+                "Content still missing after attempting to retrieve from writing_id"
+            )
+            return (
+                JSONResponse(
+                    status_code=400,
+                    content={"success": False, "error": "Content isrequired"},
+                ),
+            )
+
+        # Create the WAGOLL example
+        example = WagollExample(
+            title=title,
+            content=content,
+            explanations=explanations,
+            is_public=is_public,
+            assignment_id=assignment_id,
+            teacher_id=current_user.id,
+            writing_id=writing_id,
+        )
+
+        db.add(example)
+        db.commit()
+        logger.debug(f"WAGOLL example saved successfully with ID: {example.id}")
+
+        return JSONResponse(content={"success": True, "id": example.id})
+
+    except Exception as e:
+        logger.error(f"Error saving WAGOLL from index: {str(e)}")
+        db.rollback()
+        return JSONResponse(
+            status_code=500, content={"success": False, "error": str(e)}
+        )
+
+
+@router.get("/assignment/{assignment_id}/wagoll")
+async def get_wagoll(
+    assignment_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Generate a 'What A Good One Looks Like' (WAGOLL) example for the assignment."""
+    from models import Assignment
+
+    # Get the assignment and verify ownership
+    assignment = db.query(Assignment).get(assignment_id)
+    if assignment.class_group.teacher_id != current_user.id:
+        return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+    try:
+        return JSONResponse(content=wagoll_generation.get_wagoll(db, assignment))
+
+    except TokenBudgetExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating WAGOLL: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={
+                "title": assignment.title if assignment else "Unknown Assignment",
+                "exemplar": "Error generating the WAGOLL example.",
+                "explanations": [f"Error: {str(e)}"],
+            },
+        )
+
+
+@router.get("/assignment/{assignment_id}/wagoll_examples")
+def get_wagoll_examples(
+    assignment_id,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Get saved WAGOLL examples for an assignment."""
+    from models import Assignment, WagollExample
+
+    # Get the assignment and verify ownership
+    assignment = db.query(Assignment).get(assignment_id)
+    if assignment.class_group.teacher_id != current_user.id:
+        return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+    try:
+        # Get examples created by this teacher for this assignment
+        examples = (
+            db.query(WagollExample)
+            .filter_by(assignment_id=assignment_id, teacher_id=current_user.id)
+            .order_by(WagollExample.updated_at.desc())
+            .all()
+        )
+
+        # Format response
+        response = {
+            "examples": [
+                {
+                    "id": example.id,
+                    "title": example.title,
+                    "updated_at": example.updated_at.isoformat(),
+                    "is_public": example.is_public,
+                }
+                for example in examples
+            ]
+        }
+
+        return JSONResponse(response)
+
+    except Exception as e:
+        logger.error(f"Error getting WAGOLL examples: {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@router.get("/wagoll_example/{example_id}")
+def get_wagoll_example(
+    example_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Get a specific WAGOLL example."""
+    from models import WagollExample
+
+    example = db.query(WagollExample).get(example_id)
+    if example is None:
+        return JSONResponse(status_code=404, content={"error": "Example not found"})
+
+    if example.teacher_id != current_user.id and not example.is_public:
+        return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+    try:
+        response = {
+            "id": example.id,
+            "title": example.title,
+            "content": example.content,
+            "explanations": example.explanations,
+            "is_public": example.is_public,
+            "assignment_id": example.assignment_id,
+            "assignment_title": (
+                example.assignment.title if example.assignment else None
+            ),
+            "created_at": (
+                example.created_at.isoformat() if example.created_at else None
+            ),
+            "updated_at": (
+                example.updated_at.isoformat() if example.updated_at else None
+            ),
+        }
+
+        return JSONResponse(content=response)
+
+    except Exception as e:
+        logger.error(f"Error getting WAGOLL example: {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@router.post("/wagoll_example/save")
+async def save_wagoll_example(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Save a WAGOLL example."""
+    from models import WagollExample, Assignment
+
+    try:
+        data = await request.json()
+        assignment_id = data.get("assignment_id")
+        title = data.get("title")
+        content = data.get("content")
+        explanations = data.get("explanations")
+        is_public = data.get("is_public", False)
+
+        if not title or not content:
+            return JSONResponse(
+                status_code=400,
+                content={"success": False, "error": "Title and content are required"},
+            )
+
+        # If assignment_id is provided, verify ownership
+        if assignment_id:
+            assignment = db.query(Assignment).get(assignment_id)
+            if (
+                not assignment
+                or not assignment.class_group
+                or assignment.class_group.teacher_id != current_user.id
+            ):
+                return JSONResponse(
+                    status_code=403, content={"success": False, "error": "Unauthorized"}
+                )
+
+        # Create the WAGOLL example
+        example = WagollExample(
+            title=title,
+            content=content,
+            explanations=explanations,
+            is_public=is_public,
+            assignment_id=assignment_id,
+            teacher_id=current_user.id,
+        )
+
+        db.add(example)
+        db.commit()
+
+        return JSONResponse(content={"success": True, "id": example.id})
+
+    except Exception as e:
+        logger.error(f"Error saving WAGOLL example: {str(e)}")
+        db.rollback()
+        return JSONResponse(
+            status_code=500, content={"success": False, "error": str(e)}
+        )
+
+
+@router.post("/wagoll_example/{example_id}/delete")
+def delete_wagoll_example(
+    example_id,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Delete a WAGOLL example."""
+    from models import WagollExample
+
+    example = db.query(WagollExample).get(example_id)
+    if example.teacher_id != current_user.id:
+        return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+    try:
+        db.delete(example)
+        db.commit()
+
+        return JSONResponse(status_code=200, content={"success": True})
+
+    except Exception as e:
+        logger.error(f"Error deleting WAGOLL example: {str(e)}")
+        db.rollback()
+        return JSONResponse(status_code=500, content={"error": str(e)})
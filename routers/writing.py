@@ -0,0 +1,1151 @@
+"""Uploading, marking and managing writing samples."""
+from fastapi import (
+    APIRouter,
+    Request,
+    Depends,
+    Form,
+    HTTPException,
+    UploadFile,
+    File,
+    Query,
+    status,
+)
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import HTMLResponse, Response
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import SessionLocal, get_db
+from models import (
+    Student,
+    Class,
+    User,
+    Writing,
+    Assignment,
+    AnalysisFeedback,
+    CriteriaMark,
+    PageImage,
+    QuoteAnchor,
+)
+from dependencies.auth import get_current_user
+from image_processing import analyze_writing, allowed_file, encode_image_to_base64, tidy_feedback
+from anchoring import anchor_feedback, feedback_sources
+from class_feedback import schedule_refresh
+from deletion import delete_writings
+from blob_store import get_store
+from page_images import load_pages, store_pages
+import admin_metrics
+from wagoll_generation import schedule_pregeneration
+from mailchimp_utils import tag_user_first_analysis
+from llm import complete, stream
+from llm_usage import TokenBudgetExceeded
+from templating import templates
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from typing import Optional, List, Union
+from datetime import datetime
+import io
+import os
+import json
+import queue
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post(
+    "/process_image",
+)
+async def process_image(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Process uploaded writing sample image and return analysis."""
+    try:
+        # Get the base64 image data from the request
+        data = await request.json()
+        if not data or "image" not in data:
+            return JSONResponse(
+                status_code=400, content={"error": "No image data provided"}
+            )
+
+        base64_image = data["image"].split(",")[
+            1
+        ]  # Remove the data:image/jpeg;base64, prefix
+        assignment_id = data.get("assignment_id")
+        student_id = data.get("student_id")
+
+        # Get assignment if ID provided
+        assignment = None
+        if assignment_id:
+            assignment = db.query(Assignment).get(assignment_id)
+
+        # Analyze the writing
+        analysis_result = analyze_writing(base64_image, assignment)
+
+        if analysis_result:
+            # Create new writing record
+            writing_sample = Writing(
+                filename=data.get("filename", "uploaded_image.jpg"),
+                image_data=base64_image,
+                analysis_result=json.dumps(analysis_result),
+                text_content=analysis_result.get("extracted_text", ""),
+                writing_age=analysis_result.get("age", ""),
+                feedback=analysis_result.get("feedback", ""),
+                user_id=current_user.id,
+                assignment_id=assignment_id if assignment_id else None,
+                student_id=student_id if student_id else None,
+                created_at=datetime.now(),
+            )
+
+            # Save to database
+            db.add(writing_sample)
+            db.commit()
+            admin_metrics.record_activity(current_user.id)
+
+            # Check if this is the user's first writing analysis
+            try:
+                # Get all writings connected to students in classes taught by this teacher
+                writing_count = (
+                    db.query(Writing)
+                    .join(Student)
+                    .join(Class)
+                    .filter(Class.teacher_id == current_user.id)
+                    .count()
+                )
+
+                if writing_count == 1:  # This means it's their first writing
+                    success = tag_user_first_analysis(current_user.email)
+                    if success:
+                        logger.info(
+                            f"Successfully tagged user {current_user.email} with 'Scribl Used'"
+                        )
+                    else:
+                        logger.warning(
+                            f"Failed to tag user {current_user.email} with 'Scribl Used'"
+                        )
+            except Exception as e:
+                logger.error(f"Error checking first writing analysis: {str(e)}")
+                # Continue with the response even if tagging fails
+
+            return JSONResponse(
+                {
+                    "request": request,
+                    "status": "success",
+                    "analysis": analysis_result,
+                    "writing_id": writing_sample.id,
+                }
+            )
+        else:
+            return JSONResponse(
+                status_code=500, content={"error": "Failed to analyze writing"}
+            )
+
+    except Exception as e:
+        logger.error(f"Error processing image: {str(e)}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@router.get("/add-writing", response_class=HTMLResponse)
+async def add_writing(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    mobile_camera: bool = Query(default=False),
+):
+    """
+    Standard add writing page with optional camera view for mobile.
+    """
+    # Detect mobile from User-Agent
+    user_agent = request.headers.get("user-agent", "").lower()
+    is_mobile = any(
+        keyword in user_agent for keyword in ["android", "iphone", "ipad", "mobile"]
+    )
+
+    # Fetch teacher's classes
+    classes = db.query(Class).filter_by(teacher_id=current_user.id).all()
+
+    return templates.TemplateResponse(
+        "index.html",
+        {
+            "request": request,
+            "classes": classes,
+            "is_mobile": is_mobile,
+            "mobile_camera": mobile_camera,
+        },
+    )
+
+
+@router.api_route(
+    "/writing/{writing_id}/delete", methods=["GET", "POST"], response_class=HTMLResponse
+)
+async def delete_writing(
+    writing_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Delete a writing sample. Supports both GET and POST methods.
+    """
+    try:
+        # Fetch writing and related student
+        writing = db.query(Writing).filter_by(id=writing_id).first()
+        if not writing:
+            raise HTTPException(status_code=404, detail="Writing not found")
+
+        student = db.query(Student).filter_by(id=writing.student_id).first()
+        if not student:
+            raise HTTPException(status_code=404, detail="Student not found")
+
+        # Check teacher ownership
+        if student.class_group.teacher_id != current_user.id:
+            logger.warning(f"Unauthorized delete attempt by user {current_user.id}")
+            if request.method == "POST":
+                return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+            return RedirectResponse(url="/", status_code=302)
+
+        student_id = student.id
+
+        delete_writings(db, [writing_id])
+        admin_metrics.record_activity(current_user.id)
+        logger.info(f"Writing sample {writing_id} deleted")
+
+        # Handle AJAX/JSON POST
+        if request.method == "POST":
+            return JSONResponse(status_code=200, content={"success": True})
+
+        # Handle browser redirect after GET
+        response = RedirectResponse(
+            url=f"/student/{student_id}/portfolio", status_code=302
+        )
+        request.session["flash"] = {
+            "message": "Writing sample deleted successfully!",
+            "category": "success",
+        }
+        return response
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error deleting writing sample {writing_id}: {str(e)}")
+
+        if request.method == "POST":
+            return JSONResponse(
+                status_code=500, content={"error": "Failed to delete writing sample"}
+            )
+
+        request.session["flash"] = {
+            "message": "Failed to delete writing sample.",
+            "category": "error",
+        }
+        return RedirectResponse(url=f"/student/{student_id}/portfolio", status_code=302)
+
+
+PAGE_BREAK = "\n\nPage Break\n\n"
+# Pages transcribed at once per upload; llm_scheduler caps the total
+MAX_PAGE_WORKERS = 3
+# Seconds between comment lines on an idle stream, so proxies keep it open
+SSE_KEEPALIVE = 15
+
+CRITERIA_PROMPT_HEAD = """You are an expert teacher evaluating a writing sample against specific success criteria.
+
+        For each criterion, you must evaluate CONSISTENTLY using these specific scoring guidelines
+        Score 0 = Not met:
+        - The required skill/element is completely absent
+        - No evidence of attempting the criterion
+        - Significant errors that impede understandin
+        Score 1 = Partially met:
+        - The skill/element is present but inconsistent
+        - Basic or limited demonstration of the criterion
+        - Some errors but meaning is generally clea
+        Score 2 = Confidently used:
+        - Consistent and effective use throughout
+        - Clear evidence of mastery of the criterion
+        - Minimal errors that don't impact understandin
+        IMPORTANT SCORING RULES:
+        1. Be consistent - similar writing should receive similar scores
+        2. Focus on evidence - cite specific examples from the text
+        3. Consider age-appropriate expectations
+        4. Score each criterion independently
+        5. Avoid being influenced by overall impression
+
+        Criteria to evaluate:
+        """
+
+CRITERIA_PROMPT_TAIL = """
+        Analyze the text thoroughly and respond with a JSON object in this exact format:
+        {
+            "evaluations": [
+                {
+                    "criterion": "exact criterion text",
+                    "score": number (0, 1, or 2),
+                    "justification": "MUST include specific examples from the text that justify this score"
+                }
+            ]
+        }
+
+        For each criterion, your justification MUST:
+        1. Quote specific examples from the text
+        2. Explain why these examples merit the given score
+        3. Reference the scoring guidelines above"""
+
+
+async def _read_upload(db: Session, current_user, images, student_id, assignment_id):
+    """Check the upload is for the teacher's own student and read the pages."""
+    if not images:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+
+    student = db.query(Student).get(student_id)
+    if not student or student.class_group.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Invalid student selected")
+
+    assignment = None
+    if assignment_id:
+        assignment = db.query(Assignment).get(assignment_id)
+        if assignment and assignment.class_id != student.class_id:
+            raise HTTPException(status_code=403, detail="Invalid assignment selected")
+
+    pages = [(image.filename, await image.read()) for image in images]
+    return student, assignment, pages
+
+
+def _is_young_writer(assignment) -> bool:
+    if not assignment or not assignment.class_group:
+        return False
+    year_group = assignment.class_group.year_group.lower()
+    return any(y in year_group for y in ["1", "2", "3", "4", "reception", "ks1"])
+
+
+def _preprocess_image(image_bytes: bytes) -> bytes:
+    from PIL import Image, ImageEnhance, ImageFilter
+
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img = ImageEnhance.Contrast(img).enhance(1.5)
+        img = img.filter(ImageFilter.SHARPEN)
+        output = io.BytesIO()
+        img.save(output, format="JPEG", quality=95)
+        return output.getvalue()
+    except Exception as e:
+        logger.error(f"Preprocess error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to preprocess image")
+
+
+def _transcription_request(image_bytes: bytes, is_young_writer: bool) -> dict:
+    base64_image = encode_image_to_base64(_preprocess_image(image_bytes))
+    system_prompt = (
+        "You are an expert at transcribing children's handwritten text..."
+        if is_young_writer
+        else "You are an expert at transcribing handwritten text..."
+    )
+    return {
+        "model": os.getenv("MODEL_NAME"),
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": "Transcribe this handwritten text exactly as it appears.",
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+                    },
+                ],
+            },
+        ],
+        "max_tokens": 1500,
+        "temperature": 0.2,
+    }
+
+
+def _save_writing(db: Session, current_user, filename, text, age_estimate, feedback, student_id, assignment_id):
+    writing_sample = Writing(
+        filename=filename,
+        text_content=text,
+        writing_age=age_estimate,
+        feedback=feedback,
+        student_id=student_id,
+        assignment_id=assignment_id if assignment_id else None,
+    )
+    db.add(writing_sample)
+    db.commit()
+    db.refresh(writing_sample)
+    admin_metrics.record_activity(current_user.id)
+
+    try:
+        writing_count = db.query(Writing).filter_by(student_id=student_id).count()
+        if writing_count == 0:
+            tag_user_first_analysis(current_user.email)
+    except Exception as e:
+        logger.error(f"Mailchimp tagging failed: {str(e)}")
+
+    return writing_sample
+
+
+def _score_criteria(db: Session, writing_sample: Writing, assignment: Assignment, text: str) -> list[dict]:
+    """Mark the text against the assignment's criteria and store the marks."""
+    criteria_prompt = CRITERIA_PROMPT_HEAD
+    for criterion in assignment.criteria:
+        criteria_prompt += f"- {criterion.description}\n"
+    criteria_prompt += CRITERIA_PROMPT_TAIL
+
+    criteria_marks = []
+    try:
+        criteria_response = complete(
+            "criteria",
+            model=os.getenv("MODEL_NAME"),
+            max_tokens=1500,
+            temperature=0.2,
+            messages=[
+                {"role": "system", "content": criteria_prompt},
+                {
+                    "role": "user",
+                    "content": f"Evaluate this writing:\n\n{text}",
+                },
+            ],
+        )
+
+        response_data = json.loads(criteria_response.choices[0].message.content)
+        evaluations = response_data.get("evaluations", [])
+        db.query(CriteriaMark).filter_by(writing_id=writing_sample.id).delete()
+        for criterion, evaluation in zip(assignment.criteria, evaluations):
+            score = min(2, max(0, int(evaluation.get("score", 0))))
+            mark = CriteriaMark(
+                writing_id=writing_sample.id, criteria_id=criterion.id, score=score
+            )
+            db.add(mark)
+            criteria_marks.append(
+                {
+                    "criteria": criterion.description,
+                    "criteria_id": criterion.id,
+                    "score": score,
+                    "justification": evaluation.get("justification", ""),
+                }
+            )
+
+        total_marks = len(criteria_marks)
+        if total_marks:
+            total_score = sum(mark["score"] for mark in criteria_marks)
+            writing_sample.total_marks_percentage = (
+                total_score / (total_marks * 2)
+            ) * 100
+
+        db.commit()
+
+    except Exception as e:
+        logger.error(f"Error scoring criteria: {str(e)}")
+        db.rollback()
+        criteria_marks = []
+
+    return criteria_marks
+
+
+def _anchor_quotes(db: Session, writing_sample: Writing, text: str, feedback: str, criteria_marks) -> list[dict]:
+    """Resolve quoted examples to offsets once, so clients don't have to."""
+    try:
+        quote_anchors = anchor_feedback(text, feedback_sources(feedback, criteria_marks))
+        for anchor in quote_anchors:
+            db.add(QuoteAnchor(writing_id=writing_sample.id, **anchor))
+        writing_sample.highlights_revision = func.coalesce(Writing.highlights_revision, 0) + 1
+        db.commit()
+        return quote_anchors
+    except Exception as e:
+        logger.error(f"Error anchoring feedback quotes: {str(e)}")
+        db.rollback()
+        return []
+
+
+def _transcribe(image_bytes: bytes, is_young_writer: bool) -> str:
+    response = complete("transcription", **_transcription_request(image_bytes, is_young_writer))
+    return response.choices[0].message.content.strip()
+
+
+def _submit(executor, fn, *args):
+    # Each worker gets a copy of the request context for the usage ledger
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _page_files(pages):
+    return [(filename, data) for filename, data in pages if filename and allowed_file(filename)]
+
+
+def _transcribe_and_analyse(pages, assignment) -> tuple[str, str, str]:
+    """(text, writing age, feedback) for the uploaded or stored pages."""
+    is_young_writer = _is_young_writer(assignment)
+
+    # The analysis reads the original first page, so it runs alongside
+    # the transcription rather than after it
+    with ThreadPoolExecutor(max_workers=min(len(pages), MAX_PAGE_WORKERS) + 1) as executor:
+        analysis = _submit(executor, analyze_writing, encode_image_to_base64(pages[0][1]), assignment)
+        futures = [
+            _submit(executor, _transcribe, data, is_young_writer)
+            for filename, data in _page_files(pages)
+        ]
+        combined_text = [text for text in (future.result() for future in futures) if text]
+        if not combined_text:
+            raise HTTPException(
+                status_code=403, detail="No text could be extracted from the images"
+            )
+        age_estimate, feedback = tidy_feedback(analysis.result())
+
+    return PAGE_BREAK.join(combined_text), age_estimate, feedback
+
+
+def _keep_pages(db: Session, writing_sample: Writing, pages):
+    """Store the original pages so the writing can be re-processed later."""
+    try:
+        store_pages(db, writing_sample.id, _page_files(pages))
+    except Exception as e:
+        logger.error(f"Error storing page images: {str(e)}")
+        db.rollback()
+
+
+@router.post("/process")
+async def process_images_ocr(
+    images: List[UploadFile] = File(...),
+    student_id: str = Form(...),
+    assignment_id: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    student, assignment, pages = await _read_upload(db, current_user, images, student_id, assignment_id)
+    # The model calls block for tens of seconds; keep them off the event loop
+    return await run_in_threadpool(
+        _mark_upload, db, current_user, student, assignment, assignment_id, pages
+    )
+
+
+def _mark_upload(db: Session, current_user, student, assignment, assignment_id, pages):
+    final_text, age_estimate, feedback = _transcribe_and_analyse(pages, assignment)
+
+    writing_sample = _save_writing(
+        db, current_user, pages[0][0], final_text, age_estimate, feedback, student.id, assignment_id
+    )
+    _keep_pages(db, writing_sample, pages)
+    criteria_marks = _score_criteria(db, writing_sample, assignment, final_text) if assignment else []
+    quote_anchors = _anchor_quotes(db, writing_sample, final_text, feedback, criteria_marks)
+
+    if assignment:
+        schedule_refresh(assignment.id)
+        schedule_pregeneration(assignment.id)
+
+    return JSONResponse(
+        content={
+            "text": final_text,
+            "writing_age": age_estimate,
+            "feedback": feedback,
+            "writing_id": writing_sample.id,
+            "criteria_marks": criteria_marks,
+            "quote_anchors": quote_anchors,
+        }
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _marking_events(current_user, student_id: int, assignment_id, pages):
+    """
+    The /process pipeline as server-sent events: "transcript" deltas per
+    page while the model writes them, "analysis" (writing age and
+    feedback), "criteria" (marks), then "done" with the same body /process
+    returns. Failures end the stream with an "error" event.
+    """
+    db = SessionLocal()
+    deltas = queue.Queue()
+    executor = ThreadPoolExecutor(max_workers=min(len(pages), MAX_PAGE_WORKERS) + 1)
+
+    def stream_page(index: int, data: bytes) -> str:
+        parts = []
+        for delta in stream("transcription", **_transcription_request(data, is_young_writer)):
+            parts.append(delta)
+            deltas.put((index, delta))
+        return "".join(parts).strip()
+
+    try:
+        assignment = db.get(Assignment, assignment_id) if assignment_id else None
+        is_young_writer = _is_young_writer(assignment)
+        analysis = _submit(executor, analyze_writing, encode_image_to_base64(pages[0][1]), assignment)
+        futures = [
+            _submit(executor, stream_page, index, data)
+            for index, (filename, data) in enumerate(_page_files(pages))
+        ]
+
+        last_sent = time.monotonic()
+        while not all(future.done() for future in futures) or not deltas.empty():
+            try:
+                index, delta = deltas.get(timeout=0.1)
+            except queue.Empty:
+                if time.monotonic() - last_sent > SSE_KEEPALIVE:
+                    last_sent = time.monotonic()
+                    yield ": keepalive\n\n"
+                continue
+            last_sent = time.monotonic()
+            yield _sse("transcript", {"page": index, "delta": delta})
+
+        combined_text = [text for text in (future.result() for future in futures) if text]
+        if not combined_text:
+            yield _sse("error", {"error": "No text could be extracted from the images"})
+            return
+        final_text = PAGE_BREAK.join(combined_text)
+
+        age_estimate, feedback = tidy_feedback(analysis.result())
+        yield _sse("analysis", {"text": final_text, "writing_age": age_estimate, "feedback": feedback})
+
+        writing_sample = _save_writing(
+            db, current_user, pages[0][0], final_text, age_estimate, feedback, student_id, assignment_id
+        )
+        _keep_pages(db, writing_sample, pages)
+        criteria_marks = []
+        if assignment:
+            criteria_marks = _score_criteria(db, writing_sample, assignment, final_text)
+            yield _sse("criteria", {"writing_id": writing_sample.id, "criteria_marks": criteria_marks})
+        quote_anchors = _anchor_quotes(db, writing_sample, final_text, feedback, criteria_marks)
+
+        if assignment:
+            schedule_refresh(assignment.id)
+            schedule_pregeneration(assignment.id)
+
+        yield _sse(
+            "done",
+            {
+                "text": final_text,
+                "writing_age": age_estimate,
+                "feedback": feedback,
+                "writing_id": writing_sample.id,
+                "criteria_marks": criteria_marks,
+                "quote_anchors": quote_anchors,
+            },
+        )
+
+    except TokenBudgetExceeded as e:
+        logger.warning(str(e))
+        yield _sse("error", {"error": "Daily AI usage limit reached. Please try again tomorrow."})
+    except Exception as e:
+        logger.error(f"Error streaming writing analysis: {str(e)}")
+        db.rollback()
+        yield _sse("error", {"error": "Failed to process image"})
+    finally:
+        # Also reached when the client disconnects mid-stream
+        executor.shutdown(wait=False, cancel_futures=True)
+        db.close()
+
+
+@router.post("/process/stream")
+async def process_images_stream(
+    images: List[UploadFile] = File(...),
+    student_id: str = Form(...),
+    assignment_id: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """/process, streamed to the browser as each stage finishes."""
+    student, assignment, pages = await _read_upload(db, current_user, images, student_id, assignment_id)
+    return StreamingResponse(
+        _marking_events(current_user, student.id, assignment.id if assignment else None, pages),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _page_image(db: Session, current_user, writing_id: int, page: int):
+    return (
+        db.query(PageImage)
+        .join(Writing, PageImage.writing_id == Writing.id)
+        .join(Student, Writing.student_id == Student.id)
+        .join(Class, Student.class_id == Class.id)
+        .filter(
+            PageImage.writing_id == writing_id,
+            PageImage.page == page,
+            Class.teacher_id == current_user.id,
+        )
+        .first()
+    )
+
+
+def _serve_blob(request: Request, key: str, media_type: str):
+    # Blobs are content-addressed, so the key is a permanent ETag
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=get_store().get(key), media_type=media_type, headers=headers)
+
+
+@router.get("/writing/{writing_id}/pages/{page}", name="writing_page")
+def writing_page(
+    writing_id: int,
+    page: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """The original upload of one page of a writing sample."""
+    page_image = _page_image(db, current_user, writing_id, page)
+    if not page_image:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return _serve_blob(request, page_image.blob_hash, page_image.blob.content_type)
+
+
+@router.get("/writing/{writing_id}/pages/{page}/thumbnail", name="writing_page_thumbnail")
+def writing_page_thumbnail(
+    writing_id: int,
+    page: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    page_image = _page_image(db, current_user, writing_id, page)
+    if not page_image or not page_image.blob.thumbnail_hash:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return _serve_blob(request, page_image.blob.thumbnail_hash, "image/jpeg")
+
+
+@router.post("/writing/{writing_id}/reprocess")
+def reprocess_writing(
+    writing_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Transcribe, analyse and mark a writing sample again from its stored
+    pages, e.g. after a prompt or model change, without a new upload.
+    """
+    writing = db.query(Writing).filter_by(id=writing_id).first()
+    if not writing or writing.student.class_group.teacher_id != current_user.id:
+        return JSONResponse(status_code=404, content={"error": "Writing not found"})
+
+    # Highlights are character offsets into the old transcription
+    highlights_conflict = JSONResponse(
+        status_code=409,
+        content={"error": "Remove the highlights from this writing before re-processing it"},
+    )
+    if writing.highlights:
+        return highlights_conflict
+    # Every highlights save bumps the revision, so a save made while the
+    # pages are transcribed shows up as a changed revision below
+    seen_revision = writing.highlights_revision or 0
+
+    pages = load_pages(db, writing.id)
+    if not pages:
+        return JSONResponse(
+            status_code=404, content={"error": "No stored pages for this writing"}
+        )
+
+    assignment = writing.assignment
+    final_text, age_estimate, feedback = _transcribe_and_analyse(pages, assignment)
+
+    try:
+        # Compare-and-swap on the revision, as highlight saves do; the bump
+        # also makes cached highlights responses (text and anchors) stale
+        current = func.coalesce(Writing.highlights_revision, 0)
+        updated = (
+            db.query(Writing)
+            .filter(Writing.id == writing.id, current == seen_revision)
+            .update(
+                {
+                    Writing.text_content: final_text,
+                    Writing.writing_age: age_estimate,
+                    Writing.feedback: feedback,
+                    Writing.highlights_revision: current + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        if not updated:
+            db.rollback()
+            return highlights_conflict
+        db.query(QuoteAnchor).filter_by(writing_id=writing.id).delete()
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error saving re-processed writing {writing_id}: {str(e)}")
+        db.rollback()
+        return JSONResponse(status_code=500, content={"error": "Failed to save writing"})
+
+    criteria_marks = _score_criteria(db, writing, assignment, final_text) if assignment else []
+    quote_anchors = _anchor_quotes(db, writing, final_text, feedback, criteria_marks)
+    admin_metrics.record_activity(current_user.id)
+
+    if assignment:
+        schedule_refresh(assignment.id)
+        schedule_pregeneration(assignment.id)
+
+    return JSONResponse(
+        content={
+            "text": final_text,
+            "writing_age": age_estimate,
+            "feedback": feedback,
+            "writing_id": writing.id,
+            "criteria_marks": criteria_marks,
+            "quote_anchors": quote_anchors,
+        }
+    )
+
+
+class FeedbackSubmission(BaseModel):
+    writing_id: int
+    is_helpful: bool
+    writing_age_accurate: Optional[bool]
+    strengths_accurate: Optional[bool]
+    development_accurate: Optional[bool]
+    criteria_accurate: Optional[bool]
+    comment: Optional[str]
+
+
+@router.post("/submit_feedback", response_class=JSONResponse)
+async def submit_feedback(
+    feedback_data: FeedbackSubmission,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Submit teacher feedback on writing analysis.
+    """
+    try:
+        logger.debug("Received feedback submission")
+
+        writing = db.query(Writing).get(feedback_data.writing_id)
+        if not writing:
+            logger.error("Writing ID not found")
+            raise HTTPException(status_code=404, detail="Writing not found")
+
+        student = db.query(Student).get(writing.student_id)
+        if not student or student.class_group.teacher_id != current_user.id:
+            logger.warning(
+                f"Unauthorized feedback attempt for writing {feedback_data.writing_id}"
+            )
+            raise HTTPException(status_code=403, detail="Unauthorized")
+
+        feedback = AnalysisFeedback(
+            writing_id=feedback_data.writing_id,
+            is_helpful=feedback_data.is_helpful,
+            writing_age_accurate=feedback_data.writing_age_accurate,
+            strengths_accurate=feedback_data.strengths_accurate,
+            development_accurate=feedback_data.development_accurate,
+            criteria_accurate=feedback_data.criteria_accurate,
+            comment=feedback_data.comment,
+        )
+
+        db.add(feedback)
+        db.commit()
+        db.refresh(feedback)
+        admin_metrics.record_activity(current_user.id)
+
+        logger.info(
+            f"Successfully saved feedback for writing {feedback_data.writing_id}"
+        )
+        return JSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "message": "Feedback submitted successfully",
+                "feedback_id": feedback.id,
+            },
+        )
+
+    except Exception as e:
+        logger.error(f"Error submitting feedback: {str(e)}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to submit feedback")
+
+
+@router.post("/update_criteria_marks")
+async def update_criteria_marks(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    try:
+        logger.debug("Received criteria marks update")
+        data = await request.json()
+        writing_id = data.get("writing_id")
+        updated_marks = data.get("updated_marks")
+
+        if not writing_id or not updated_marks:
+            logger.error("Writing ID or updated marks missing from request")
+            return (
+                JSONResponse(
+                    status_code=400,
+                    content={"error": "Writing ID and updated marks are required"},
+                ),
+            )
+
+        from models import Writing, CriteriaMark, Student
+
+        writing = db.query(Writing).get(writing_id)
+        student = db.query(Student).get(writing.student_id)
+
+        # Verify permission (teacher of the student's class)
+        if student.class_group.teacher_id != current_user.id:
+            logger.warning(
+                f"Unauthorized marks update attempt for writing {writing_id}"
+            )
+            return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+        # Get existing criteria marks
+        criteria_marks = db.query(CriteriaMark).filter_by(writing_id=writing_id).all()
+
+        if len(criteria_marks) != len(updated_marks):
+            logger.error(
+                f"Mismatch in criteria marks count: DB={len(criteria_marks)}, Request={len(updated_marks)}"
+            )
+            return JSONResponse(
+                status_code=400, content={"error": "Criteria marks count mismatch"}
+            )
+
+        # Update marks in database
+        for update in updated_marks:
+            index = update.get("criteria_index")
+            new_score = update.get("score")
+
+            if index < len(criteria_marks) and 0 <= new_score <= 2:
+                criteria_marks[index].score = new_score
+            else:
+                logger.warning(
+                    f"Invalid index orscore: index={index}, score={new_score}"
+                )
+
+        # Calculate and store total marks percentage
+        total_marks = len(criteria_marks)
+        if total_marks > 0:
+            total_score = sum(mark.score for mark in criteria_marks)
+            # Max score per criterion is 2, so maximum possible score is total_marks * 2
+            percentage = (total_score / (total_marks * 2)) * 100
+            writing.total_marks_percentage = percentage
+            logger.info(f"Calculated total marks percentage: {percentage}%")
+
+        db.commit()
+        logger.info(f"Successfully updated criteria marks for writing {writing_id}")
+
+        if writing.assignment_id:
+            schedule_refresh(writing.assignment_id)
+            schedule_pregeneration(writing.assignment_id)
+
+        return JSONResponse(
+            status_code=200,
+            content={"success": True, "message": "Criteria marks updated successfully"},
+        )
+
+    except Exception as e:
+        logger.error(f"Error updating criteria marks:{str(e)}")
+        db.rollback()
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Failed to update criteria marks: {str(e)}"},
+        )
+
+
+@router.post("/writing/{writing_id}/update_filename")
+async def update_writing_filename(
+    writing_id: int,
+    request: Request,
+    filename: Optional[str] = Form(None),  # fallback for form submission
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Update the filename of a writing sample.
+    Accepts both JSON and form data.
+    """
+    try:
+        # Prioritize JSON input
+        if request.headers.get("content-type", "").startswith("application/json"):
+            data = await request.json()
+            new_filename = data.get("filename")
+        else:
+            new_filename = filename
+
+        if not new_filename:
+            if request.headers.get("accept", "").startswith("application/json"):
+                raise HTTPException(status_code=400, detail="Filename is required")
+            return RedirectResponse(
+                url=str(request.headers.get("referer", "/")), status_code=303
+            )
+
+        writing = db.query(Writing).get(writing_id)
+        if not writing:
+            raise HTTPException(status_code=404, detail="Writing not found")
+
+        student = db.query(Student).get(writing.student_id)
+        if not student or student.class_group.teacher_id != current_user["id"]:
+            if request.headers.get("accept", "").startswith("application/json"):
+                raise HTTPException(status_code=403, detail="Unauthorized")
+            return RedirectResponse(url="/", status_code=303)
+
+        writing.filename = new_filename
+        db.commit()
+
+        if request.headers.get("accept", "").startswith("application/json"):
+            return JSONResponse(
+                content={"success": True, "filename": new_filename}, status_code=200
+            )
+        return RedirectResponse(
+            url=str(request.headers.get("referer", "/")), status_code=303
+        )
+
+    except Exception as e:
+        logger.error(f"Error updating writing filename: {str(e)}")
+        db.rollback()
+
+        if request.headers.get("accept", "").startswith("application/json"):
+            raise HTTPException(status_code=500, detail="Failed to update filename")
+        return RedirectResponse(url="/", status_code=303)
+
+
+class BulkDeleteRequest(BaseModel):
+    writing_ids: List[int]
+
+
+@router.post("/writing/bulk_delete")
+async def bulk_delete_writing(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+    writing_ids: Optional[Union[List[int], None]] = Form(None),
+):
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            body = await request.json()
+            writing_ids = body.get("writing_ids", [])
+        else:
+            form = await request.form()
+            writing_ids = form.getlist("writing_ids")
+
+        if not writing_ids:
+            return JSONResponse(
+                {"error": "No writing samples selected"},
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+
+        writing_ids = [int(writing_id) for writing_id in writing_ids]
+
+        # One query for ownership: (writing id, student id, owning teacher)
+        owners = (
+            db.query(Writing.id, Writing.student_id, Class.teacher_id)
+            .join(Student, Writing.student_id == Student.id)
+            .join(Class, Student.class_id == Class.id)
+            .filter(Writing.id.in_(writing_ids))
+            .all()
+        )
+
+        if not owners:
+            return JSONResponse(
+                {"error": "No matching writing samples found"},
+                status_code=status.HTTP_404_NOT_FOUND,
+            )
+
+        if any(teacher_id != current_user.id for _, _, teacher_id in owners):
+            return JSONResponse(
+                {"error": "Unauthorized access to one or more writing samples"},
+                status_code=status.HTTP_403_FORBIDDEN,
+            )
+
+        student_id = owners[0].student_id
+        delete_writings(db, [writing_id for writing_id, _, _ in owners])
+        admin_metrics.record_activity(current_user.id)
+
+        # Respond appropriately based on content type
+        if request.headers.get("content-type", "").startswith("application/json"):
+            return JSONResponse({"success": True}, status_code=status.HTTP_200_OK)
+        else:
+            redirect_url = f"/student/{student_id}/portfolio" if student_id else "/"
+            return RedirectResponse(
+                url=redirect_url, status_code=status.HTTP_303_SEE_OTHER
+            )
+
+    except Exception as e:
+        logger.error(f"Error bulk deleting writing samples: {str(e)}")
+        db.rollback()
+        if request.headers.get("content-type", "").startswith("application/json"):
+            return JSONResponse(
+                {"error": "Failed to delete writing samples"},
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        else:
+            return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
+
+
+@router.get("/writing/{writing_id}/print_report", response_class=HTMLResponse)
+async def print_writing_report(
+    writing_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Render a printable report of a student's writing sample.
+    """
+    # Fetch writing
+    writing = db.query(Writing).filter_by(id=writing_id).first()
+    if not writing:
+        raise HTTPException(status_code=404, detail="Writing not found")
+
+    # Fetch student
+    student = db.query(Student).filter_by(id=writing.student_id).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    # Authorization check
+    if student.class_group.teacher_id != current_user.id:
+        return RedirectResponse(url="/", status_code=302)
+
+    # Score calculations
+    total_possible_marks = len(writing.criteria_marks) * 2 if writing.assignment else 0
+    achieved_marks = (
+        sum(mark.score for mark in writing.criteria_marks) if writing.assignment else 0
+    )
+    percentage = (
+        round((achieved_marks / total_possible_marks * 100), 1)
+        if total_possible_marks > 0
+        else 0
+    )
+
+    # Feedback parsing
+    feedback_parts = writing.feedback.split("\n\n") if writing.feedback else ["", ""]
+    strengths = (
+        feedback_parts[0].replace("Strengths:", "").strip() if feedback_parts else ""
+    )
+    development = (
+        feedback_parts[1].replace("Areas for Development:", "").strip()
+        if len(feedback_parts) > 1
+        else ""
+    )
+
+    # Age calculations
+    student_age = (writing.created_at.date() - student.date_of_birth).days / 365.25
+    student_age_str = f"{int(student_age)} years {int((student_age % 1) * 12)} months"
+    writing_age_str = (
+        writing.writing_age.replace("Estimated writing age:", "").strip()
+        if writing.writing_age
+        else "N/A"
+    )
+
+    return templates.TemplateResponse(
+        "print_report.html",
+        {
+            "request": request,
+            "writing": writing,
+            "student": student,
+            "total_marks": total_possible_marks,
+            "achieved_marks": achieved_marks,
+            "percentage": percentage,
+            "strengths": strengths,
+            "development": development,
+            "student_age": student_age_str,
+            "writing_age": writing_age_str,
+        },
+    )
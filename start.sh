@@ -3,10 +3,16 @@
 set -e
 
 PORT=${PORT:-5000}
+export PORT
+
+if [ "${ENVIRONMENT:-development}" = "production" ]; then
+    echo "Starting FastAPI app with gunicorn on 0.0.0.0:$PORT"
+    exec gunicorn -c gunicorn.conf.py app:app
+fi
 
 echo "Starting FastAPI app on 0.0.0.0:$PORT"
 
-exec python -m uvicorn main:app \
+exec python -m uvicorn app:app \
     --host 0.0.0.0 \
     --port "$PORT" \
     --proxy-headers \
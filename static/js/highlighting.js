@@ -2226,6 +2226,34 @@ function setupTooltipPositioning() {
     }
 }
 
+// Server-computed quote offsets, per writing: { textLength, anchors }
+window.quoteAnchors = window.quoteAnchors || {};
+
+function rememberQuoteAnchors(writingId, textLength, anchors) {
+    if (!writingId || !anchors) return;
+    window.quoteAnchors[writingId] = { textLength: textLength, anchors: anchors };
+}
+
+/**
+ * Build highlighted HTML from server-computed [start, end) offsets.
+ * Overlapping anchors are skipped so spans never nest.
+ */
+function renderAnchoredText(text, anchors) {
+    let result = '';
+    let lastIndex = 0;
+    anchors.forEach(anchor => {
+        if (anchor.start < lastIndex || anchor.end > text.length) return;
+        const color = anchor.source === 'criteria' ? '#c8e6c9' : '#fff59d';
+        const tooltip = escapeHtml(anchor.label || anchor.quote);
+        result += escapeHtml(text.substring(lastIndex, anchor.start));
+        result += `<span class="highlight ai-highlight" style="background-color: ${color}" data-tooltip="${tooltip}">`;
+        result += escapeHtml(text.substring(anchor.start, anchor.end));
+        result += '</span>';
+        lastIndex = anchor.end;
+    });
+    return result + escapeHtml(text.substring(lastIndex));
+}
+
 /**
  * Apply AI highlights to a text element based on criteria marks
  * Enhanced version with automated criteria detection and confidence scoring
@@ -2245,6 +2273,14 @@ async function applyAIHighlights(textElement) {
 
     // Use the content text rather than innerHTML to avoid any existing HTML
     const contentText = textElement.textContent;
+
+    // Offsets computed by the server at /process time make the fuzzy
+    // matching below unnecessary, as long as the text is displayed verbatim
+    const anchored = window.quoteAnchors[window.currentWritingId];
+    if (anchored && anchored.anchors.length > 0 && anchored.textLength === contentText.length) {
+        textElement.innerHTML = renderAnchoredText(contentText, anchored.anchors);
+        return;
+    }
     
     // Try to find criteria marks in the DOM
     const criteriaItems = [];
@@ -2677,25 +2713,82 @@ async function applyAIHighlights(textElement) {
     }
 }
 
-// Function to save highlights
-async function saveHighlights(writingId) {
-    if (!writingId || !window.savedHighlights[writingId]) return;
+// Last state acknowledged by the server, per writing: { revision, highlights }
+window.serverHighlights = window.serverHighlights || {};
+
+function rememberServerHighlights(writingId, data) {
+    window.serverHighlights[writingId] = {
+        revision: data.revision,
+        highlights: data.highlights || []
+    };
+    window.savedHighlights[writingId] = (data.highlights || []).map(h => Object.assign({}, h));
+    rememberQuoteAnchors(writingId, data.text_length, data.anchors);
+    localStorage.setItem(`highlights-${writingId}`, JSON.stringify(window.savedHighlights[writingId]));
+}
+
+// Saves per writing, chained so each PATCH is based on the revision the
+// previous one returned
+window.highlightSaves = window.highlightSaves || {};
+
+function saveHighlights(writingId) {
+    if (!writingId || !window.savedHighlights[writingId]) return Promise.resolve();
 
-    // Save to local storage
     localStorage.setItem(`highlights-${writingId}`, JSON.stringify(window.savedHighlights[writingId]));
+    const previous = window.highlightSaves[writingId] || Promise.resolve();
+    const next = previous.then(() => sendHighlightChanges(writingId));
+    window.highlightSaves[writingId] = next.catch(() => {});
+    return next;
+}
+
+// Send the spans that changed since the server's copy. Local edits made
+// while a request is in flight stay in savedHighlights for the next save.
+async function sendHighlightChanges(writingId, attempt = 0) {
+    const current = window.savedHighlights[writingId] || [];
+    const server = window.serverHighlights[writingId] || { revision: null, highlights: [] };
+    const previous = new Map(server.highlights.map(h => [h.id, h]));
+    const kept = new Set();
+    const upsert = [];
+
+    current.forEach(highlight => {
+        if (highlight.id && previous.has(highlight.id)) {
+            kept.add(highlight.id);
+            const before = previous.get(highlight.id);
+            if (before.color === highlight.color && before.tooltip === highlight.tooltip
+                    && before.text === highlight.text) {
+                return;
+            }
+        }
+        upsert.push(highlight);
+    });
+    const remove = server.highlights.filter(h => !kept.has(h.id)).map(h => h.id);
+
+    if (upsert.length === 0 && remove.length === 0) return;
 
-    // Save to server if needed
     try {
         const response = await fetch(`/api/writings/${writingId}/highlights`, {
-            method: 'POST',
+            method: 'PATCH',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                highlights: window.savedHighlights[writingId]
+                base_revision: server.revision,
+                upsert: upsert.map(h => ({
+                    id: h.id, text: h.text, start: h.start, end: h.end,
+                    color: h.color, tooltip: h.tooltip
+                })),
+                delete: remove
             })
         });
-        if (!response.ok) {
+        if (response.ok) {
+            acknowledgeHighlights(writingId, upsert, await response.json());
+        } else if (response.status === 409 && attempt < 3) {
+            // Saved elsewhere in the meantime: rebase the local edits onto
+            // the server copy and send them again
+            console.warn('Highlights changed on the server, merging');
+            if (await rebaseHighlights(writingId)) {
+                await sendHighlightChanges(writingId, attempt + 1);
+            }
+        } else {
             console.error('Failed to save highlights to server');
         }
     } catch (error) {
@@ -2703,26 +2796,150 @@ async function saveHighlights(writingId) {
     }
 }
 
+// Take the ids and positions the server gave the sent spans, keeping
+// whatever was changed locally since they were sent
+function acknowledgeHighlights(writingId, sent, data) {
+    const byId = new Map((data.highlights || []).map(h => [h.id, h]));
+    const unplaced = new Set();
+    sent.forEach((highlight, index) => {
+        const id = (data.upserted || [])[index];
+        if (id == null) {
+            unplaced.add(highlight);
+            return;
+        }
+        const stored = byId.get(id);
+        highlight.id = id;
+        if (stored) {
+            highlight.start = stored.start;
+            highlight.end = stored.end;
+            highlight.text = stored.text;
+        }
+    });
+    window.serverHighlights[writingId] = {
+        revision: data.revision,
+        highlights: (data.highlights || []).map(h => Object.assign({}, h))
+    };
+    window.savedHighlights[writingId] = (window.savedHighlights[writingId] || [])
+        .filter(h => !unplaced.has(h));
+    rememberQuoteAnchors(writingId, data.text_length, data.anchors);
+    localStorage.setItem(`highlights-${writingId}`, JSON.stringify(window.savedHighlights[writingId]));
+}
+
+// Merge local edits into the latest server copy: spans deleted here stay
+// deleted, spans added or changed here win, everything else comes from
+// the server. Returns false if the server copy could not be fetched.
+async function rebaseHighlights(writingId) {
+    let data;
+    try {
+        const response = await fetch(`/api/writings/${writingId}/highlights`);
+        if (!response.ok) return false;
+        data = await response.json();
+    } catch (error) {
+        console.error('Error loading highlights:', error);
+        return false;
+    }
+
+    const base = window.serverHighlights[writingId] || { highlights: [] };
+    const local = window.savedHighlights[writingId] || [];
+    const localById = new Map(local.filter(h => h.id).map(h => [h.id, h]));
+    const deletedHere = new Set(base.highlights.filter(h => !localById.has(h.id)).map(h => h.id));
+
+    const merged = (data.highlights || [])
+        .filter(h => !deletedHere.has(h.id))
+        .map(h => localById.get(h.id) || Object.assign({}, h));
+    local.filter(h => !h.id).forEach(h => merged.push(h));
+
+    window.serverHighlights[writingId] = {
+        revision: data.revision,
+        highlights: (data.highlights || []).map(h => Object.assign({}, h))
+    };
+    window.savedHighlights[writingId] = merged;
+    rememberQuoteAnchors(writingId, data.text_length, data.anchors);
+    localStorage.setItem(`highlights-${writingId}`, JSON.stringify(merged));
+
+    const textElement = document.getElementById(`text-${writingId}`);
+    if (textElement) {
+        renderHighlightSpans(textElement, merged);
+    }
+    return true;
+}
+
+// Character offsets of the (trimmed) selection within `element`'s text
+function selectionOffsets(element, selection, selectedText) {
+    const text = element.textContent;
+    if (selection.rangeCount > 0) {
+        const range = selection.getRangeAt(0);
+        if (element.contains(range.startContainer)) {
+            const before = document.createRange();
+            before.selectNodeContents(element);
+            before.setEnd(range.startContainer, range.startOffset);
+            const raw = selection.toString();
+            const start = before.toString().length + (raw.length - raw.trimStart().length);
+            if (text.substring(start, start + selectedText.length) === selectedText) {
+                return { start: start, end: start + selectedText.length };
+            }
+        }
+    }
+    const found = text.indexOf(selectedText);
+    return found < 0 ? { start: null, end: null } : { start: found, end: found + selectedText.length };
+}
+
+// Render manual highlights from their offsets. A span whose offsets no
+// longer match the text is looked for from its old position instead;
+// spans overlapping an earlier one are skipped.
+function renderHighlightSpans(textElement, highlights) {
+    const text = textElement.textContent;
+    const spans = [];
+    (highlights || []).forEach(highlight => {
+        let start = highlight.start;
+        let end = highlight.end;
+        if (start == null || end == null || text.substring(start, end) !== highlight.text) {
+            let found = text.indexOf(highlight.text, Math.max(0, start || 0));
+            if (found < 0) found = text.indexOf(highlight.text);
+            if (found < 0) return;
+            start = found;
+            end = found + highlight.text.length;
+        }
+        spans.push({ start: start, end: end, highlight: highlight });
+    });
+    spans.sort((a, b) => a.start - b.start);
+
+    let result = '';
+    let lastIndex = 0;
+    spans.forEach(span => {
+        if (span.start < lastIndex) return;
+        result += escapeHtml(text.substring(lastIndex, span.start));
+        result += `<span class="highlight" style="background-color: ${escapeHtml(span.highlight.color || '')}" data-tooltip="${escapeHtml(span.highlight.tooltip || '')}" data-removable="true">`;
+        result += escapeHtml(text.substring(span.start, span.end));
+        result += '</span>';
+        lastIndex = span.end;
+    });
+    result += escapeHtml(text.substring(lastIndex));
+    textElement.innerHTML = result;
+}
+
 // Function to load highlights
 async function loadHighlights(writingId) {
     if (!writingId) return [];
 
-    // Try to load from local storage first
-    const localHighlights = localStorage.getItem(`highlights-${writingId}`);
-    if (localHighlights) {
-        return JSON.parse(localHighlights);
-    }
-
-    // If not in local storage, try to load from server
+    // The server copy is authoritative; the browser revalidates it by ETag
+    // so an unchanged set comes back as a 304 from the HTTP cache.
     try {
         const response = await fetch(`/api/writings/${writingId}/highlights`);
         if (response.ok) {
             const data = await response.json();
-            return data.highlights;
+            rememberServerHighlights(writingId, data);
+            return window.savedHighlights[writingId];
         }
     } catch (error) {
         console.error('Error loading highlights:', error);
     }
+
+    // Offline: fall back to the last copy kept in local storage
+    const localHighlights = localStorage.getItem(`highlights-${writingId}`);
+    if (localHighlights) {
+        return JSON.parse(localHighlights);
+    }
     return [];
 }
 
@@ -2789,78 +3006,26 @@ function highlightSelection(e) {
                                .find(mark => mark.style.backgroundColor === color)?.textContent || 
                            "Custom highlight";
 
-        // Get the original text content
-        const originalText = this.textContent;
-
-        // Modified regex to use word boundaries for exact word matching
-        // For single words, we enforce word boundaries
-        // For phrases, we match exact phrases only
-        let regex;
-        if (!selectedText.includes(' ')) {
-            // For single words, use word boundaries
-            regex = new RegExp(`\\b${escapeRegExp(selectedText)}\\b`, 'g');
-        } else {
-            // For phrases, use exact matching
-            regex = new RegExp(escapeRegExp(selectedText), 'g');
-        }
-
-        let match;
-        let lastIndex = 0;
-        let result = '';
-
-        while ((match = regex.exec(originalText)) !== null) {
-            // For phrases, check that it's a standalone phrase with proper boundaries
-            let isValidMatch = true;
-
-            if (selectedText.includes(' ')) {
-                // Check phrase boundaries for multi-word selections
-                const phraseStart = match.index;
-                const phraseEnd = match.index + selectedText.length;
-
-                // Ensure the phrase starts at a word boundary or the beginning of text
-                const phraseStartValid = phraseStart === 0 || !isAlphaNumeric(originalText[phraseStart - 1]);
-
-                // Ensure the phrase ends at a word boundary or the end of text
-                const phraseEndValid = phraseEnd === originalText.length || !isAlphaNumeric(originalText[phraseEnd]);
-
-                isValidMatch = phraseStartValid && phraseEndValid;
-            }
-
-            if (isValidMatch) {
-                // Add text before match
-                result += escapeHtml(originalText.substring(lastIndex, match.index));
-
-                // Add highlighted match with ability to remove
-                result += `<span class="highlight" style="background-color: ${color}" data-tooltip="${criteriaText}" data-removable="true">`;
-                result += escapeHtml(selectedText);
-                result += '</span>';
-
-                lastIndex = match.index + selectedText.length;
-            }
-        }
-
-        // Add remaining text
-        if (lastIndex < originalText.length) {
-            result += escapeHtml(originalText.substring(lastIndex));
-        }
-
-        // Update content with the highlighted version
-        this.innerHTML = result;
+        // Highlight the selected occurrence only, by its offsets
+        const offsets = selectionOffsets(this, selection, selectedText);
+        const highlight = {
+            text: selectedText,
+            start: offsets.start,
+            end: offsets.end,
+            color: color,
+            tooltip: criteriaText
+        };
 
-        // Save this highlight
         if (window.currentWritingId) {
             if (!window.savedHighlights[window.currentWritingId]) {
                 window.savedHighlights[window.currentWritingId] = [];
             }
-
-            window.savedHighlights[window.currentWritingId].push({
-                text: selectedText,
-                color: color,
-                tooltip: criteriaText
-            });
-
-            // Save highlights
+            window.savedHighlights[window.currentWritingId].push(highlight);
+            renderHighlightSpans(this, window.savedHighlights[window.currentWritingId]);
             saveHighlights(window.currentWritingId);
+        } else {
+            this.localHighlights = (this.localHighlights || []).concat([highlight]);
+            renderHighlightSpans(this, this.localHighlights);
         }
 
         // Clear selection
@@ -2968,37 +3133,7 @@ function setupTextHighlighting() {
                 if (currentWritingId) {
                     loadHighlights(currentWritingId).then(highlights => {
                         if (highlights && highlights.length > 0) {
-                            // Apply manual highlights on top of AI highlights
-                            highlights.forEach(highlight => {
-                                const tempDiv = document.createElement('div');
-                                tempDiv.innerHTML = textElement.innerHTML;
-
-                                // Find and highlight each occurrence using word boundaries
-                                const regex = new RegExp(`\\b${escapeRegExp(highlight.text)}\\b`, 'g');
-                                let match;
-                                let lastIndex = 0;
-                                let result = '';
-                                const originalText = textElement.textContent;
-
-                                while ((match = regex.exec(originalText)) !== null) {
-                                    // Add text before match
-                                    result += originalText.substring(lastIndex, match.index);
-
-                                    // Add highlighted match
-                                    result += `<span class="highlight" style="background-color: ${highlight.color}" data-tooltip="${highlight.tooltip}" data-removable="true">`;
-                                    result += match[0];
-                                    result += '</span>';
-
-                                    lastIndex = match.index + highlight.text.length;
-                                }
-
-                                // Add remaining text
-                                if (lastIndex < originalText.length) {
-                                    result += originalText.substring(lastIndex);
-                                }
-
-                                textElement.innerHTML = result;
-                            });
+                            renderHighlightSpans(textElement, highlights);
                         }
                     });
                 }
@@ -1,84 +1,114 @@
 
-// Wait for both DOM and Google Charts to load
+// Portfolio charts, drawn from /student/<id>/portfolio/charts once both the
+// DOM and Google Charts have loaded
 google.charts.load('current', {'packages':['corechart']});
 google.charts.setOnLoadCallback(initializeChart);
 
+let portfolioChartData = null;
+
 function initializeChart() {
-    document.addEventListener('DOMContentLoaded', drawChart);
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', fetchChartData);
+    } else {
+        fetchChartData();
+    }
+}
+
+function fetchChartData() {
+    const chartDiv = document.getElementById('performanceChart');
+    if (!chartDiv || !chartDiv.dataset.url) {
+        return;
+    }
+
+    fetch(chartDiv.dataset.url, { headers: { 'Accept': 'application/json' } })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Chart data request failed: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            portfolioChartData = data;
+            drawChart();
+        })
+        .catch(error => console.error("Error loading chart data:", error));
 }
 
 function drawChart() {
+    if (!portfolioChartData) {
+        return;
+    }
     try {
-        console.log("Starting chart initialization");
-        
-        // Get table data
-        const rows = Array.from(document.querySelectorAll('table tbody tr:not(.details-row)'));
-        if (!rows.length) {
-            console.error("No data rows found");
-            return;
-        }
+        drawScoreChart(portfolioChartData.scores);
+        drawAgeChart(portfolioChartData.ages);
+    } catch (error) {
+        console.error("Error creating chart:", error);
+    }
+}
 
-        // Create data table
-        const data = new google.visualization.DataTable();
-        data.addColumn('string', 'Date');
-        data.addColumn('number', 'Score');
-
-        // Process each row
-        const chartData = rows.map(row => {
-            const cells = row.querySelectorAll('td');
-            if (cells.length >= 6) {
-                const date = cells[1].textContent.trim();
-                const scoreText = cells[5].textContent.trim();
-                // Extract number from percentage string (e.g., "85%" -> 85)
-                const score = parseFloat(scoreText.replace(/[^0-9.]/g, ''));
-                
-                if (!isNaN(score)) {
-                    console.log(`Adding data point: ${date} - ${score}`);
-                    return [date, score];
-                }
-            }
-            return null;
-        }).filter(item => item !== null);
+function showNoData(chartDiv) {
+    chartDiv.innerHTML = '<p class="text-muted text-center pt-5">Not enough data yet</p>';
+}
 
-        if (chartData.length === 0) {
-            console.error("No valid data points found");
-            return;
-        }
+function drawScoreChart(scores) {
+    const chartDiv = document.getElementById('performanceChart');
+    if (!scores.labels.length) {
+        showNoData(chartDiv);
+        return;
+    }
 
-        // Add data to chart
-        data.addRows(chartData);
-
-        // Configure chart
-        const options = {
-            title: 'Writing Progress',
-            height: 400,
-            curveType: 'function',
-            legend: { position: 'none' },
-            vAxis: {
-                title: 'Score (%)',
-                minValue: 0,
-                maxValue: 100,
-                format: '#"%"'
-            },
-            hAxis: {
-                title: 'Date',
-                slantedText: true,
-                slantedTextAngle: 45
-            }
-        };
-
-        // Draw chart
-        const chartDiv = document.getElementById('performanceChart');
-        if (chartDiv) {
-            const chart = new google.visualization.LineChart(chartDiv);
-            chart.draw(data, options);
-            console.log("Chart drawn successfully with", chartData.length, "points");
-        } else {
-            console.error("Chart container not found");
+    const data = new google.visualization.DataTable();
+    data.addColumn('string', 'Date');
+    data.addColumn('number', 'Score');
+    data.addRows(scores.labels.map((label, i) => [label, scores.data[i]]));
+
+    const options = {
+        height: 300,
+        curveType: 'function',
+        legend: { position: 'none' },
+        vAxis: {
+            title: 'Score (%)',
+            minValue: 0,
+            maxValue: 100,
+            format: '#"%"'
+        },
+        hAxis: {
+            slantedText: true,
+            slantedTextAngle: 45
         }
-    } catch (error) {
-        console.error("Error creating chart:", error);
+    };
+
+    new google.visualization.LineChart(chartDiv).draw(data, options);
+}
+
+function drawAgeChart(ages) {
+    const chartDiv = document.getElementById('ageChart');
+    if (!chartDiv) {
+        return;
     }
+    if (!ages.labels.length) {
+        showNoData(chartDiv);
+        return;
+    }
+
+    const data = new google.visualization.DataTable();
+    data.addColumn('string', 'Date');
+    data.addColumn('number', 'Writing Age');
+    data.addColumn('number', 'Actual Age');
+    data.addRows(ages.labels.map((label, i) => [label, ages.writing_age[i], ages.actual_age[i]]));
+
+    const options = {
+        height: 300,
+        legend: { position: 'bottom' },
+        colors: ['#36a2eb', '#ff6384'],
+        vAxis: { title: 'Years' },
+        hAxis: {
+            slantedText: true,
+            slantedTextAngle: 45
+        }
+    };
+
+    new google.visualization.LineChart(chartDiv).draw(data, options);
 }
 
 // Add window resize handler
@@ -0,0 +1,135 @@
+import logging
+import os
+import tempfile
+import threading
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    meta,
+    pass_context,
+)
+from markupsafe import Markup
+
+logger = logging.getLogger(__name__)
+
+
+TEMPLATE_DIR = "templates"
+BYTECODE_CACHE_DIR = os.getenv(
+    "JINJA_BYTECODE_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "scribl-jinja-bytecode"),
+)
+
+
+def templates_auto_reload() -> bool:
+    """Only watch template files for changes outside production."""
+    return os.environ.get("ENVIRONMENT", "development") != "production"
+
+
+def create_environment() -> Environment:
+    """
+    Jinja environment shared by every worker. Compiled templates are written
+    to an on-disk bytecode cache so new workers skip the parse/compile step.
+    """
+    os.makedirs(BYTECODE_CACHE_DIR, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        auto_reload=templates_auto_reload(),
+        bytecode_cache=FileSystemBytecodeCache(BYTECODE_CACHE_DIR),
+    )
+
+
+def precompile_templates(env: Environment) -> int:
+    """Compile every page template up front, filling the bytecode cache."""
+    compiled = 0
+    for name in env.list_templates(extensions=["html"]):
+        try:
+            env.get_template(name)
+            compiled += 1
+        except Exception as e:
+            logger.warning(f"Could not precompile template {name}: {e}")
+    return compiled
+
+
+class StaticFragmentCache:
+    """
+    Rendered HTML for templates that contain no per-user data (legal pages,
+    landing page, navigation).
+
+    Entries are keyed by template name and request base URL (url_for renders
+    absolute links) and are invalidated when the template, or anything it
+    extends or includes, has a newer mtime. With auto-reload disabled the
+    mtimes are read once and never re-checked.
+    """
+
+    def __init__(self, env: Environment):
+        self.env = env
+        self._dependencies = {}
+        self._mtimes = {}
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def _template_files(self, name: str) -> list[str]:
+        if name in self._dependencies:
+            return self._dependencies[name]
+
+        files = []
+        pending = [name]
+        seen = set()
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            source, filename, _ = self.env.loader.get_source(self.env, current)
+            files.append(filename)
+            for referenced in meta.find_referenced_templates(self.env.parse(source)):
+                if referenced:
+                    pending.append(referenced)
+
+        self._dependencies[name] = files
+        return files
+
+    def _mtime(self, name: str) -> float:
+        if not self.env.auto_reload and name in self._mtimes:
+            return self._mtimes[name]
+        mtime = max(os.path.getmtime(f) for f in self._template_files(name))
+        self._mtimes[name] = mtime
+        return mtime
+
+    def last_modified(self, name: str) -> float:
+        return self._mtime(name)
+
+    def render(self, request, name: str, **context) -> str:
+        key = (name, str(request.base_url))
+        mtime = self._mtime(name)
+        cached = self._rendered.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        html = self.env.get_template(name).render({"request": request, **context})
+        with self._lock:
+            self._rendered[key] = (mtime, html)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._rendered.clear()
+            self._mtimes.clear()
+            self._dependencies.clear()
+
+
+templates = Jinja2Templates(env=create_environment())
+static_fragments = StaticFragmentCache(templates.env)
+
+
+@pass_context
+def static_fragment(context, name: str) -> Markup:
+    """Include a user-independent template from the fragment cache."""
+    return Markup(static_fragments.render(context["request"], name))
+
+
+templates.env.globals["static_fragment"] = static_fragment
@@ -0,0 +1,289 @@
+"""
+AI-generated WAGOLL ("What A Good One Looks Like") examples per assignment.
+
+The best-scoring submission for each success criterion is picked with one
+window query, and the generated result is stored in GeneratedWagoll with
+a fingerprint of the criteria set and that selection. The endpoint serves
+the stored result until the fingerprint changes. Once an assignment has
+PREGENERATE_MIN_MARKED marked submissions, new marking regenerates it in
+the background so the WAGOLL button responds straight away, or, with
+LLM_BATCH set, queues it for the next llm_batch batch.
+"""
+import hashlib
+import json
+import logging
+import os
+
+from sqlalchemy import distinct, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import llm_batch
+from background import Debouncer
+from llm import complete
+from models import Assignment, Criteria, CriteriaMark, GeneratedWagoll, Writing
+
+logger = logging.getLogger(__name__)
+
+
+# Bump when the prompt changes to invalidate stored results
+WAGOLL_VERSION = 1
+
+PREGENERATE_MIN_MARKED = int(os.getenv("WAGOLL_PREGENERATE_MIN_MARKED", 3))
+PREGENERATE_DELAY = float(os.getenv("WAGOLL_PREGENERATE_DELAY", 60))
+
+# Student texts are excerpts for inspiration, not the whole script
+MAX_EXAMPLE_CHARS = 1500
+MAX_OUTPUT_TOKENS = 1500
+
+
+def best_examples(db: Session, assignment_id: int) -> list[tuple[int, int, int]]:
+    """
+    (criteria_id, writing_id, score) for the highest-scoring submission on
+    each criterion. Ties go to the submission with the best overall mark.
+    """
+    ranked = (
+        db.query(
+            CriteriaMark.criteria_id.label("criteria_id"),
+            CriteriaMark.writing_id.label("writing_id"),
+            CriteriaMark.score.label("score"),
+            func.row_number()
+            .over(
+                partition_by=CriteriaMark.criteria_id,
+                order_by=(
+                    CriteriaMark.score.desc(),
+                    func.coalesce(Writing.total_marks_percentage, 0).desc(),
+                    Writing.id,
+                ),
+            )
+            .label("rank"),
+        )
+        .join(Writing, CriteriaMark.writing_id == Writing.id)
+        .filter(Writing.assignment_id == assignment_id)
+        .subquery()
+    )
+    return [
+        tuple(row)
+        for row in db.query(ranked.c.criteria_id, ranked.c.writing_id, ranked.c.score)
+        .filter(ranked.c.rank == 1)
+        .order_by(ranked.c.criteria_id)
+    ]
+
+
+def wagoll_fingerprint(assignment: Assignment, criteria_list, selection) -> str:
+    payload = [
+        WAGOLL_VERSION,
+        assignment.title,
+        assignment.genre,
+        assignment.curriculum,
+        assignment.class_group.year_group,
+        [(c.id, c.description) for c in criteria_list],
+        selection,
+    ]
+    return hashlib.sha256(json.dumps(payload, default=str).encode()).hexdigest()
+
+
+def wagoll_request(db: Session, assignment: Assignment, criteria_list, selection) -> dict:
+    """chat.completions kwargs asking for a WAGOLL built on the selected examples."""
+    descriptions = {c.id: c.description for c in criteria_list}
+    writing_ids = sorted({writing_id for _, writing_id, _ in selection})
+    texts = dict(
+        db.query(Writing.id, func.substr(Writing.text_content, 1, MAX_EXAMPLE_CHARS))
+        .filter(Writing.id.in_(writing_ids))
+        .all()
+    ) if writing_ids else {}
+
+    # One entry per submission, listing the criteria it was best at, so a
+    # script that tops several criteria is only sent once
+    examples = {}
+    for criteria_id, writing_id, score in selection:
+        if criteria_id not in descriptions or writing_id not in texts:
+            continue
+        example = examples.setdefault(
+            writing_id, {"criteria": [], "example": texts[writing_id]}
+        )
+        example["criteria"].append({"criterion": descriptions[criteria_id], "score": score})
+
+    wagoll_prompt = f"""You are an expert educational writer who specializes in creating exemplary writing samples that demonstrate mastery of learning objectives.
+
+    Task: Create a "What A Good One Looks Like" (WAGOLL) example for a {assignment.curriculum} curriculum {assignment.genre} writing assignment titled "{assignment.title}".
+
+    This WAGOLL should:
+    1. Exemplify mastery of all the success criteria
+    2. Be age-appropriate (targeting {assignment.class_group.year_group} students)
+    3. Showcase excellent writing techniques appropriate for this genre
+    4. Be original but inspired by the best elements from student submissions
+
+    Success Criteria:
+    {chr(10).join([f"- {c.description}" for c in criteria_list])}
+
+    Format your response as a JSON object with these keys:
+    {{
+        "exemplar": "The complete example text",
+        "explanations": [
+            "3-5 specific points explaining why this is a good example",
+            "Including how it meets each success criterion"
+        ]
+    }}
+
+    Keep the exemplar text appropriate in length for {assignment.class_group.year_group} students (typically 250-500 words). Focus on quality over quantity."""
+
+    return dict(
+        model=os.getenv("MODEL_NAME"),
+        messages=[
+            {"role": "system", "content": wagoll_prompt},
+            {
+                "role": "user",
+                "content": json.dumps(
+                    {
+                        "assignment": {
+                            "title": assignment.title,
+                            "genre": assignment.genre,
+                            "curriculum": assignment.curriculum,
+                            "year_group": assignment.class_group.year_group,
+                        },
+                        "criteria": [c.description for c in criteria_list],
+                        "best_examples": list(examples.values()),
+                    }
+                ),
+            },
+        ],
+        max_tokens=MAX_OUTPUT_TOKENS,
+        response_format={"type": "json_object"},
+    )
+
+
+def parse_wagoll(assignment: Assignment, content: str) -> dict:
+    wagoll = json.loads(content)
+    return {
+        "title": assignment.title,
+        "exemplar": wagoll.get("exemplar", "Error generating example."),
+        "explanations": wagoll.get("explanations", ["No explanations provided."]),
+    }
+
+
+def generate_wagoll(db: Session, assignment: Assignment, criteria_list, selection) -> dict:
+    response = complete(
+        "wagoll",
+        # Also runs as a background pregeneration, outside any request
+        teacher_id=assignment.class_group.teacher_id,
+        **wagoll_request(db, assignment, criteria_list, selection),
+    )
+    return parse_wagoll(assignment, response.choices[0].message.content)
+
+
+def _store(db: Session, assignment_id: int, fingerprint: str, result: dict):
+    stored = db.query(GeneratedWagoll).filter_by(assignment_id=assignment_id).first()
+    if stored is None:
+        stored = GeneratedWagoll(assignment_id=assignment_id)
+        db.add(stored)
+    stored.fingerprint = fingerprint
+    stored.result = json.dumps(result)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker stored a result for this assignment first
+        db.rollback()
+
+
+def get_wagoll(db: Session, assignment: Assignment) -> dict:
+    """The stored WAGOLL if still current, otherwise a freshly generated one."""
+    criteria_list = (
+        db.query(Criteria).filter_by(assignment_id=assignment.id).order_by(Criteria.id).all()
+    )
+    if not criteria_list:
+        return {
+            "title": assignment.title,
+            "exemplar": "No success criteria found for this assignment.",
+            "explanations": [
+                "Please add success criteria to generate a WAGOLL example."
+            ],
+        }
+
+    selection = best_examples(db, assignment.id)
+    fingerprint = wagoll_fingerprint(assignment, criteria_list, selection)
+
+    stored = (
+        db.query(GeneratedWagoll.fingerprint, GeneratedWagoll.result)
+        .filter(GeneratedWagoll.assignment_id == assignment.id)
+        .first()
+    )
+    if stored and stored.fingerprint == fingerprint:
+        return json.loads(stored.result)
+
+    result = generate_wagoll(db, assignment, criteria_list, selection)
+    _store(db, assignment.id, fingerprint, result)
+    return result
+
+
+def _current(db: Session, assignment: Assignment):
+    """(criteria, best examples, fingerprint) the WAGOLL would be built from now."""
+    criteria_list = (
+        db.query(Criteria).filter_by(assignment_id=assignment.id).order_by(Criteria.id).all()
+    )
+    selection = best_examples(db, assignment.id)
+    return criteria_list, selection, wagoll_fingerprint(assignment, criteria_list, selection)
+
+
+def queue_wagoll(db: Session, assignment: Assignment):
+    """Queue the WAGOLL for the next llm_batch batch unless the stored one is current."""
+    criteria_list, selection, fingerprint = _current(db, assignment)
+    if not criteria_list:
+        return
+    stored = (
+        db.query(GeneratedWagoll.fingerprint)
+        .filter(GeneratedWagoll.assignment_id == assignment.id)
+        .scalar()
+    )
+    if stored == fingerprint:
+        return
+    llm_batch.enqueue(
+        db,
+        "wagoll",
+        assignment.id,
+        wagoll_request(db, assignment, criteria_list, selection),
+        teacher_id=assignment.class_group.teacher_id,
+        context={"fingerprint": fingerprint},
+    )
+    db.commit()
+
+
+def _apply_batch_result(db: Session, request, content: str):
+    fingerprint = json.loads(request.context)["fingerprint"]
+    assignment = db.get(Assignment, request.target_id)
+    if assignment is None:
+        raise RuntimeError("assignment was deleted")
+    # Marking that landed while the batch ran has queued a newer WAGOLL
+    if _current(db, assignment)[2] != fingerprint:
+        logger.info(f"Dropping out-of-date batch WAGOLL for assignment {assignment.id}")
+        return
+    _store(db, assignment.id, fingerprint, parse_wagoll(assignment, content))
+
+
+llm_batch.register_handler("wagoll", _apply_batch_result)
+
+
+def _pregenerate(db: Session, assignment_id: int):
+    marked = (
+        db.query(func.count(distinct(CriteriaMark.writing_id)))
+        .join(Writing, CriteriaMark.writing_id == Writing.id)
+        .filter(Writing.assignment_id == assignment_id)
+        .scalar()
+    )
+    if marked < PREGENERATE_MIN_MARKED:
+        return
+    assignment = db.query(Assignment).get(assignment_id)
+    if not assignment:
+        return
+    if llm_batch.enabled():
+        queue_wagoll(db, assignment)
+    else:
+        get_wagoll(db, assignment)
+
+
+_pregenerator = Debouncer("WAGOLL pre-generation", _pregenerate, PREGENERATE_DELAY)
+
+
+def schedule_pregeneration(assignment_id: int):
+    """Regenerate the WAGOLL in the background once marking settles."""
+    _pregenerator.schedule(assignment_id)
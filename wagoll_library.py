@@ -0,0 +1,207 @@
+"""
+Listing and full-text search for saved WAGOLL examples.
+
+Library pages only need summary columns, so listings never load `content`
+or `explanations`; the full text is fetched per example when opened.
+Listings are keyset-paginated on (updated_at, id), newest first, so every
+page costs the same however large the public library grows.
+
+Search uses the database's own full-text index:
+
+- PostgreSQL: a GIN index over to_tsvector() of title, content and
+  explanations, queried with plainto_tsquery();
+- SQLite: an external-content FTS5 table kept in sync by triggers;
+- anything else: a case-insensitive LIKE scan.
+"""
+import base64
+import logging
+import re
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import and_, or_, text, true
+from sqlalchemy.orm import Session
+
+from models import Assignment, User, WagollExample
+
+logger = logging.getLogger(__name__)
+
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Must match the indexed expression exactly for Postgres to use the index
+PG_DOCUMENT = (
+    "to_tsvector('english', coalesce(wagoll_example.title, '') || ' ' || "
+    "coalesce(wagoll_example.content, '') || ' ' || "
+    "coalesce(wagoll_example.explanations, ''))"
+)
+
+KEYSET_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_wagoll_example_teacher_updated "
+    "ON wagoll_example (teacher_id, updated_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_wagoll_example_public_updated "
+    "ON wagoll_example (is_public, updated_at, id)",
+]
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE wagoll_example_fts USING fts5("
+    "title, content, explanations, content='wagoll_example', content_rowid='id')",
+    "CREATE TRIGGER wagoll_example_fts_insert AFTER INSERT ON wagoll_example BEGIN "
+    "INSERT INTO wagoll_example_fts(rowid, title, content, explanations) "
+    "VALUES (new.id, new.title, new.content, new.explanations); END",
+    "CREATE TRIGGER wagoll_example_fts_delete AFTER DELETE ON wagoll_example BEGIN "
+    "INSERT INTO wagoll_example_fts(wagoll_example_fts, rowid, title, content, explanations) "
+    "VALUES ('delete', old.id, old.title, old.content, old.explanations); END",
+    "CREATE TRIGGER wagoll_example_fts_update AFTER UPDATE ON wagoll_example BEGIN "
+    "INSERT INTO wagoll_example_fts(wagoll_example_fts, rowid, title, content, explanations) "
+    "VALUES ('delete', old.id, old.title, old.content, old.explanations); "
+    "INSERT INTO wagoll_example_fts(rowid, title, content, explanations) "
+    "VALUES (new.id, new.title, new.content, new.explanations); END",
+    "INSERT INTO wagoll_example_fts(wagoll_example_fts) VALUES ('rebuild')",
+]
+
+
+def ensure_search_index(connection):
+    """Create the keyset and full-text indexes if they are missing."""
+    for statement in KEYSET_INDEXES:
+        connection.execute(text(statement))
+
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_wagoll_example_search "
+            f"ON wagoll_example USING GIN ({PG_DOCUMENT})"
+        ))
+    elif dialect == "sqlite":
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'wagoll_example_fts'"
+        )).first()
+        if not exists:
+            for statement in SQLITE_FTS:
+                connection.execute(text(statement))
+            logger.info("Created full-text index for WAGOLL examples")
+
+
+def _search_filter(db: Session, query: str):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return text(f"{PG_DOCUMENT} @@ plainto_tsquery('english', :search)").bindparams(
+            search=query
+        )
+    if dialect == "sqlite":
+        # Quote every term so user input is never parsed as FTS5 syntax
+        terms = re.findall(r"\w+", query)
+        match = " ".join(f'"{term}"' for term in terms)
+        if not match:
+            return true()
+        return WagollExample.id.in_(
+            text(
+                "SELECT rowid FROM wagoll_example_fts WHERE wagoll_example_fts MATCH :search"
+            ).bindparams(search=match)
+        )
+    pattern = f"%{query}%"
+    return or_(
+        WagollExample.title.ilike(pattern),
+        WagollExample.content.ilike(pattern),
+        WagollExample.explanations.ilike(pattern),
+    )
+
+
+def encode_cursor(updated_at: Optional[datetime], example_id: int) -> str:
+    stamp = updated_at.isoformat() if updated_at else ""
+    return base64.urlsafe_b64encode(f"{stamp}|{example_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Optional[tuple[Optional[datetime], int]]:
+    try:
+        stamp, _, example_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+        return (datetime.fromisoformat(stamp) if stamp else None), int(example_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def list_examples(
+    db: Session,
+    current_user: User,
+    scope: str = "mine",
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    One page of example summaries, newest first. `scope` is "mine" (the
+    teacher's own) or "public" (shared by other teachers). Returns the
+    page and the cursor for the next one, or None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = (
+        db.query(
+            WagollExample.id,
+            WagollExample.title,
+            WagollExample.is_public,
+            WagollExample.assignment_id,
+            WagollExample.updated_at,
+            Assignment.title.label("assignment_title"),
+            User.first_name,
+            User.last_name,
+        )
+        .outerjoin(Assignment, WagollExample.assignment_id == Assignment.id)
+        .join(User, WagollExample.teacher_id == User.id)
+    )
+    if scope == "public":
+        query = query.filter(
+            WagollExample.teacher_id != current_user.id,
+            WagollExample.is_public.is_(True),
+        )
+    else:
+        query = query.filter(WagollExample.teacher_id == current_user.id)
+
+    if search and search.strip():
+        query = query.filter(_search_filter(db, search.strip()))
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        updated_at, example_id = position
+        if updated_at is None:
+            query = query.filter(
+                WagollExample.updated_at.is_(None), WagollExample.id < example_id
+            )
+        else:
+            query = query.filter(
+                or_(
+                    WagollExample.updated_at < updated_at,
+                    and_(
+                        WagollExample.updated_at == updated_at,
+                        WagollExample.id < example_id,
+                    ),
+                    WagollExample.updated_at.is_(None),
+                )
+            )
+
+    rows = (
+        query.order_by(
+            WagollExample.updated_at.desc().nulls_last(), WagollExample.id.desc()
+        )
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "is_public": row.is_public,
+            "assignment_id": row.assignment_id,
+            "assignment_title": row.assignment_title,
+            "teacher_name": f"{row.first_name} {row.last_name}",
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+            "updated_display": row.updated_at.strftime("%d/%m/%Y") if row.updated_at else None,
+        }
+        for row in rows
+    ], next_cursor